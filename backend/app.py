@@ -1,16 +1,24 @@
-from flask import Flask
+from flask import Flask, session
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_cors import CORS
+from flask_migrate import Migrate
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from database import DATABASE_URL, engine_options
+import metrics
+from session_store import create_session_store, UserCache
+import sharding
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///windkey.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(DATABASE_URL)
+app.config['SQLALCHEMY_BINDS'] = sharding.binds()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # CORS konfigurieren
@@ -19,12 +27,15 @@ CORS(app, supports_credentials=True, resources={
         "origins": ["http://localhost:3000", "chrome-extension://*"],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization"],
-        "expose_headers": ["Content-Range", "X-Content-Range"],
+        "expose_headers": ["Content-Range", "X-Content-Range", "X-Next-Cursor"],
         "supports_credentials": True
     }
 })
 
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options=sharding.session_options())
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+migrate = Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)
+metrics.init_app(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.session_protection = "strong"
@@ -34,17 +45,26 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128))
     two_factor_secret = db.Column(db.String(32))
+    # 'server' (Fernet on the server) or 'client' (entries encrypted in the browser/extension)
+    vault_encryption = db.Column(db.String(10), nullable=False, default='server', server_default='server')
+    vault_kdf_salt = db.Column(db.String(64))  # PBKDF2 parameters for the client-side key
+    vault_kdf_iterations = db.Column(db.Integer)
+    vault_key_check = db.Column(db.Text)  # Known value encrypted under the client-side key
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     history = db.relationship('History', backref='user', lazy=True)
     categories = db.relationship('Category', backref='user', lazy=True)
     
     def set_password(self, password):
-        from werkzeug.security import generate_password_hash
-        self.password_hash = generate_password_hash(password)
+        from hashing import hash_password
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        from werkzeug.security import check_password_hash
-        return check_password_hash(self.password_hash, password)
+        from hashing import verify_password
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        from hashing import needs_rehash
+        return needs_rehash(self.password_hash)
         
     def generate_2fa_secret(self):
         import pyotp
@@ -66,7 +86,7 @@ class User(db.Model):
         return False
 
 class Category(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, default=sharding.id_default('category'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     icon = db.Column(db.String(50))  # Material-UI icon name
@@ -74,26 +94,50 @@ class Category(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     passwords = db.relationship('Password', backref='category', lazy=True)
 
-    def to_dict(self):
+    __table_args__ = (
+        db.Index('ix_category_user_id', 'user_id'),
+    )
+
+    def to_dict(self, password_count=None):
+        if password_count is None:
+            # Zählen per COUNT-Query statt alle Passwörter zu laden
+            password_count = Password.query.filter_by(category_id=self.id).count()
         return {
             'id': self.id,
             'name': self.name,
             'icon': self.icon,
             'color': self.color,
-            'password_count': len(self.passwords)
+            'password_count': password_count
         }
 
 class Password(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, default=sharding.id_default('password'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
     title = db.Column(db.String(100), nullable=False)
-    encrypted_password = db.Column(db.LargeBinary, nullable=False)
+    encrypted_password = db.Column(db.LargeBinary)  # Server-side Fernet token
+    client_ciphertext = db.Column(db.Text)  # Opaque blob from client-side encryption
     url = db.Column(db.String(500))
+    domain = db.Column(db.String(253))  # Registrable domain of url, for autofill
     notes = db.Column(db.Text)
+    password_fingerprint = db.Column(db.String(64))  # HMAC for reuse detection
+    password_strength = db.Column(db.SmallInteger)  # Score 0-100 (strength.py), NULL if unknown
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # ChangeCounter.counter at last change
+    breach_count = db.Column(db.Integer)  # Result of the last breach scan, NULL while unchecked
+    breach_checked_at = db.Column(db.DateTime)  # Cleared whenever the password changes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_password_user_fingerprint', 'user_id', 'password_fingerprint'),
+        db.Index('ix_password_user_change_seq', 'user_id', 'change_seq'),
+        db.Index('ix_password_user_category', 'user_id', 'category_id'),
+        db.Index('ix_password_category_id', 'category_id'),
+        db.Index('ix_password_user_domain', 'user_id', 'domain'),
+        db.Index('ix_password_breach_checked_at', 'breach_checked_at'),
+        db.Index('ix_password_user_breach_count', 'user_id', 'breach_count'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -105,14 +149,65 @@ class Password(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
-class History(db.Model):
+class PasswordTombstone(db.Model):
+    # Remembers deleted entries so clients can drop them on delta sync
+    id = db.Column(db.Integer, primary_key=True, default=sharding.id_default('password_tombstone'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    password_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_password_tombstone_user_change_seq', 'user_id', 'change_seq'),
+    )
+
+class ChangeCounter(db.Model):
+    # Sync cursor per user; kept next to the user's entries so writes stay on one shard
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    counter = db.Column(db.Integer, nullable=False, default=0)
+    pruned_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Newest pruned tombstone
+
+class ShardAssignment(db.Model):
+    # Directory of users living in a shard (see sharding.py); absent = main database
+    __tablename__ = 'shard_directory'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    shard = db.Column(db.String(64), nullable=False, index=True)
+    moving = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class IdSequence(db.Model):
+    # Next free id per sharded table within this database's id range (see sharding.next_id)
+    name = db.Column(db.String(64), primary_key=True)
+    next_id = db.Column(db.Integer, nullable=False)
+
+class AuthSession(db.Model):
+    # Server-side login sessions; only the SHA-256 of the token is stored
+    token_hash = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class KeyRotation(db.Model):
+    # Checkpoint of the re-encryption job, one row per primary key (per shard when sharded)
     id = db.Column(db.Integer, primary_key=True)
+    key_id = db.Column(db.String(16), unique=True, nullable=False)
+    last_password_id = db.Column(db.Integer, nullable=False, default=0)
+    rotated_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class History(db.Model):
+    id = db.Column(db.Integer, primary_key=True, default=sharding.id_default('history'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     action = db.Column(db.String(255), nullable=False)
     details = db.Column(db.String(255))
     ip_address = db.Column(db.String(45))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_history_user_timestamp', 'user_id', 'timestamp'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -122,35 +217,60 @@ class History(db.Model):
             'timestamp': self.timestamp.isoformat()
         }
 
+sharding.init_app(app, db, ShardAssignment, IdSequence)
+session_store = create_session_store(db, AuthSession)
+user_cache = UserCache()
+user_cache.watch(User)
+
+def load_detached_user(user_id):
+    user = db.session.get(User, user_id)
+    if user is not None:
+        # Cached across requests, so it must not belong to a request's session
+        db.session.expunge(user)
+    return user
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # The session token must still be valid in the store (revocation)
+    if session_store.get(session.get('token')) != int(user_id):
+        return None
+    user = user_cache.get(int(user_id), load_detached_user)
+    if user is not None:
+        sharding.route_user(user.id)
+    return user
+
+@login_manager.request_loader
+def load_user_from_request(request):
+    # The extension sends its token as "Authorization: Bearer <token>"
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    user_id = session_store.get(auth_header[len('Bearer '):])
+    if user_id is None:
+        return None
+    user = user_cache.get(user_id, load_detached_user)
+    if user is not None:
+        sharding.route_user(user.id)
+    return user
+
+def check_schema_version():
+    # Cheap startup check; schema changes run explicitly via `flask db upgrade`
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    head = ScriptDirectory(MIGRATIONS_DIR).get_current_head()
+    for shard in sharding.shard_names():
+        with sharding.engine(shard).connect() as conn:
+            current = MigrationContext.configure(conn).get_current_revision()
+        if current != head:
+            print(f"Database schema of {shard} is at revision {current}, expected {head}. "
+                  f"Run 'python migrate_db.py' (or 'flask db upgrade') to migrate.")
 
 with app.app_context():
     try:
-        # Create tables
-        db.create_all()
-        print("Database initialized successfully")
+        check_schema_version()
     except Exception as e:
-        print(f"Error initializing database: {str(e)}")
-
-    # Check if category_id column exists in password table
-    inspector = db.inspect(db.engine)
-    columns = [c['name'] for c in inspector.get_columns('password')]
-    
-    if 'category_id' not in columns:
-        print("Adding category_id column to password table...")
-        try:
-            with db.engine.connect() as conn:
-                conn.execute(db.text("""
-                    ALTER TABLE password
-                    ADD COLUMN category_id INTEGER
-                    REFERENCES category(id)
-                """))
-                conn.commit()
-            print("Migration completed successfully!")
-        except Exception as e:
-            print(f"Error during migration: {str(e)}")
+        print(f"Error checking database schema: {str(e)}")
 
 from routes import *
 
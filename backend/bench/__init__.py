@@ -0,0 +1 @@
+# Benchmarks for the Windkey backend (see bench/load.py and bench/micro.py)
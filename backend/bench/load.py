@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Lasttest für alle /api/* Routen
+#
+# Run from the backend directory:
+#   python -m bench.load --vault-sizes 100,1000,10000 --iterations 200 --output bench-results.json
+#
+# By default the app is driven in-process through the Flask test client,
+# which also allows counting SQL statements per request. With --gunicorn the
+# same scenario runs over HTTP against real gunicorn workers.
+DEFAULT_VAULT_SIZES = '100,1000,10000'
+BENCH_PASSWORD = 'bench-password'
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def peak_rss_kb():
+    # ru_maxrss is reported in KiB on Linux and in bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+class QueryCounter:
+    """Counts SQL statements executed by the in-process app."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.queries = 0
+
+    def record(self, elapsed, status, queries):
+        self.latencies.append(elapsed)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        self.queries += queries
+
+    def summary(self, count_queries):
+        total = sum(self.latencies)
+        result = {
+            'requests': len(self.latencies),
+            'mean_ms': round(total / len(self.latencies) * 1000, 3),
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(self.latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(self.latencies, 99) * 1000, 3),
+            'throughput_rps': round(len(self.latencies) / total, 1) if total else None,
+            'status_codes': self.statuses
+        }
+        if count_queries:
+            result['queries_per_request'] = round(self.queries / len(self.latencies), 2)
+        return result
+
+
+class HttpClient:
+    """Minimal adapter so requests.Session looks like the Flask test client."""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def open(self, path, method='GET', json=None):
+        return self.session.request(method, self.base_url + path, json=json)
+
+    def post(self, path, json=None):
+        return self.open(path, 'POST', json)
+
+
+def scenario(include_breach):
+    """Return (name, method, path, body) per request; path and body may take the entry ids."""
+    routes = [
+        ('check-auth', 'GET', '/api/check-auth', None),
+        ('passwords-list', 'GET', '/api/passwords', None),
+        ('passwords-list-page', 'GET', '/api/passwords?limit=100', None),
+        ('passwords-list-full', 'GET', '/api/passwords?include_password=true&limit=100', None),
+        ('password-get', 'GET', lambda ids: f'/api/passwords/{ids[0]}', None),
+        ('passwords-search', 'GET', '/api/passwords/search?q=github', None),
+        ('passwords-match', 'GET', '/api/passwords/match?url=https://accounts.google.com/login', None),
+        ('passwords-reuse', 'GET', '/api/passwords/reuse', None),
+        ('passwords-breached', 'GET', '/api/passwords/breached', None),
+        ('sync-full', 'GET', '/api/sync', None),
+        ('sync-delta', 'GET', '/api/sync?since=0', None),
+        ('history', 'GET', '/api/history', None),
+        ('history-page', 'GET', '/api/history?limit=50', None),
+        ('categories', 'GET', '/api/categories', None),
+        ('generate-password', 'GET', '/api/generate-password?length=32', None),
+        ('password-create', 'POST', '/api/passwords', lambda ids: {
+            'title': 'Bench entry', 'password': 'Bench-Secret-1', 'url': 'https://bench.example.com'}),
+        ('password-update', 'PUT', lambda ids: f'/api/passwords/{ids[0]}', lambda ids: {
+            'notes': 'updated by benchmark'}),
+        ('passwords-batch', 'POST', '/api/passwords/batch', lambda ids: {'operations': [
+            {'op': 'update', 'id': ids[1], 'data': {'notes': 'batch'}},
+            {'op': 'create', 'data': {'title': 'Batch entry', 'password': 'Batch-Secret-1'}}]}),
+        ('category-create', 'POST', '/api/categories', lambda ids: {'name': 'Bench', 'icon': 'Folder', 'color': '#000000'}),
+    ]
+    if include_breach:
+        routes += [
+            ('breach-check', 'POST', '/api/check-password-breach', lambda ids: {'password': 'password123'}),
+            ('breach-check-batch', 'POST', '/api/check-password-breach/batch', lambda ids: {'ids': ids[:20]}),
+        ]
+    return routes
+
+
+def run_scenario(client, password_ids, iterations, include_breach, counter=None):
+    stats = {}
+    created_categories = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for name, method, path, body in scenario(include_breach):
+            if callable(path):
+                path = path(password_ids)
+            if callable(body):
+                body = body(password_ids)
+            before = counter.count if counter else 0
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            # Drain streamed responses so their queries and time are included
+            payload = response.get_data() if hasattr(response, 'get_data') else response.content
+            elapsed = time.perf_counter() - t0
+            queries = counter.count - before if counter else 0
+            stats.setdefault(name, RouteStats()).record(elapsed, response.status_code, queries)
+
+            if name == 'password-create' and response.status_code in (200, 201):
+                # Keep the vault size stable between iterations
+                created = json.loads(payload)
+                t0 = time.perf_counter()
+                before = counter.count if counter else 0
+                response = client.open(f"/api/passwords/{created['id']}", method='DELETE')
+                elapsed = time.perf_counter() - t0
+                queries = counter.count - before if counter else 0
+                stats.setdefault('password-delete', RouteStats()).record(elapsed, response.status_code, queries)
+            elif name == 'category-create' and response.status_code in (200, 201):
+                created_categories.append(json.loads(payload)['id'])
+
+    for category_id in created_categories:
+        client.open(f'/api/categories/{category_id}', method='DELETE')
+    wall = time.perf_counter() - started
+    total_requests = sum(len(s.latencies) for s in stats.values())
+    return {
+        'wall_seconds': round(wall, 3),
+        'total_requests': total_requests,
+        'throughput_rps': round(total_requests / wall, 1) if wall else None,
+        'routes': {name: s.summary(counter is not None) for name, s in stats.items()}
+    }
+
+
+def start_gunicorn(workers, port, env):
+    process = subprocess.Popen(
+        ['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    import requests
+    deadline = time.time() + 30
+    while time.time() < deadline and process.poll() is None:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/api/generate-password', timeout=5)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start within 30 seconds')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Windkey API against synthetic vaults')
+    parser.add_argument('--vault-sizes', default=DEFAULT_VAULT_SIZES,
+                        help='comma separated entries per vault (default: %(default)s)')
+    parser.add_argument('--categories', type=int, default=10, help='categories per user')
+    parser.add_argument('--history-depth', type=int, default=1000, help='history rows per user')
+    parser.add_argument('--iterations', type=int, default=50, help='scenario repetitions per vault')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured scenario repetitions')
+    parser.add_argument('--include-breach', action='store_true',
+                        help='also hit the breach endpoints (needs network or PWNED_INDEX_FILE)')
+    parser.add_argument('--gunicorn', type=int, metavar='WORKERS', default=0,
+                        help='run against gunicorn with this many workers instead of in-process')
+    parser.add_argument('--port', type=int, default=5055, help='port for --gunicorn')
+    parser.add_argument('--database', help='SQLite file to use (default: a temporary file)')
+    parser.add_argument('--expect-search', choices=('fts5', 'like'), default='fts5',
+                        help='search implementation the run must measure (default: %(default)s)')
+    parser.add_argument('--output', default='bench-results.json', help='where to write the results')
+    args = parser.parse_args()
+
+    # The app reads DATABASE_URL at import time, so it must be set first
+    workdir = tempfile.mkdtemp(prefix='windkey-bench-')
+    database = os.path.abspath(args.database or os.path.join(workdir, 'bench.db'))
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+
+    from flask_migrate import upgrade
+    from app import app, db, User, Password
+    from bench.synthetic import create_user, login
+    from search import detect_search_index
+
+    with app.app_context():
+        upgrade()
+        # Fails instead of silently timing the LIKE fallback (e.g. SQLite without FTS5)
+        search = 'fts5' if detect_search_index(db.engine) else 'like'
+    if search != args.expect_search:
+        raise SystemExit(f"Search would use {search}, expected {args.expect_search} (see --expect-search)")
+
+    vault_sizes = [int(size) for size in args.vault_sizes.split(',') if size.strip()]
+    results = {
+        'started_at': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'mode': f'gunicorn x{args.gunicorn}' if args.gunicorn else 'in-process',
+        'database': database,
+        'iterations': args.iterations,
+        'search': search,
+        'runs': []
+    }
+
+    users = []
+    for index, size in enumerate(vault_sizes):
+        print(f"Generating vault with {size} entries...")
+        t0 = time.perf_counter()
+        with app.app_context():
+            email, password, secret = create_user(
+                f'bench-{size}-{int(time.time())}-{index}@example.com', BENCH_PASSWORD, size,
+                categories=args.categories, history_depth=args.history_depth, seed=index
+            )
+            user_id = User.query.filter_by(email=email).first().id
+            ids = db.session.execute(
+                db.select(Password.id).where(Password.user_id == user_id).order_by(Password.id).limit(50)
+            ).scalars().all()
+        users.append((size, email, password, secret, ids, round(time.perf_counter() - t0, 3)))
+
+    gunicorn = None
+    counter = None
+    if args.gunicorn:
+        gunicorn = start_gunicorn(args.gunicorn, args.port, dict(os.environ, BREACH_SCAN='false'))
+    else:
+        app.config['TESTING'] = True
+        with app.app_context():
+            counter = QueryCounter(db.engine)
+
+    try:
+        for size, email, password, secret, ids, generation_seconds in users:
+            if len(ids) < 2:
+                print(f"Skipping vault with {size} entries (need at least 2)")
+                continue
+            if gunicorn:
+                client = HttpClient(f'http://127.0.0.1:{args.port}')
+            else:
+                client = app.test_client()
+            login(client, email, password, secret)
+
+            print(f"Running scenario against {size} entries...")
+            run_scenario(client, ids, args.warmup, args.include_breach)
+            run = run_scenario(client, ids, args.iterations, args.include_breach, counter)
+            run.update({'vault_size': size, 'generation_seconds': generation_seconds})
+            results['runs'].append(run)
+    finally:
+        if gunicorn:
+            gunicorn.terminate()
+            gunicorn.wait()
+
+    # Only the benchmark process itself is covered in gunicorn mode
+    results['peak_rss_kb'] = peak_rss_kb()
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import platform
+import timeit
+from datetime import datetime
+
+# Micro-Benchmarks für die Hot Paths einzelner Requests
+#
+# Run from the backend directory:
+#   python -m bench.micro --output bench-micro.json
+#
+# Each benchmark reports the best and median time per call over several
+# repeats, so results from different machines stay comparable.
+
+
+def measure(fn, repeat, min_time=0.2):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    # autorange aims for 0.2s; scale up when a longer run was requested
+    number = max(1, int(number * min_time / 0.2))
+    timings = sorted(t / number for t in timer.repeat(repeat=repeat, number=number))
+    return {
+        'calls_per_repeat': number,
+        'best_us': round(timings[0] * 1e6, 3),
+        'median_us': round(timings[len(timings) // 2] * 1e6, 3),
+        'ops_per_second': round(1 / timings[len(timings) // 2], 1)
+    }
+
+
+def listing_payload(entries):
+    # Shape of one metadata page from GET /api/passwords
+    now = datetime.utcnow().isoformat()
+    return [{
+        'id': i,
+        'title': f'example.com account {i}',
+        'url': f'https://example.com/login/{i}',
+        'domain': 'example.com',
+        'notes': f'Synthetic entry {i}',
+        'category_id': i % 10,
+        'created_at': now,
+        'updated_at': now
+    } for i in range(entries)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark Windkey hot paths')
+    parser.add_argument('--repeat', type=int, default=5, help='repeats per benchmark')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per repeat')
+    parser.add_argument('--listing-size', type=int, default=1000, help='entries in the JSON benchmark')
+    parser.add_argument('--skip-hashing', action='store_true', help='skip the slow login hash benchmarks')
+    parser.add_argument('--output', default='bench-micro.json', help='where to write the results')
+    args = parser.parse_args()
+
+    # The routes are only needed for generate_password; no data is touched
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    from flask import json as flask_json
+    from werkzeug.security import generate_password_hash
+    from app import app
+    from cryptography.fernet import Fernet
+    from crypto import cipher_suite, password_fingerprint, read_keys
+    from hashing import hash_password, verify_password, PASSWORD_HASH_METHOD
+    import routes
+
+    secret = b'Correct-Horse-Battery-Staple-42'
+    token = cipher_suite.encrypt(secret)
+    # Legacy rows, for comparison with the compact v2 format
+    fernet = Fernet(read_keys()[0])
+    fernet_token = fernet.encrypt(secret)
+    payload = listing_payload(args.listing_size)
+
+    benchmarks = {
+        'v2_encrypt': lambda: cipher_suite.encrypt(secret),
+        'v2_decrypt': lambda: cipher_suite.decrypt(token),
+        'fernet_encrypt': lambda: fernet.encrypt(secret),
+        'fernet_decrypt': lambda: cipher_suite.decrypt(fernet_token),
+        'password_fingerprint': lambda: password_fingerprint(1, secret.decode()),
+        'json_dumps_listing': lambda: json.dumps(payload),
+        'flask_json_dumps_listing': lambda: flask_json.dumps(payload),
+    }
+
+    def generate():
+        with app.test_request_context('/api/generate-password?length=32'):
+            routes.generate_password()
+    benchmarks['generate_password'] = generate
+
+    if not args.skip_hashing:
+        password_hash = hash_password('bench-password')
+        # In-process baseline next to the process pool used by the app
+        benchmarks['hash_password_inline'] = lambda: generate_password_hash('bench-password', method=PASSWORD_HASH_METHOD)
+        benchmarks['hash_password_pool'] = lambda: hash_password('bench-password')
+        benchmarks['verify_password_pool'] = lambda: verify_password(password_hash, 'bench-password')
+
+    results = {
+        'started_at': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'hash_method': PASSWORD_HASH_METHOD,
+        'listing_size': args.listing_size,
+        'token_bytes': {'v2': len(token), 'fernet': len(fernet_token)},
+        'benchmarks': {}
+    }
+    for name, fn in benchmarks.items():
+        print(f"Running {name}...")
+        results['benchmarks'][name] = measure(fn, args.repeat, args.min_time)
+        print(f"  {results['benchmarks'][name]['median_us']} us/call")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
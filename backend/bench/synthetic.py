@@ -0,0 +1,95 @@
+import random
+import string
+from datetime import datetime, timedelta
+
+import pyotp
+from sqlalchemy import insert
+
+from app import db, User, Category, Password, History
+from crypto import cipher_suite, password_fingerprint
+from domains import registrable_domain
+import sharding
+
+# Synthetischer Tresor für Benchmarks
+SITES = ['google.com', 'github.com', 'amazon.de', 'bank.example.co.uk', 'mail.example.org',
+         'shop.example.com', 'news.example.net', 'cloud.example.io', 'forum.example.de']
+ACTIONS = ['login', 'logout', 'create_password', 'update_password', 'delete_password', 'create_category']
+BATCH_SIZE = 1000
+
+
+def random_password(rng, length=16):
+    return ''.join(rng.choice(string.ascii_letters + string.digits + '!@#$%') for _ in range(length))
+
+
+def create_user(email, password, vault_size, categories=10, history_depth=1000, reuse_ratio=0.1, seed=0):
+    """Create a user with a synthetic vault; returns (email, password, totp secret)."""
+    rng = random.Random(seed)
+    user = User(email=email)
+    user.set_password(password)
+    user.generate_2fa_secret()
+    db.session.add(user)
+    db.session.commit()
+    sharding.assign_user(user.id)
+    sharding.route_user(user.id)
+
+    category_ids = []
+    for i in range(categories):
+        category = Category(user_id=user.id, name=f'Category {i}', icon='Folder', color='#2563EB')
+        db.session.add(category)
+        db.session.flush()
+        category_ids.append(category.id)
+
+    now = datetime.utcnow()
+    shared = [random_password(rng) for _ in range(max(vault_size // 50, 1))]
+    rows = []
+    for i in range(vault_size):
+        site = rng.choice(SITES)
+        url = f'https://{site}/login/{i}'
+        secret = rng.choice(shared) if rng.random() < reuse_ratio else random_password(rng)
+        rows.append({
+            'user_id': user.id,
+            'category_id': rng.choice(category_ids) if category_ids and rng.random() < 0.8 else None,
+            'title': f'{site} account {i}',
+            'encrypted_password': cipher_suite.encrypt(secret.encode()),
+            'password_fingerprint': password_fingerprint(user.id, secret),
+            'url': url,
+            'domain': registrable_domain(url),
+            'notes': f'Synthetic entry {i}',
+            'change_seq': 0,
+            'created_at': now,
+            'updated_at': now
+        })
+        if len(rows) >= BATCH_SIZE:
+            db.session.execute(insert(Password), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Password), rows)
+
+    history = []
+    for i in range(history_depth):
+        history.append({
+            'user_id': user.id,
+            'action': rng.choice(ACTIONS),
+            'details': f'Synthetic event {i}',
+            'ip_address': f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+            'timestamp': now - timedelta(minutes=history_depth - i)
+        })
+        if len(history) >= BATCH_SIZE:
+            db.session.execute(insert(History), history)
+            history = []
+    if history:
+        db.session.execute(insert(History), history)
+
+    db.session.commit()
+    return email, password, user.two_factor_secret
+
+
+def login(client, email, password, secret):
+    # Works with the Flask test client and with requests.Session
+    response = client.post('/api/login', json={
+        'email': email,
+        'password': password,
+        'two_factor_code': pyotp.TOTP(secret).now()
+    })
+    if response.status_code != 200:
+        raise RuntimeError(f'Login failed for {email}: {response.status_code}')
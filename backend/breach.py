@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from breach_index import BreachIndex
+
+# Breach-Check gegen die k-Anonymity Range API von haveibeenpwned
+PWNED_API_URL = os.environ.get('PWNED_API_URL', 'https://api.pwnedpasswords.com/range')
+PWNED_TIMEOUT = float(os.environ.get('PWNED_TIMEOUT', 5))
+PWNED_WORKERS = int(os.environ.get('PWNED_WORKERS', 8))
+PWNED_CACHE_SIZE = int(os.environ.get('PWNED_CACHE_SIZE', 4096))
+PWNED_CACHE_TTL = int(os.environ.get('PWNED_CACHE_TTL', 3600))
+# Optionaler Offline-Index (siehe breach_index.py), ersetzt die API komplett
+PWNED_INDEX_FILE = os.environ.get('PWNED_INDEX_FILE')
+
+
+class BreachCheckError(Exception):
+    pass
+
+
+class RangeCache:
+    """Bounded LRU cache for range responses, shared across users and requests."""
+
+    def __init__(self, max_size=PWNED_CACHE_SIZE, ttl=PWNED_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, prefix):
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is None:
+                return None
+            expires_at, suffixes = entry
+            if expires_at < time.monotonic():
+                del self._entries[prefix]
+                return None
+            self._entries.move_to_end(prefix)
+            return suffixes
+
+    def set(self, prefix, suffixes):
+        with self._lock:
+            self._entries[prefix] = (time.monotonic() + self.ttl, suffixes)
+            self._entries.move_to_end(prefix)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+range_cache = RangeCache()
+
+_session = requests.Session()
+_session.headers.update({
+    'User-Agent': 'Windkey Password Manager',
+    'Add-Padding': 'true'
+})
+_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=PWNED_WORKERS))
+_session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=PWNED_WORKERS))
+_executor = ThreadPoolExecutor(max_workers=PWNED_WORKERS, thread_name_prefix='breach')
+
+
+_local_index = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_index():
+    global _local_index
+    if not PWNED_INDEX_FILE:
+        return None
+    if _local_index is None:
+        with _local_index_lock:
+            if _local_index is None:
+                try:
+                    _local_index = BreachIndex(PWNED_INDEX_FILE)
+                except (OSError, ValueError) as e:
+                    raise BreachCheckError(f'Breach index unavailable: {str(e)}')
+    return _local_index
+
+
+def split_hash(password):
+    sha1_hash = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
+    return sha1_hash[:5], sha1_hash[5:]
+
+
+def parse_range(text):
+    suffixes = {}
+    for line in text.splitlines():
+        hash_suffix, _, count = line.partition(':')
+        count = int(count or 0)
+        # Padding-Einträge haben count 0 und werden ignoriert
+        if count > 0:
+            suffixes[hash_suffix.strip().upper()] = count
+    return suffixes
+
+
+def fetch_range(prefix):
+    local_index = get_local_index()
+    if local_index is not None:
+        return local_index.range(prefix)
+
+    suffixes = range_cache.get(prefix)
+    if suffixes is not None:
+        return suffixes
+
+    try:
+        response = _session.get(f'{PWNED_API_URL}/{prefix}', timeout=PWNED_TIMEOUT)
+    except requests.RequestException as e:
+        raise BreachCheckError(f'API request failed: {str(e)}')
+
+    if response.status_code != 200:
+        raise BreachCheckError('API request failed')
+
+    suffixes = parse_range(response.text)
+    range_cache.set(prefix, suffixes)
+    return suffixes
+
+
+def breach_count(password):
+    prefix, suffix = split_hash(password)
+    local_index = get_local_index()
+    if local_index is not None:
+        return local_index.count(prefix + suffix)
+    return fetch_range(prefix).get(suffix, 0)
+
+
+def breach_counts(passwords, fetch=fetch_range, executor=None):
+    """Return breach counts for a list of passwords, in order.
+
+    Each distinct SHA-1 prefix is requested only once and the distinct
+    prefixes are fetched concurrently over the pooled session. The background
+    scan passes its own executor and a throttled fetch function.
+    """
+    hashes = [split_hash(password) for password in passwords]
+    local_index = get_local_index()
+    if local_index is not None:
+        return [local_index.count(prefix + suffix) for prefix, suffix in hashes]
+
+    prefixes = sorted({prefix for prefix, _ in hashes})
+    ranges = dict(zip(prefixes, (executor or _executor).map(fetch, prefixes)))
+    return [ranges[prefix].get(suffix, 0) for prefix, suffix in hashes]
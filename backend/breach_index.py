@@ -0,0 +1,166 @@
+import argparse
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+# Offline Breach-Index im festen Binärformat
+#
+# Layout:  header | offset table | records
+#   header:       magic (4) + version (4) + record count (8)
+#   offset table: (PREFIX_BUCKETS + 1) x uint64 record index, one bucket per
+#                 5-hex-char SHA-1 prefix (same split as the range API)
+#   records:      sorted SHA-1 digest (20) + uint32 count (4)
+MAGIC = b'WKBI'
+VERSION = 1
+HEADER = struct.Struct('<4sIQ')
+DIGEST_SIZE = 20
+RECORD = struct.Struct('<20sI')
+PREFIX_BITS = 20
+PREFIX_BUCKETS = 1 << PREFIX_BITS
+TABLE_SIZE = (PREFIX_BUCKETS + 1) * 8
+RECORDS_OFFSET = HEADER.size + TABLE_SIZE
+
+
+def _bucket(digest):
+    return int.from_bytes(digest[:3], 'big') >> (24 - PREFIX_BITS)
+
+
+def parse_line(line):
+    hash_hex, _, count = line.strip().partition(b':')
+    if len(hash_hex) != DIGEST_SIZE * 2:
+        return None
+    try:
+        return bytes.fromhex(hash_hex.decode('ascii')), min(int(count or 0), 0xFFFFFFFF)
+    except ValueError:
+        return None
+
+
+def ingest(source_path, output_path, spill_dir=None):
+    """Convert a SHA-1:count dump into a sorted binary index.
+
+    The source is streamed into 256 spill files by first digest byte, so
+    only one spill file has to be sorted in memory at a time.
+    """
+    spill_dir = tempfile.mkdtemp(prefix='windkey-ingest-', dir=spill_dir)
+    try:
+        spill_paths = [os.path.join(spill_dir, f'{i:02x}.bin') for i in range(256)]
+        spills = [open(path, 'wb') for path in spill_paths]
+        try:
+            with open(source_path, 'rb') as src:
+                for line in src:
+                    parsed = parse_line(line)
+                    if parsed is None:
+                        continue
+                    digest, count = parsed
+                    spills[digest[0]].write(RECORD.pack(digest, count))
+        finally:
+            for spill in spills:
+                spill.close()
+
+        bucket_counts = array('Q', bytes(PREFIX_BUCKETS * 8))
+        total = 0
+        tmp_output = output_path + '.tmp'
+        try:
+            with open(tmp_output, 'wb') as out:
+                out.seek(RECORDS_OFFSET)
+                for path in spill_paths:
+                    with open(path, 'rb') as spill:
+                        data = spill.read()
+                    os.remove(path)
+                    records = sorted(data[i:i + RECORD.size] for i in range(0, len(data), RECORD.size))
+                    del data
+
+                    # Doppelte Hashes zusammenfassen (höchster Count gewinnt)
+                    previous = None
+                    for record in records:
+                        digest, count = RECORD.unpack(record)
+                        if previous is not None and previous[0] == digest:
+                            previous = (digest, max(previous[1], count))
+                            continue
+                        if previous is not None:
+                            out.write(RECORD.pack(*previous))
+                            bucket_counts[_bucket(previous[0])] += 1
+                            total += 1
+                        previous = (digest, count)
+                    if previous is not None:
+                        out.write(RECORD.pack(*previous))
+                        bucket_counts[_bucket(previous[0])] += 1
+                        total += 1
+
+                offsets = array('Q', [0])
+                for count in bucket_counts:
+                    offsets.append(offsets[-1] + count)
+                if sys.byteorder != 'little':
+                    offsets.byteswap()
+
+                out.seek(0)
+                out.write(HEADER.pack(MAGIC, VERSION, total))
+                out.write(offsets.tobytes())
+            os.replace(tmp_output, output_path)
+        finally:
+            if os.path.exists(tmp_output):
+                os.remove(tmp_output)
+    finally:
+        # Also after a failed parse or write, and without hiding its error
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    return total
+
+
+class BreachIndex:
+    """Read-only, memory-mapped view of an index built by ingest()."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.total = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a Windkey breach index')
+
+    def _bucket_range(self, bucket):
+        return struct.unpack_from('<QQ', self._mmap, HEADER.size + bucket * 8)
+
+    def count(self, sha1_hex):
+        digest = bytes.fromhex(sha1_hex)
+        lo, hi = self._bucket_range(_bucket(digest))
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = RECORDS_OFFSET + mid * RECORD.size
+            candidate = self._mmap[offset:offset + DIGEST_SIZE]
+            if candidate < digest:
+                lo = mid + 1
+            elif candidate > digest:
+                hi = mid
+            else:
+                return RECORD.unpack_from(self._mmap, offset)[1]
+        return 0
+
+    def range(self, prefix):
+        lo, hi = self._bucket_range(int(prefix, 16))
+        suffixes = {}
+        for index in range(lo, hi):
+            digest, count = RECORD.unpack_from(self._mmap, RECORDS_OFFSET + index * RECORD.size)
+            suffixes[digest.hex().upper()[5:]] = count
+        return suffixes
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the offline breach index from a SHA-1:count dump')
+    parser.add_argument('source', help='Path to the pwned passwords SHA-1 dump')
+    parser.add_argument('output', help='Path of the binary index to write')
+    parser.add_argument('--spill-dir', help='Directory for temporary spill files')
+    args = parser.parse_args()
+
+    print(f"Ingesting {args.source}...")
+    total = ingest(args.source, args.output, args.spill_dir)
+    print(f"Wrote {total} hashes to {args.output}")
@@ -0,0 +1,194 @@
+from app import db, app, Password
+from breach import breach_counts, fetch_range, get_local_index, range_cache, BreachCheckError
+from crypto import cipher_suite
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.fernet import InvalidToken
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, select
+import argparse
+import os
+import sharding
+import threading
+import time
+
+# Hintergrund-Scan gegen die Breach-Datenbank
+#
+# Every entry stores the breach count of its current password and when it was
+# checked; changing the password clears both. A pass first checks entries that
+# were never checked, then re-checks a limited number of the oldest results,
+# because passwords can appear in the source after our last check.
+#
+#   python breach_scan.py run     -> scheduler, one pass every BREACH_SCAN_INTERVAL
+#   python breach_scan.py once    -> a single pass, e.g. from cron
+#   python breach_scan.py status  -> how many entries are pending / due
+BREACH_SCAN_INTERVAL = float(os.environ.get('BREACH_SCAN_INTERVAL', 300))
+BREACH_SCAN_BATCH = int(os.environ.get('BREACH_SCAN_BATCH', 200))  # entries per transaction
+BREACH_SCAN_WORKERS = int(os.environ.get('BREACH_SCAN_WORKERS', 4))  # concurrent range requests
+BREACH_SCAN_RATE = float(os.environ.get('BREACH_SCAN_RATE', 10))  # range requests per second, 0 = unlimited
+BREACH_RECHECK_DAYS = float(os.environ.get('BREACH_RECHECK_DAYS', 30))
+BREACH_RECHECK_LIMIT = int(os.environ.get('BREACH_RECHECK_LIMIT', 500))  # re-checked entries per pass
+
+password_table = Password.__table__
+
+# Compare-and-set on the token, so a result never lands on a password that changed meanwhile.
+# updated_at is kept: a scan is not a change to the entry.
+record_statement = (
+    password_table.update()
+    .where(password_table.c.id == bindparam('row_id'),
+           password_table.c.encrypted_password == bindparam('token'))
+    .values(breach_count=bindparam('count'), breach_checked_at=bindparam('checked_at'),
+            updated_at=password_table.c.updated_at)
+)
+
+
+class Throttle:
+    """Spaces calls at least 1/rate seconds apart, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def record_results(entries, counts, checked_at=None):
+    """Store breach counts for entries (anything with id and encrypted_password) in the current transaction."""
+    checked_at = checked_at or datetime.utcnow()
+    params = [{'row_id': entry.id, 'token': entry.encrypted_password, 'count': count, 'checked_at': checked_at}
+              for entry, count in zip(entries, counts)]
+    if params:
+        db.session.connection().execute(record_statement, params)
+
+
+class BreachScanner:
+    def __init__(self, batch_size=BREACH_SCAN_BATCH, workers=BREACH_SCAN_WORKERS, rate=BREACH_SCAN_RATE,
+                 recheck_days=BREACH_RECHECK_DAYS, recheck_limit=BREACH_RECHECK_LIMIT):
+        self.batch_size = batch_size
+        self.recheck_age = timedelta(days=recheck_days)
+        self.recheck_limit = recheck_limit
+        self.throttle = Throttle(rate)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='breach-scan')
+
+    def fetch(self, prefix):
+        # Only requests that actually go out count against the rate limit
+        if get_local_index() is None and range_cache.get(prefix) is None:
+            self.throttle.wait()
+        return fetch_range(prefix)
+
+    def check(self, rows):
+        checkable, passwords, unreadable = [], [], []
+        for row in rows:
+            try:
+                passwords.append(cipher_suite.decrypt(row.encrypted_password).decode())
+                checkable.append(row)
+            except InvalidToken:
+                # Key no longer in the key file; mark as checked without a result so it is retried later
+                unreadable.append(row)
+
+        counts = breach_counts(passwords, fetch=self.fetch, executor=self.executor)
+        checked_at = datetime.utcnow()
+        record_results(checkable, counts, checked_at)
+        record_results(unreadable, [None] * len(unreadable), checked_at)
+        db.session.commit()
+        return sum(1 for count in counts if count > 0)
+
+    def pending(self, limit):
+        return db.session.execute(
+            select(Password.id, Password.encrypted_password)
+            .where(Password.breach_checked_at.is_(None), Password.encrypted_password.is_not(None))
+            .order_by(Password.id)
+            .limit(limit)
+        ).all()
+
+    def due(self, limit):
+        return db.session.execute(
+            select(Password.id, Password.encrypted_password)
+            .where(Password.breach_checked_at < datetime.utcnow() - self.recheck_age,
+                   Password.encrypted_password.is_not(None))
+            .order_by(Password.breach_checked_at)
+            .limit(limit)
+        ).all()
+
+    def scan(self):
+        """One pass over every database that holds entries (see sharding.py)."""
+        totals = [0, 0, 0]
+        for shard in sharding.shard_names():
+            with sharding.use_shard(shard):
+                totals = [a + b for a, b in zip(totals, self.scan_shard())]
+        return tuple(totals)
+
+    def scan_shard(self):
+        """All pending entries, then up to recheck_limit of the oldest results."""
+        checked = breached = 0
+        while True:
+            rows = self.pending(self.batch_size)
+            if not rows:
+                break
+            breached += self.check(rows)
+            checked += len(rows)
+
+        rechecked = 0
+        while rechecked < self.recheck_limit:
+            rows = self.due(min(self.batch_size, self.recheck_limit - rechecked))
+            if not rows:
+                break
+            breached += self.check(rows)
+            rechecked += len(rows)
+        return checked, rechecked, breached
+
+
+def scan_once(scanner=None):
+    with app.app_context():
+        checked, rechecked, breached = (scanner or BreachScanner()).scan()
+        print(f"Checked {checked} changed and {rechecked} older entries, {breached} breached.")
+
+def run(interval=BREACH_SCAN_INTERVAL):
+    scanner = BreachScanner()
+    while True:
+        started = time.monotonic()
+        try:
+            scan_once(scanner)
+        except BreachCheckError as e:
+            # Source unreachable; the next pass continues where this one stopped
+            print(f"Breach scan interrupted: {str(e)}")
+        except Exception as e:
+            # E.g. "database is locked" under write load; the scheduler must outlive a bad pass
+            print(f"Breach scan failed: {e.__class__.__name__}: {str(e)}")
+            with app.app_context():
+                db.session.rollback()
+        time.sleep(max(0, interval - (time.monotonic() - started)))
+
+def show_status():
+    with app.app_context():
+        server_side = Password.encrypted_password.is_not(None)
+        pending = due = breached = 0
+        for shard in sharding.shard_names():
+            with sharding.use_shard(shard):
+                pending += Password.query.filter(server_side, Password.breach_checked_at.is_(None)).count()
+                due += Password.query.filter(
+                    server_side, Password.breach_checked_at < datetime.utcnow() - timedelta(days=BREACH_RECHECK_DAYS)
+                ).count()
+                breached += Password.query.filter(server_side, Password.breach_count > 0).count()
+        print(f"{pending} pending, {due} due for re-check, {breached} breached")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check vault entries against the breach source in the background')
+    parser.add_argument('command', choices=['run', 'once', 'status'])
+    parser.add_argument('--interval', type=float, default=BREACH_SCAN_INTERVAL, help='Seconds between passes')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args.interval)
+    elif args.command == 'once':
+        scan_once()
+    else:
+        show_status()
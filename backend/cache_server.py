@@ -0,0 +1,68 @@
+import argparse
+import socketserver
+
+from listing_cache import MemoryCacheBackend, LISTING_CACHE_BYTES, LISTING_CACHE_MAX_ITEM_BYTES, LISTING_CACHE_SERVER
+
+# Lokaler Cache-Server für mehrere gunicorn-Worker
+#
+# A stand-in for memcached that speaks the subset of its text protocol the
+# listing cache uses (get, set, delete), backed by the same size-bounded LRU
+# as the in-process cache. gunicorn.conf.py starts it next to the workers; a
+# real memcached can take its place via LISTING_CACHE_SERVER.
+#
+#   python cache_server.py [--bind 127.0.0.1:11311] [--max-bytes N]
+#
+# Cached listings contain vault metadata, so only bind it to loopback.
+
+
+class CacheRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        store = self.server.store
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.split()
+            command = parts[0] if parts else b''
+
+            if command == b'get':
+                for key in parts[1:]:
+                    value = store.get(key)
+                    if value is not None:
+                        self.wfile.write(b'VALUE %s 0 %d\r\n%s\r\n' % (key, len(value), value))
+                self.wfile.write(b'END\r\n')
+            elif command == b'set' and len(parts) >= 5:
+                key, ttl, length = parts[1], int(parts[3]), int(parts[4])
+                value = self.rfile.read(length + 2)[:-2]
+                stored = store.set(key, value, ttl)
+                if parts[-1] != b'noreply':
+                    self.wfile.write(b'STORED\r\n' if stored else b'SERVER_ERROR object too large for cache\r\n')
+            elif command == b'delete' and len(parts) >= 2:
+                deleted = store.delete(parts[1])
+                if parts[-1] != b'noreply':
+                    self.wfile.write(b'DELETED\r\n' if deleted else b'NOT_FOUND\r\n')
+            elif command == b'quit':
+                return
+            else:
+                self.wfile.write(b'ERROR\r\n')
+
+
+class CacheServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, max_bytes=LISTING_CACHE_BYTES, max_item_bytes=LISTING_CACHE_MAX_ITEM_BYTES):
+        self.store = MemoryCacheBackend(max_bytes, max_item_bytes)
+        super().__init__(address, CacheRequestHandler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shared listing cache for gunicorn workers')
+    parser.add_argument('--bind', default=LISTING_CACHE_SERVER, help='host:port (default: %(default)s)')
+    parser.add_argument('--max-bytes', type=int, default=LISTING_CACHE_BYTES, help='total size of cached values')
+    args = parser.parse_args()
+
+    host, _, port = args.bind.rpartition(':')
+    with CacheServer((host, int(port)), args.max_bytes) as server:
+        print(f"Listing cache server listening on {args.bind}")
+        server.serve_forever()
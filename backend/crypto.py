@@ -1,19 +1,160 @@
-from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+import base64
 import os
-from base64 import b64encode
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from metrics import CIPHER_SECONDS
 
 # Verschlüsselungshelfer
+#
+# encryption.key holds one Fernet key per line. The first key encrypts, all
+# keys decrypt (MultiFernet). Workers reload the file when it changes, so keys
+# can be rotated while the service is running (see rotate_keys.py).
+#
+# Stored passwords use a compact binary format (v2):
+#   0x02 | key id (4) | nonce (12) | AES-256-GCM ciphertext + tag (16)
+# The AES key is derived from the Fernet key with HKDF, so the same key file
+# and rotation steps apply. Fernet tokens always start with "g" (base64 of
+# 0x80), so old rows stay readable and are rewritten on the next write or by
+# `python rotate_keys.py compact`. CIPHERTEXT_FORMAT=fernet keeps writing
+# Fernet tokens, e.g. while older workers that cannot read v2 are still running.
 ENCRYPTION_KEY_FILE = 'encryption.key'
+KEY_RELOAD_INTERVAL = float(os.environ.get('KEY_RELOAD_INTERVAL', 5))
+CIPHERTEXT_FORMAT = os.environ.get('CIPHERTEXT_FORMAT', 'v2')
+V2_VERSION = b'\x02'
+V2_HEADER_SIZE = 5  # version byte + key id
+V2_NONCE_SIZE = 12
+
+def read_keys():
+    with open(ENCRYPTION_KEY_FILE, 'rb') as f:
+        return [line.strip() for line in f.read().splitlines() if line.strip()]
+
+def write_keys(keys):
+    tmp_file = ENCRYPTION_KEY_FILE + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(b'\n'.join(keys) + b'\n')
+    os.replace(tmp_file, ENCRYPTION_KEY_FILE)
+
+def get_or_create_keys():
+    if not os.path.exists(ENCRYPTION_KEY_FILE):
+        write_keys([Fernet.generate_key()])
+    return read_keys()
+
+def key_id(key):
+    # Short, non-secret identifier for a key (used for rotation checkpoints)
+    return hashlib.sha256(key).hexdigest()[:16]
+
+def v2_cipher(key):
+    # Header bytes and AES-GCM instance for a Fernet key from the key file
+    aes_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                   info=b'windkey-v2-aes-gcm').derive(base64.urlsafe_b64decode(key))
+    return V2_VERSION + hashlib.sha256(key).digest()[:4], AESGCM(aes_key)
+
+def is_v2(token):
+    return token[:1] == V2_VERSION
+
+class KeyRing:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0
+        self._mtime = None
+        self._load()
+
+    def _load(self):
+        keys = get_or_create_keys()
+        self.keys = keys
+        self.primary_key_id = key_id(keys[0])
+        self._fernet = MultiFernet([Fernet(key) for key in keys])
+        ciphers = [v2_cipher(key) for key in keys]
+        self._v2_primary = ciphers[0]
+        self._v2_ciphers = dict(ciphers)
+        self._mtime = os.path.getmtime(ENCRYPTION_KEY_FILE)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < KEY_RELOAD_INTERVAL:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                if os.path.getmtime(ENCRYPTION_KEY_FILE) != self._mtime:
+                    self._load()
+            except (OSError, ValueError) as e:
+                print(f"Failed to reload encryption keys: {str(e)}")
 
-def get_or_create_key():
-    if os.path.exists(ENCRYPTION_KEY_FILE):
-        with open(ENCRYPTION_KEY_FILE, 'rb') as f:
+    def _encrypt(self, data):
+        if CIPHERTEXT_FORMAT == 'fernet':
+            return self._fernet.encrypt(data)
+        header, aesgcm = self._v2_primary
+        nonce = os.urandom(V2_NONCE_SIZE)
+        # The header is authenticated, so the version and key id cannot be swapped
+        return header + nonce + aesgcm.encrypt(nonce, data, header)
+
+    def _decrypt(self, token):
+        if not is_v2(token):
+            return self._fernet.decrypt(token)
+        header = bytes(token[:V2_HEADER_SIZE])
+        aesgcm = self._v2_ciphers.get(header)
+        if aesgcm is None:
+            raise InvalidToken
+        nonce = token[V2_HEADER_SIZE:V2_HEADER_SIZE + V2_NONCE_SIZE]
+        try:
+            return aesgcm.decrypt(nonce, token[V2_HEADER_SIZE + V2_NONCE_SIZE:], header)
+        except InvalidTag:
+            raise InvalidToken
+
+    def encrypt(self, data):
+        self._maybe_reload()
+        with _encrypt_seconds.time():
+            return self._encrypt(data)
+
+    def decrypt(self, token):
+        self._maybe_reload()
+        with (_decrypt_v2_seconds if is_v2(token) else _decrypt_fernet_seconds).time():
+            return self._decrypt(token)
+
+    def rotate(self, token):
+        # Re-encrypt a token under the primary key, in the current format
+        self._maybe_reload()
+        with _rotate_seconds.time():
+            return self._encrypt(self._decrypt(token))
+
+    def needs_rewrite(self, token):
+        """True if the token is not in the format written today (e.g. an old Fernet token)."""
+        return CIPHERTEXT_FORMAT != 'fernet' and not is_v2(token)
+
+# Label lookups are resolved once, not on every call
+_encrypt_seconds = CIPHER_SECONDS.labels('encrypt', CIPHERTEXT_FORMAT)
+_decrypt_v2_seconds = CIPHER_SECONDS.labels('decrypt', 'v2')
+_decrypt_fernet_seconds = CIPHER_SECONDS.labels('decrypt', 'fernet')
+_rotate_seconds = CIPHER_SECONDS.labels('rotate', CIPHERTEXT_FORMAT)
+
+cipher_suite = KeyRing()
+
+# Schlüssel für Passwort-Fingerprints (Wiederverwendungs-Erkennung ohne Entschlüsselung)
+FINGERPRINT_KEY_FILE = 'fingerprint.key'
+
+def get_or_create_fingerprint_key():
+    if os.path.exists(FINGERPRINT_KEY_FILE):
+        with open(FINGERPRINT_KEY_FILE, 'rb') as f:
             return f.read()
     else:
-        key = Fernet.generate_key()
-        with open(ENCRYPTION_KEY_FILE, 'wb') as f:
+        key = secrets.token_bytes(32)
+        with open(FINGERPRINT_KEY_FILE, 'wb') as f:
             f.write(key)
         return key
 
-encryption_key = get_or_create_key()
-cipher_suite = Fernet(encryption_key)
+fingerprint_key = get_or_create_fingerprint_key()
+
+def password_fingerprint(user_id, password):
+    # Keyed and scoped per user, so equal passwords of different users don't match
+    message = f'{user_id}:'.encode() + password.encode('utf-8')
+    return hmac.new(fingerprint_key, message, hashlib.sha256).hexdigest()
@@ -0,0 +1,48 @@
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Datenbank-Profil (über .env konfigurierbar)
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///windkey.db')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),  # negative = KiB
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
+
+def engine_options(database_url=DATABASE_URL):
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+    }
+    if database_url.startswith('sqlite'):
+        # The Python driver's own busy handler would otherwise cap waits at 5s
+        options['connect_args'] = {
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            'check_same_thread': False
+        }
+        if ':memory:' in database_url or database_url in ('sqlite://', 'sqlite:///'):
+            # In-memory databases live in a single connection
+            return {'connect_args': options['connect_args']}
+    else:
+        options['pool_pre_ping'] = True
+    return options
+
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
@@ -0,0 +1,112 @@
+import ipaddress
+import os
+from urllib.parse import urlsplit
+
+import sqlalchemy as sa
+
+# Registrierbare Domain für Autofill (Public Suffix List)
+#
+# data/public_suffix_list.dat is the complete list from publicsuffix.org,
+# ICANN and private sections; update_suffix_list.py refreshes it and the
+# domains stored with the entries.
+PUBLIC_SUFFIX_LIST = os.environ.get(
+    'PUBLIC_SUFFIX_LIST',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'public_suffix_list.dat')
+)
+
+
+def load_public_suffixes(path):
+    rules, wildcards, exceptions = set(), set(), set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            rule = line.strip().lower()
+            if not rule or rule.startswith('//'):
+                continue
+            if rule.startswith('!'):
+                exceptions.add(rule[1:])
+            elif rule.startswith('*.'):
+                wildcards.add(rule[2:])
+            else:
+                rules.add(rule)
+    return rules, wildcards, exceptions
+
+
+# Loaded once when the app starts
+_rules, _wildcards, _exceptions = load_public_suffixes(PUBLIC_SUFFIX_LIST)
+
+
+def reload(path=PUBLIC_SUFFIX_LIST):
+    global _rules, _wildcards, _exceptions
+    _rules, _wildcards, _exceptions = load_public_suffixes(path)
+
+
+def hostname(url):
+    if not url:
+        return ''
+    url = url.strip()
+    if '://' not in url:
+        url = 'http://' + url
+    try:
+        host = urlsplit(url).hostname or ''
+    except ValueError:
+        return ''
+    return host.rstrip('.').lower()
+
+
+def public_suffix_length(labels):
+    # Number of trailing labels that form the public suffix
+    for i in range(len(labels)):
+        candidate = '.'.join(labels[i:])
+        if candidate in _exceptions:
+            return len(labels) - i - 1
+        if candidate in _rules:
+            return len(labels) - i
+        if i + 1 < len(labels) and '.'.join(labels[i + 1:]) in _wildcards:
+            return len(labels) - i
+    # Not on the list: no registrable domain is known (the PSL's default "*" rule is not applied)
+    return None
+
+
+def registrable_domain(url):
+    """Return the registrable domain of a URL (e.g. mail.google.co.uk -> google.co.uk).
+
+    Hosts whose suffix is not on the list are returned unchanged, so they only
+    ever match themselves instead of every site under the same last label.
+    """
+    host = hostname(url)
+    if not host:
+        return ''
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+
+    labels = host.split('.')
+    suffix_length = public_suffix_length(labels)
+    if suffix_length is None or suffix_length >= len(labels):
+        return host
+    return '.'.join(labels[-(suffix_length + 1):])
+
+
+def refresh_stored_domains(connection, batch_size=500):
+    """Recompute password.domain with the loaded list; returns the number of changed entries."""
+    password = sa.table('password', sa.column('id', sa.Integer), sa.column('url', sa.String),
+                        sa.column('domain', sa.String))
+    last_id = 0
+    changed = 0
+    while True:
+        rows = connection.execute(
+            sa.select(password.c.id, password.c.url, password.c.domain)
+            .where(password.c.id > last_id)
+            .order_by(password.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return changed
+        for row in rows:
+            domain = registrable_domain(row.url)
+            if domain != row.domain:
+                connection.execute(password.update().where(password.c.id == row.id).values(domain=domain))
+                changed += 1
+        last_id = rows[-1].id
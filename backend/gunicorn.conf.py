@@ -0,0 +1,72 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+# Gunicorn-Konfiguration (wird automatisch aus dem Arbeitsverzeichnis geladen)
+#
+# Workers share their Prometheus samples through PROMETHEUS_MULTIPROC_DIR so
+# that /metrics reports totals for the whole server, not a single worker.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'windkey-metrics'))
+
+# The breach scan runs as one separate process next to the workers, so that
+# several workers do not scan the same entries (BREACH_SCAN=false disables it)
+BREACH_SCAN = os.environ.get('BREACH_SCAN', 'true').lower() == 'true'
+
+# An in-process listing cache would miss invalidations made by other workers,
+# so workers share one cache server unless LISTING_CACHE says otherwise
+os.environ.setdefault('LISTING_CACHE', 'server')
+
+# Helper processes are started again when they exit, e.g. after a crash
+HELPER_RESTART_DELAY = float(os.environ.get('HELPER_RESTART_DELAY', 5))
+helpers = {}  # name -> currently running process
+helpers_lock = threading.Lock()
+stopping = threading.Event()
+
+
+def supervise(name, args):
+    def run():
+        while True:
+            with helpers_lock:
+                if stopping.is_set():
+                    return
+                process = helpers[name] = subprocess.Popen(args)
+            returncode = process.wait()
+            if stopping.is_set():
+                return
+            print(f"{name} exited with code {returncode}, restarting in {HELPER_RESTART_DELAY}s")
+            stopping.wait(HELPER_RESTART_DELAY)
+
+    threading.Thread(target=run, name=f'supervise-{name}', daemon=True).start()
+
+
+def on_starting(server):
+    # Samples of a previous run would otherwise be added to the new totals
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def when_ready(server):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    if os.environ['LISTING_CACHE'] == 'server' and 'LISTING_CACHE_SERVER' not in os.environ:
+        # An explicit LISTING_CACHE_SERVER points at a cache server run elsewhere (e.g. memcached)
+        supervise('cache_server', [sys.executable, os.path.join(directory, 'cache_server.py')])
+    if BREACH_SCAN:
+        supervise('breach_scan', [sys.executable, os.path.join(directory, 'breach_scan.py'), 'run'])
+
+
+def on_exit(server):
+    with helpers_lock:
+        stopping.set()
+        processes = list(helpers.values())
+    for process in processes:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
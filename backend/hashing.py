@@ -0,0 +1,70 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from metrics import HASH_SECONDS, HASH_REJECTED
+
+# Master-Passwort Hashing außerhalb des Request-Threads
+#
+# PASSWORD_HASH_METHOD takes a werkzeug method string, e.g. "scrypt:32768:8:1"
+# or "pbkdf2:sha256:600000". Hashes made with other parameters are upgraded on
+# the next successful login (see needs_rehash).
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 16))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+
+class HashingBusy(Exception):
+    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE_LIMIT)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+    return _executor
+
+
+def _run(operation, fn, *args):
+    # Reject instead of queueing without bound when all slots are taken
+    if not _slots.acquire(blocking=False):
+        HASH_REJECTED.inc()
+        raise HashingBusy('Too many concurrent password hash operations')
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # The slot is held until the hash is done, even if the caller stopped waiting
+    future.add_done_callback(lambda _: _slots.release())
+    with HASH_SECONDS.labels(operation).time():
+        try:
+            return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            HASH_REJECTED.inc()
+            raise HashingBusy('Password hash operation timed out')
+
+
+def hash_password(password):
+    return _run('hash', generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(password_hash, password):
+    if not password_hash:
+        return False
+    return _run('verify', check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != PASSWORD_HASH_METHOD
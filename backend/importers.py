@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+import os
+
+# Parser für Exporte anderer Passwort-Manager
+#
+# Every parser yields dicts with title, url, username, password, notes and
+# folder. CSV exports are read row by row from the uploaded stream.
+#
+# Bitwarden's JSON export is a single document that has to be parsed as a
+# whole, so it is limited to BITWARDEN_JSON_MAX_BYTES (a vault of 10000
+# entries is a few MB); larger vaults can be imported from the CSV export.
+BITWARDEN_JSON_MAX_BYTES = int(os.environ.get('BITWARDEN_JSON_MAX_BYTES', 32 * 1024 * 1024))
+CSV_FORMATS = {
+    'bitwarden_csv': {'login_password', 'login_uri', 'name'},
+    'lastpass': {'url', 'username', 'password', 'extra', 'name', 'grouping'},
+    'chrome': {'name', 'url', 'username', 'password'},
+}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _entry(title, url, username, password, notes, folder):
+    return {
+        'title': (title or url or 'Untitled')[:100],
+        'url': (url or '')[:500],
+        'username': username or '',
+        'password': password or '',
+        'notes': notes or '',
+        'folder': folder or None
+    }
+
+
+def detect_csv_format(header):
+    columns = {column.strip().lower() for column in header}
+    # Spezifischste Formate zuerst prüfen
+    for name in ('bitwarden_csv', 'lastpass', 'chrome'):
+        if CSV_FORMATS[name] <= columns:
+            return name
+    raise ImportFormatError('Unknown CSV export format')
+
+
+def parse_csv(stream, format_name=None):
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    header = next(reader, None)
+    if header is None:
+        return
+    format_name = format_name or detect_csv_format(header)
+    columns = [column.strip().lower() for column in header]
+
+    for row in reader:
+        if not any(row):
+            continue
+        record = dict(zip(columns, row))
+        if format_name == 'bitwarden_csv':
+            if record.get('type', 'login') != 'login':
+                continue
+            yield _entry(record.get('name'), record.get('login_uri'), record.get('login_username'),
+                         record.get('login_password'), record.get('notes'), record.get('folder'))
+        elif format_name == 'lastpass':
+            # LastPass exportiert sichere Notizen mit der Pseudo-URL http://sn
+            if record.get('url') == 'http://sn':
+                continue
+            yield _entry(record.get('name'), record.get('url'), record.get('username'),
+                         record.get('password'), record.get('extra'), record.get('grouping'))
+        else:
+            yield _entry(record.get('name'), record.get('url'), record.get('username'),
+                         record.get('password'), record.get('note'), None)
+
+
+def parse_bitwarden_json(stream):
+    # Read one byte past the limit to tell a full-sized export from a larger one
+    document = stream.read(BITWARDEN_JSON_MAX_BYTES + 1)
+    if len(document) > BITWARDEN_JSON_MAX_BYTES:
+        raise ImportFormatError(f'Bitwarden JSON exports are limited to {BITWARDEN_JSON_MAX_BYTES // (1024 * 1024)} MB, '
+                                'use the CSV export instead')
+    try:
+        export = json.loads(document.decode('utf-8-sig'))
+    except ValueError:
+        raise ImportFormatError('Invalid Bitwarden JSON export')
+    if not isinstance(export, dict):
+        raise ImportFormatError('Invalid Bitwarden JSON export')
+    if export.get('encrypted'):
+        raise ImportFormatError('Encrypted Bitwarden exports are not supported')
+
+    folders = {folder['id']: folder['name'] for folder in export.get('folders', [])}
+    for item in export.get('items', []):
+        login = item.get('login')
+        if item.get('type') != 1 or not login:
+            continue
+        uris = login.get('uris') or []
+        yield _entry(item.get('name'), uris[0].get('uri') if uris else None, login.get('username'),
+                     login.get('password'), item.get('notes'), folders.get(item.get('folderId')))
+
+
+def parse_export(stream, format_name=None):
+    if format_name == 'bitwarden_json':
+        return parse_bitwarden_json(stream)
+    if format_name and format_name not in CSV_FORMATS:
+        raise ImportFormatError(f'Unsupported import format: {format_name}')
+    return parse_csv(stream, format_name)
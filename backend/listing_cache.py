@@ -0,0 +1,238 @@
+import hashlib
+import importlib
+import os
+import secrets
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+# Read-through-Cache für Kategorielisten und Metadaten-Listings
+#
+# GET /api/categories and the metadata listing of GET /api/passwords are served
+# from cached JSON bodies until one of the user's writes invalidates them.
+# Plain-text passwords and client ciphertext are never cached.
+#
+# Every (kind, user) has a generation token that is part of the cache key;
+# invalidating replaces the token, so all variants (sort, page, filter) of
+# that listing become unreachable at once. The token is read before the
+# database, so a listing built from rows older than a write is always filed
+# under a token that the write has already replaced. If replacing the token
+# fails (e.g. the cache server is unreachable), this worker bypasses the cache
+# for that listing and retries until the replacement succeeds.
+#
+# LISTING_CACHE selects the backend:
+#   memory       LRU in this process (default; single worker / development)
+#   server       a cache server shared by all workers (memcached text protocol,
+#                see cache_server.py); gunicorn.conf.py starts one and makes
+#                this the default under gunicorn
+#   off          no caching
+#   module:name  any factory returning an object with get/set/delete
+LISTING_CACHE = os.environ.get('LISTING_CACHE', 'memory')
+LISTING_CACHE_SERVER = os.environ.get('LISTING_CACHE_SERVER', '127.0.0.1:11311')
+LISTING_CACHE_BYTES = int(os.environ.get('LISTING_CACHE_BYTES', 64 * 1024 * 1024))
+LISTING_CACHE_MAX_ITEM_BYTES = int(os.environ.get('LISTING_CACHE_MAX_ITEM_BYTES', 1024 * 1024))
+# Upper bound for entries that were not invalidated, e.g. after writes by maintenance scripts
+LISTING_CACHE_TTL = int(os.environ.get('LISTING_CACHE_TTL', 300))
+SERVER_TIMEOUT = 0.5  # seconds per request to the cache server
+SERVER_RETRY_INTERVAL = 5  # seconds to bypass an unreachable cache server
+
+CATEGORIES = 'categories'
+PASSWORDS = 'passwords'
+
+
+class MemoryCacheBackend:
+    """LRU of byte strings, bounded by their total size."""
+
+    def __init__(self, max_bytes=LISTING_CACHE_BYTES, max_item_bytes=LISTING_CACHE_MAX_ITEM_BYTES):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl=0):
+        if len(value) > self.max_item_bytes:
+            return False
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, expires_at)
+            self.size += len(key) + len(value)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                metrics.LISTING_CACHE_EVICTIONS.inc()
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            return self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size -= len(key) + len(entry[0])
+        return True
+
+
+class CacheServerBackend:
+    """Client for a cache server speaking the memcached text protocol (get/set/delete).
+
+    The cache must never fail a request: while the server is unreachable every
+    lookup is a miss and writes are dropped.
+    """
+
+    def __init__(self, address=LISTING_CACHE_SERVER, timeout=SERVER_TIMEOUT):
+        host, _, port = address.rpartition(':')
+        self.address = (host, int(port))
+        self.timeout = timeout
+        self._local = threading.local()
+        self._down_until = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = self._local.connection = (sock, sock.makefile('rb'))
+        return connection
+
+    def _close(self):
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+
+    def _request(self, command, read_response):
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            sock, reader = self._connection()
+            sock.sendall(command)
+            return read_response(reader)
+        except (OSError, ValueError) as e:
+            self._close()
+            self._down_until = time.monotonic() + SERVER_RETRY_INTERVAL
+            print(f"Listing cache server {self.address[0]}:{self.address[1]} unavailable: {str(e)}")
+            return None
+
+    @staticmethod
+    def _read_line(reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ValueError('Connection closed by cache server')
+        return line[:-2]
+
+    def get(self, key):
+        def read_value(reader):
+            value = None
+            while True:
+                line = self._read_line(reader)
+                if line == b'END':
+                    return value
+                if not line.startswith(b'VALUE '):
+                    raise ValueError(f'Unexpected reply {line[:40]!r}')
+                length = int(line.split()[3])
+                value = reader.read(length + 2)[:-2]
+        return self._request(f'get {key}\r\n'.encode(), read_value)
+
+    def set(self, key, value, ttl=0):
+        command = f'set {key} 0 {int(ttl)} {len(value)}\r\n'.encode() + value + b'\r\n'
+        return self._request(command, lambda reader: self._read_line(reader) == b'STORED') or False
+
+    def delete(self, key):
+        return self._request(f'delete {key}\r\n'.encode(),
+                             lambda reader: self._read_line(reader) == b'DELETED') or False
+
+
+def create_backend():
+    if LISTING_CACHE == 'off':
+        return None
+    if LISTING_CACHE == 'memory':
+        return MemoryCacheBackend()
+    if LISTING_CACHE == 'server':
+        return CacheServerBackend()
+    module_name, _, factory = LISTING_CACHE.partition(':')
+    return getattr(importlib.import_module(module_name), factory or 'create_backend')()
+
+
+class ListingCache:
+    def __init__(self, backend, ttl=LISTING_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._pending = set()  # (kind, user_id) whose invalidation has not reached the backend yet
+        self._pending_lock = threading.Lock()
+
+    def _generation(self, kind, user_id):
+        key = f'windkey:gen:{kind}:{user_id}'
+        generation = self.backend.get(key)
+        if generation is None:
+            # Fresh random token: a lost or evicted generation never revives old entries
+            generation = secrets.token_hex(8).encode()
+            self.backend.set(key, generation)
+        return generation.decode()
+
+    def _replace_generation(self, kind, user_id):
+        return self.backend.set(f'windkey:gen:{kind}:{user_id}', secrets.token_hex(8).encode())
+
+    def _retry_pending(self):
+        with self._pending_lock:
+            pending = list(self._pending)
+        for kind, user_id in pending:
+            if not self._replace_generation(kind, user_id):
+                return
+            with self._pending_lock:
+                self._pending.discard((kind, user_id))
+
+    def lookup(self, kind, user_id, variant=''):
+        """Return (key, cached body or None); pass the key to store() after a miss."""
+        if self.backend is None:
+            return None, None
+        if self._pending:
+            self._retry_pending()
+            if (kind, user_id) in self._pending:
+                # The old generation may still be in the cache: build from the database, don't store
+                metrics.LISTING_CACHE_REQUESTS.labels(kind, 'miss').inc()
+                return None, None
+        # Variants carry client input (cursors), so they are hashed into a safe key
+        variant = hashlib.sha256(variant.encode()).hexdigest()[:32]
+        key = f'windkey:{kind}:{user_id}:{self._generation(kind, user_id)}:{variant}'
+        value = self.backend.get(key)
+        metrics.LISTING_CACHE_REQUESTS.labels(kind, 'hit' if value is not None else 'miss').inc()
+        return key, value
+
+    def store(self, key, value):
+        if key is not None:
+            self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, user_id, *kinds):
+        """Call after the write has been committed."""
+        if self.backend is None:
+            return
+        for kind in kinds:
+            if self._replace_generation(kind, user_id):
+                with self._pending_lock:
+                    self._pending.discard((kind, user_id))
+            else:
+                # Fail closed: until the token is replaced, cached listings may predate the write
+                with self._pending_lock:
+                    self._pending.add((kind, user_id))
+            metrics.LISTING_CACHE_INVALIDATIONS.labels(kind).inc()
+
+
+listing_cache = ListingCache(create_backend())
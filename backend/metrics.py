@@ -0,0 +1,157 @@
+import hmac
+import ipaddress
+import os
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request- und Query-Metriken im Prometheus-Format
+#
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory that all
+# workers share: every worker then writes its samples to mmap'd files there and
+# /metrics aggregates them (gunicorn.conf.py clears the directory on start and
+# cleans up after exited workers). Without it, metrics are per process.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+CRYPTO_BUCKETS = (.00001, .000025, .00005, .0001, .00025, .0005, .001, .005, .01)
+
+REQUEST_SECONDS = Histogram(
+    'windkey_http_request_duration_seconds', 'Request latency by route',
+    ['method', 'route'], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    'windkey_http_requests_total', 'Requests by route and status code',
+    ['method', 'route', 'status']
+)
+IN_PROGRESS = Gauge(
+    'windkey_http_requests_in_progress', 'Requests currently being served',
+    multiprocess_mode='livesum'
+)
+REQUEST_QUERIES = Histogram(
+    'windkey_db_queries_per_request', 'SQL statements executed per request',
+    ['route'], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_QUERY_SECONDS = Histogram(
+    'windkey_db_query_seconds_per_request', 'Time spent in SQL statements per request',
+    ['route'], buckets=LATENCY_BUCKETS
+)
+QUERY_SECONDS = Histogram(
+    'windkey_db_query_duration_seconds', 'Duration of single SQL statements',
+    buckets=QUERY_BUCKETS
+)
+CIPHER_SECONDS = Histogram(
+    'windkey_cipher_duration_seconds', 'Time spent encrypting and decrypting stored passwords',
+    ['operation', 'format'], buckets=CRYPTO_BUCKETS
+)
+HASH_SECONDS = Histogram(
+    'windkey_password_hash_duration_seconds', 'Time spent hashing master passwords, including queueing',
+    ['operation'], buckets=LATENCY_BUCKETS
+)
+HASH_REJECTED = Counter(
+    'windkey_password_hash_rejected_total', 'Hash operations rejected because the pool was busy'
+)
+LISTING_CACHE_REQUESTS = Counter(
+    'windkey_listing_cache_requests_total', 'Listing cache lookups by kind and result (hit or miss)',
+    ['kind', 'result']
+)
+LISTING_CACHE_INVALIDATIONS = Counter(
+    'windkey_listing_cache_invalidations_total', 'Listings invalidated by writes',
+    ['kind']
+)
+LISTING_CACHE_EVICTIONS = Counter(
+    'windkey_listing_cache_evictions_total', 'Listings evicted from an in-process cache to stay within its size'
+)
+
+
+def route_label():
+    # The URL rule keeps the label set small (/api/passwords/<int:id>, not every id)
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    QUERY_SECONDS.observe(elapsed)
+    if has_request_context() and 'metrics_start' in g:
+        g.metrics_queries += 1
+        g.metrics_query_seconds += elapsed
+
+
+def _before_request():
+    IN_PROGRESS.inc()
+    g.metrics_start = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_query_seconds = 0.0
+    g.metrics_status = 500
+
+
+def _after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(exc):
+    # Runs after streamed responses have been fully sent
+    if 'metrics_start' not in g:
+        return
+    elapsed = time.perf_counter() - g.pop('metrics_start')
+    IN_PROGRESS.dec()
+    route = route_label()
+    REQUEST_SECONDS.labels(request.method, route).observe(elapsed)
+    REQUESTS.labels(request.method, route, str(g.metrics_status)).inc()
+    REQUEST_QUERIES.labels(route).observe(g.metrics_queries)
+    REQUEST_QUERY_SECONDS.labels(route).observe(g.metrics_query_seconds)
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+
+def is_local_request(req):
+    # Proxied requests arrive from the proxy's address, so they never count as local
+    if req.headers.get('X-Forwarded-For') or req.headers.get('Forwarded'):
+        return False
+    try:
+        return ipaddress.ip_address(req.remote_addr or '').is_loopback
+    except ValueError:
+        return False
+
+
+def authorized(req):
+    """Return True if req may read /metrics, False if it lacks the token, None if the endpoint is hidden.
+
+    Without METRICS_TOKEN only scrapers on the same host get the metrics.
+    """
+    if not METRICS_TOKEN:
+        return True if is_local_request(req) else None
+    return hmac.compare_digest(req.headers.get('Authorization') or '', f'Bearer {METRICS_TOKEN}')
+
+
+def render_metrics():
+    """Return (body, content type) for the /metrics endpoint."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,46 +1,46 @@
-from app import db, app
+from app import app
+from flask_migrate import upgrade
+from search import detect_search_index
 import os
-from sqlalchemy import inspect
+import shutil
+import sharding
 
-def column_exists(table_name, column_name):
+def database_file(shard=sharding.DEFAULT_SHARD):
+    # Only file-based SQLite databases can be backed up by copying
     with app.app_context():
-        inspector = inspect(db.engine)
-        columns = [col['name'] for col in inspector.get_columns(table_name)]
-        return column_name in columns
+        url = sharding.engine(shard).url
+        if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+            return url.database
+    return None
 
-def migrate_database():
+def migrate_database(shard=sharding.DEFAULT_SHARD):
     # Create a backup of the current database
-    if os.path.exists('windkey.db'):
-        print("Creating database backup...")
-        with open('windkey.db', 'rb') as src:
-            with open('windkey.db.backup', 'wb') as dst:
-                dst.write(src.read())
+    db_file = database_file(shard)
+    backup_file = f'{db_file}.backup' if db_file else None
+    if db_file and os.path.exists(db_file):
+        print(f"Creating backup of {shard} database...")
+        # Fold the WAL into the main file so the copy is complete
+        with app.app_context():
+            with sharding.engine(shard).connect() as conn:
+                conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+        shutil.copyfile(db_file, backup_file)
 
     try:
-        # Check if category_id column already exists
-        if not column_exists('password', 'category_id'):
-            print("Adding category_id column to password table...")
-            with app.app_context():
-                with db.engine.connect() as conn:
-                    conn.execute(db.text("""
-                        ALTER TABLE password
-                        ADD COLUMN category_id INTEGER
-                        REFERENCES category(id)
-                    """))
-                print("Migration completed successfully!")
-        else:
-            print("category_id column already exists in password table. Skipping migration.")
-            
+        with app.app_context():
+            upgrade(x_arg=None if shard == sharding.DEFAULT_SHARD else [f'shard={shard}'])
+            # The upgrade may have created the search index; don't wait for the recheck
+            detect_search_index(sharding.engine(shard))
+        print(f"Migration of {shard} database completed successfully!")
     except Exception as e:
         print(f"Error during migration: {str(e)}")
         # Restore backup if something went wrong
-        if os.path.exists('windkey.db.backup'):
+        if backup_file and os.path.exists(backup_file):
             print("Restoring database from backup...")
-            with open('windkey.db.backup', 'rb') as src:
-                with open('windkey.db', 'wb') as dst:
-                    dst.write(src.read())
+            shutil.copyfile(backup_file, db_file)
             print("Database restored from backup.")
         raise
 
 if __name__ == '__main__':
-    migrate_database()
+    # The main database first, then every shard (each is a complete Windkey schema)
+    for shard in sharding.shard_names():
+        migrate_database(shard)
@@ -0,0 +1,100 @@
+"""initial schema
+
+Brings both new databases and databases created by the old import-time
+db.create_all() / ALTER TABLE code up to the same schema: missing tables
+are created, missing columns are added to existing tables.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def tables():
+    return {
+        'user': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('email', sa.String(length=120), nullable=False, unique=True),
+            sa.Column('password_hash', sa.String(length=128)),
+            sa.Column('two_factor_secret', sa.String(length=32)),
+            sa.Column('change_counter', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime()),
+        ],
+        'category': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('icon', sa.String(length=50)),
+            sa.Column('color', sa.String(length=50)),
+            sa.Column('created_at', sa.DateTime()),
+        ],
+        'password': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+            sa.Column('category_id', sa.Integer(), sa.ForeignKey('category.id')),
+            sa.Column('title', sa.String(length=100), nullable=False),
+            sa.Column('encrypted_password', sa.LargeBinary(), nullable=False),
+            sa.Column('url', sa.String(length=500)),
+            sa.Column('domain', sa.String(length=253)),
+            sa.Column('notes', sa.Text()),
+            sa.Column('password_fingerprint', sa.String(length=64)),
+            sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        ],
+        'password_tombstone': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+            sa.Column('password_id', sa.Integer(), nullable=False),
+            sa.Column('change_seq', sa.Integer(), nullable=False),
+            sa.Column('deleted_at', sa.DateTime()),
+        ],
+        'key_rotation': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('key_id', sa.String(length=16), nullable=False, unique=True),
+            sa.Column('last_password_id', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('rotated_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('completed_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        ],
+        'history': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+            sa.Column('action', sa.String(length=255), nullable=False),
+            sa.Column('details', sa.String(length=255)),
+            sa.Column('ip_address', sa.String(length=45)),
+            sa.Column('timestamp', sa.DateTime()),
+        ],
+    }
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+
+    for name, columns in tables().items():
+        if name not in existing_tables:
+            op.create_table(name, *columns)
+            continue
+
+        existing_columns = {c['name'] for c in inspector.get_columns(name)}
+        missing = [c for c in columns if c.name not in existing_columns]
+        if missing:
+            with op.batch_alter_table(name) as batch_op:
+                for column in missing:
+                    batch_op.add_column(column)
+
+
+def downgrade():
+    for name in reversed(list(tables())):
+        op.drop_table(name)
@@ -0,0 +1,44 @@
+"""index plan for per-user queries
+
+Every per-user query used to scan the whole table because none of the
+foreign-key columns were indexed.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 12:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_category_user_id', 'category', ['user_id']),
+    ('ix_password_category_id', 'password', ['category_id']),
+    ('ix_password_user_category', 'password', ['user_id', 'category_id']),
+    ('ix_password_user_change_seq', 'password', ['user_id', 'change_seq']),
+    ('ix_password_user_domain', 'password', ['user_id', 'domain']),
+    ('ix_password_user_fingerprint', 'password', ['user_id', 'password_fingerprint']),
+    ('ix_password_tombstone_user_change_seq', 'password_tombstone', ['user_id', 'change_seq']),
+    ('ix_history_user_timestamp', 'history', ['user_id', 'timestamp']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # Older startup code may already have created some of these
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
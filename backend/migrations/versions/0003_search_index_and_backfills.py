@@ -0,0 +1,66 @@
+"""full-text search index, fingerprint and domain backfills
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 12:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    from crypto import cipher_suite, password_fingerprint
+    from domains import registrable_domain
+    from search import setup_search_index
+
+    bind = op.get_bind()
+    setup_search_index(bind)
+
+    # Backfill rows written before the columns existed ('' = no usable URL)
+    password = sa.table(
+        'password',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('url', sa.String),
+        sa.column('domain', sa.String),
+        sa.column('encrypted_password', sa.LargeBinary),
+        sa.column('password_fingerprint', sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(password.c.id, password.c.user_id, password.c.url, password.c.domain,
+                      password.c.encrypted_password, password.c.password_fingerprint)
+            .where(password.c.id > last_id)
+            .where(sa.or_(password.c.domain.is_(None), password.c.password_fingerprint.is_(None)))
+            .order_by(password.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            values = {}
+            if row.domain is None:
+                values['domain'] = registrable_domain(row.url)
+            if row.password_fingerprint is None:
+                values['password_fingerprint'] = password_fingerprint(
+                    row.user_id, cipher_suite.decrypt(row.encrypted_password).decode())
+            bind.execute(password.update().where(password.c.id == row.id).values(**values))
+        last_id = rows[-1].id
+        print(f"Backfilled {len(rows)} password entries")
+
+
+def downgrade():
+    from search import drop_search_index
+    drop_search_index(op.get_bind())
@@ -0,0 +1,34 @@
+"""server-side session store
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 16:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'auth_session',
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('token_hash')
+    )
+    op.create_index('ix_auth_session_user_id', 'auth_session', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_auth_session_user_id', table_name='auth_session')
+    op.drop_table('auth_session')
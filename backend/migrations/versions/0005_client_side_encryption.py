@@ -0,0 +1,51 @@
+"""client-side vault encryption
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 17:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def rebuild_search_index():
+    # SQLite batch mode recreates the password table, which drops its FTS triggers
+    from search import drop_search_index, setup_search_index
+    bind = op.get_bind()
+    drop_search_index(bind)
+    setup_search_index(bind)
+
+
+def upgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.add_column(sa.Column('vault_encryption', sa.String(length=10), nullable=False, server_default='server'))
+        batch_op.add_column(sa.Column('vault_kdf_salt', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('vault_kdf_iterations', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('vault_key_check', sa.Text(), nullable=True))
+
+    # Migrated entries keep only the client's ciphertext
+    with op.batch_alter_table('password') as batch_op:
+        batch_op.add_column(sa.Column('client_ciphertext', sa.Text(), nullable=True))
+        batch_op.alter_column('encrypted_password', existing_type=sa.LargeBinary(), nullable=True)
+    rebuild_search_index()
+
+
+def downgrade():
+    with op.batch_alter_table('password') as batch_op:
+        batch_op.alter_column('encrypted_password', existing_type=sa.LargeBinary(), nullable=False)
+        batch_op.drop_column('client_ciphertext')
+    rebuild_search_index()
+
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('vault_key_check')
+        batch_op.drop_column('vault_kdf_iterations')
+        batch_op.drop_column('vault_kdf_salt')
+        batch_op.drop_column('vault_encryption')
@@ -0,0 +1,38 @@
+"""persisted breach scan results
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 18:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Adding nullable columns is a plain ALTER TABLE, the FTS triggers stay in place
+    op.add_column('password', sa.Column('breach_count', sa.Integer(), nullable=True))
+    op.add_column('password', sa.Column('breach_checked_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_password_breach_checked_at', 'password', ['breach_checked_at'])
+    op.create_index('ix_password_user_breach_count', 'password', ['user_id', 'breach_count'])
+
+
+def downgrade():
+    op.drop_index('ix_password_user_breach_count', table_name='password')
+    op.drop_index('ix_password_breach_checked_at', table_name='password')
+    with op.batch_alter_table('password') as batch_op:
+        batch_op.drop_column('breach_checked_at')
+        batch_op.drop_column('breach_count')
+
+    # SQLite batch mode recreates the password table, which drops its FTS triggers
+    from search import drop_search_index, setup_search_index
+    bind = op.get_bind()
+    drop_search_index(bind)
+    setup_search_index(bind)
@@ -0,0 +1,64 @@
+"""per-user sharding: directory, global id sequences, change counters
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 19:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+SEQUENCED_TABLES = ('category', 'password', 'password_tombstone', 'history')
+
+
+def upgrade():
+    # The sync counter moves out of the user table, next to the user's entries
+    op.create_table(
+        'change_counter',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('counter', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.execute('INSERT INTO change_counter (user_id, counter) SELECT id, change_counter FROM "user"')
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('change_counter')
+
+    op.create_table(
+        'shard_directory',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('shard', sa.String(length=64), nullable=False),
+        sa.Column('moving', sa.Boolean(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_shard_directory_shard', 'shard_directory', ['shard'])
+
+    op.create_table(
+        'id_sequence',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('next_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    for table in SEQUENCED_TABLES:
+        op.execute(f"INSERT INTO id_sequence (name, next_id) SELECT '{table}', COALESCE(MAX(id), 0) + 1 FROM {table}")
+
+
+def downgrade():
+    op.drop_table('id_sequence')
+    op.drop_index('ix_shard_directory_shard', table_name='shard_directory')
+    op.drop_table('shard_directory')
+
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.add_column(sa.Column('change_counter', sa.Integer(), nullable=False, server_default='0'))
+    op.execute('UPDATE "user" SET change_counter = COALESCE('
+               '(SELECT counter FROM change_counter WHERE change_counter.user_id = "user".id), 0)')
+    op.drop_table('change_counter')
@@ -0,0 +1,28 @@
+"""recompute entry domains with the full public suffix list
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from domains import refresh_stored_domains
+
+    # Domains computed with the old partial list grouped unrelated sites (a.co.kr, b.co.kr)
+    changed = refresh_stored_domains(op.get_bind())
+    print(f"Recomputed the domain of {changed} password entries")
+
+
+def downgrade():
+    # The previous domains cannot be restored and need not be: they are derived data
+    pass
@@ -0,0 +1,61 @@
+"""stored password strength
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    from crypto import cipher_suite
+    from strength import password_strength
+
+    op.add_column('password', sa.Column('password_strength', sa.SmallInteger(), nullable=True))
+
+    # Client-side encrypted entries stay NULL until the client saves them again
+    bind = op.get_bind()
+    password = sa.table(
+        'password',
+        sa.column('id', sa.Integer),
+        sa.column('encrypted_password', sa.LargeBinary),
+        sa.column('password_strength', sa.SmallInteger),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(password.c.id, password.c.encrypted_password)
+            .where(password.c.id > last_id, password.c.encrypted_password.is_not(None))
+            .order_by(password.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            strength = password_strength(cipher_suite.decrypt(row.encrypted_password).decode())
+            bind.execute(password.update().where(password.c.id == row.id).values(password_strength=strength))
+        last_id = rows[-1].id
+        print(f"Computed the strength of {len(rows)} password entries")
+
+
+def downgrade():
+    with op.batch_alter_table('password') as batch_op:
+        batch_op.drop_column('password_strength')
+
+    # SQLite batch mode recreates the password table, which drops its FTS triggers
+    from search import drop_search_index, setup_search_index
+    bind = op.get_bind()
+    drop_search_index(bind)
+    setup_search_index(bind)
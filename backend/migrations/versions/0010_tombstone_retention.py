@@ -0,0 +1,25 @@
+"""tombstone retention: remember how far deletions were pruned
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('change_counter', sa.Column('pruned_seq', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('change_counter') as batch_op:
+        batch_op.drop_column('pruned_seq')
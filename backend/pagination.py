@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+# Keyset (Cursor) Pagination Helfer
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, datetime):
+        sort_value = {'dt': sort_value.isoformat()}
+    raw = json.dumps([sort_value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value['dt'])
+        return sort_value, int(row_id)
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def parse_limit(value, default=None):
+    if value is None or value == '':
+        return default
+    try:
+        return min(max(int(value), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise InvalidCursor('Invalid limit')
+
+
+def apply_keyset(query, sort_column, id_column, cursor, descending=False):
+    """Order a query by (sort_column, id_column) and seek past the cursor."""
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        if descending:
+            query = query.where(or_(sort_column < sort_value,
+                                    and_(sort_column == sort_value, id_column < row_id)))
+        else:
+            query = query.where(or_(sort_column > sort_value,
+                                    and_(sort_column == sort_value, id_column > row_id)))
+    return query
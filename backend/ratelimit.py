@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# In-Memory Sliding-Window Limiter für Login und Registrierung
+LOGIN_LIMIT_PER_ACCOUNT = int(os.environ.get('LOGIN_LIMIT_PER_ACCOUNT', 10))
+LOGIN_LIMIT_PER_IP = int(os.environ.get('LOGIN_LIMIT_PER_IP', 50))
+LOGIN_LIMIT_WINDOW = int(os.environ.get('LOGIN_LIMIT_WINDOW', 300))
+LIMITER_MAX_KEYS = int(os.environ.get('LIMITER_MAX_KEYS', 100000))
+
+
+class SlidingWindowLimiter:
+    """Allow at most `limit` hits per key within the last `window` seconds."""
+
+    def __init__(self, limit, window=LOGIN_LIMIT_WINDOW, max_keys=LIMITER_MAX_KEYS):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Record an attempt; return the seconds to wait if it is over the limit, else 0."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            self._hits.move_to_end(key)
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+
+            if len(hits) >= self.limit:
+                return int(hits[0] + self.window - now) + 1
+            hits.append(now)
+
+            # Bound memory: forget the least recently seen keys
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+            return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+account_limiter = SlidingWindowLimiter(LOGIN_LIMIT_PER_ACCOUNT)
+ip_limiter = SlidingWindowLimiter(LOGIN_LIMIT_PER_IP)
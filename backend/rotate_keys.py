@@ -0,0 +1,247 @@
+from app import db, app, Password, KeyRotation
+from crypto import (cipher_suite, read_keys, write_keys, key_id, is_v2, v2_cipher, KEY_RELOAD_INTERVAL,
+                    CIPHERTEXT_FORMAT, V2_VERSION, V2_HEADER_SIZE)
+from cryptography.fernet import Fernet, InvalidToken
+from datetime import datetime
+from sqlalchemy import func, select, update
+import argparse
+import sharding
+import time
+
+# Online key rotation
+#
+#   1. python rotate_keys.py add        -> new key, decrypt-only for now
+#   2. wait until all workers reloaded the key file (KEY_RELOAD_INTERVAL)
+#   3. python rotate_keys.py promote    -> new key becomes the encryption key
+#   4. wait KEY_RELOAD_INTERVAL again, so no worker still encrypts with the old key
+#   5. python rotate_keys.py reencrypt  -> rewrite all entries in small batches
+#   6. python rotate_keys.py retire     -> drop old keys once step 5 is complete
+#
+# retire scans every entry first and refuses while any of them still needs an
+# old key (e.g. written by a worker that reloaded the key file late); it then
+# rewinds the checkpoint, so running reencrypt again picks those entries up.
+#
+# python rotate_keys.py compact rewrites remaining Fernet tokens in the compact
+# v2 format (see crypto.py); entries are also rewritten whenever they are saved.
+#
+# With sharding, reencrypt and compact walk the main database and every shard;
+# each database keeps its own re-encryption checkpoint.
+
+def shard_label(shard):
+    return f" ({shard})" if sharding.SHARDING else ""
+
+def add_key():
+    keys = read_keys()
+    keys.append(Fernet.generate_key())
+    write_keys(keys)
+    print(f"Added key {key_id(keys[-1])} (decrypt-only). Wait {KEY_RELOAD_INTERVAL}s before promoting it.")
+
+def promote_key():
+    keys = read_keys()
+    if len(keys) < 2:
+        print("Only one key configured, nothing to promote.")
+        return
+    keys.insert(0, keys.pop())
+    write_keys(keys)
+    print(f"Key {key_id(keys[0])} is now the primary key. Wait {KEY_RELOAD_INTERVAL}s before re-encrypting.")
+
+def get_checkpoint(primary_key_id):
+    checkpoint = KeyRotation.query.filter_by(key_id=primary_key_id).first()
+    if not checkpoint:
+        checkpoint = KeyRotation(key_id=primary_key_id, last_password_id=0, rotated_count=0)
+        db.session.add(checkpoint)
+        db.session.commit()
+    return checkpoint
+
+def reencrypt(batch_size=200, pause=0.1, max_batches=None):
+    with app.app_context():
+        for shard in sharding.shard_names():
+            with sharding.use_shard(shard):
+                if not reencrypt_shard(shard, batch_size, pause, max_batches):
+                    print("Stopped after max batches; run again to resume.")
+                    return
+
+def reencrypt_shard(shard, batch_size, pause, max_batches):
+    checkpoint = get_checkpoint(key_id(read_keys()[0]))
+    if checkpoint.completed_at:
+        print(f"Re-encryption already completed for the current key{shard_label(shard)}.")
+        return True
+
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = db.session.execute(
+            select(Password.id, Password.encrypted_password)
+            .where(Password.id > checkpoint.last_password_id, Password.encrypted_password.is_not(None))
+            .order_by(Password.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            checkpoint.completed_at = datetime.utcnow()
+            db.session.commit()
+            print(f"Re-encryption completed ({checkpoint.rotated_count} entries){shard_label(shard)}.")
+            return True
+
+        for row in rows:
+            # Only replace the token if nobody changed the entry meanwhile; updated_at is kept,
+            # otherwise every rotated entry would reorder listings and show up in delta syncs
+            result = db.session.execute(
+                update(Password)
+                .where(Password.id == row.id, Password.encrypted_password == row.encrypted_password)
+                .values(encrypted_password=cipher_suite.rotate(row.encrypted_password),
+                        updated_at=Password.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            checkpoint.rotated_count += result.rowcount
+        checkpoint.last_password_id = rows[-1].id
+        db.session.commit()
+
+        batches += 1
+        print(f"Re-encrypted up to id {checkpoint.last_password_id}{shard_label(shard)}")
+        time.sleep(pause)
+    return False
+
+def compact(batch_size=200, pause=0.1, max_batches=None):
+    if CIPHERTEXT_FORMAT == 'fernet':
+        print("CIPHERTEXT_FORMAT=fernet, nothing to compact.")
+        return
+    with app.app_context():
+        for shard in sharding.shard_names():
+            with sharding.use_shard(shard):
+                if not compact_shard(shard, batch_size, pause, max_batches):
+                    print("Stopped after max batches; run again to resume.")
+                    return
+
+def compact_shard(shard, batch_size, pause, max_batches):
+    # Rewritten rows no longer match, so an interrupted run simply starts over
+    legacy = func.substr(Password.encrypted_password, 1, 1) != V2_VERSION
+    last_id = 0
+    compacted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = db.session.execute(
+            select(Password.id, Password.encrypted_password)
+            .where(Password.id > last_id, Password.encrypted_password.is_not(None), legacy)
+            .order_by(Password.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            print(f"Compaction completed ({compacted} entries){shard_label(shard)}.")
+            return True
+
+        for row in rows:
+            # Same compare-and-set as reencrypt; updated_at is kept, the entry did not change
+            result = db.session.execute(
+                update(Password)
+                .where(Password.id == row.id, Password.encrypted_password == row.encrypted_password)
+                .values(encrypted_password=cipher_suite.rotate(row.encrypted_password),
+                        updated_at=Password.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            compacted += result.rowcount
+        last_id = rows[-1].id
+        db.session.commit()
+
+        batches += 1
+        print(f"Compacted up to id {last_id}{shard_label(shard)}")
+        time.sleep(pause)
+    return False
+
+def readable_with(key):
+    """Return a check whether a stored token can be decrypted with key alone."""
+    header, _ = v2_cipher(key)
+    fernet = Fernet(key)
+
+    def check(token):
+        if is_v2(token):
+            return bytes(token[:V2_HEADER_SIZE]) == header
+        # Fernet tokens carry no key id
+        try:
+            fernet.decrypt(token)
+            return True
+        except InvalidToken:
+            return False
+    return check
+
+def find_stale_entries(readable, batch_size=1000):
+    """Ids of entries in the current database that the primary key cannot decrypt."""
+    stale = []
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Password.id, Password.encrypted_password)
+            .where(Password.id > last_id, Password.encrypted_password.is_not(None))
+            .order_by(Password.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return stale
+        stale += [row.id for row in rows if not readable(row.encrypted_password)]
+        last_id = rows[-1].id
+
+def retire_keys():
+    with app.app_context():
+        keys = read_keys()
+        if len(keys) < 2:
+            print("Only one key configured, nothing to retire.")
+            return
+        primary_key_id = key_id(keys[0])
+        for shard in sharding.shard_names():
+            with sharding.use_shard(shard):
+                checkpoint = KeyRotation.query.filter_by(key_id=primary_key_id).first()
+            if not checkpoint or not checkpoint.completed_at:
+                print(f"Re-encryption for the current key is not complete{shard_label(shard)}. Run reencrypt first.")
+                return
+
+        # The checkpoint only says the pass finished; entries written with an old key
+        # behind it would become unreadable, so every database is checked before deleting
+        readable = readable_with(keys[0])
+        blocked = False
+        for shard in sharding.shard_names():
+            with sharding.use_shard(shard):
+                stale = find_stale_entries(readable)
+                if stale:
+                    blocked = True
+                    checkpoint = KeyRotation.query.filter_by(key_id=primary_key_id).first()
+                    checkpoint.completed_at = None
+                    checkpoint.last_password_id = min(stale) - 1
+                    db.session.commit()
+                    print(f"{len(stale)} entries still need an old key{shard_label(shard)}.")
+        if blocked:
+            print("Old keys were kept. Run reencrypt again, then retire.")
+            return
+        write_keys(keys[:1])
+        print(f"Retired {len(keys) - 1} old key(s).")
+
+def show_status():
+    with app.app_context():
+        keys = read_keys()
+        for index, key in enumerate(keys):
+            role = 'primary' if index == 0 else 'decrypt-only'
+            for shard in sharding.shard_names():
+                with sharding.use_shard(shard):
+                    checkpoint = KeyRotation.query.filter_by(key_id=key_id(key)).first()
+                progress = 'not started'
+                if checkpoint:
+                    progress = 'completed' if checkpoint.completed_at else f'at id {checkpoint.last_password_id}'
+                print(f"{key_id(key)}  {role:<12}  re-encryption {progress}{shard_label(shard)}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rotate the vault encryption key')
+    parser.add_argument('command', choices=['add', 'promote', 'reencrypt', 'compact', 'retire', 'status'])
+    parser.add_argument('--batch-size', type=int, default=200, help='Entries per transaction')
+    parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between batches')
+    parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        add_key()
+    elif args.command == 'promote':
+        promote_key()
+    elif args.command == 'reencrypt':
+        reencrypt(args.batch_size, args.pause, args.max_batches)
+    elif args.command == 'compact':
+        compact(args.batch_size, args.pause, args.max_batches)
+    elif args.command == 'retire':
+        retire_keys()
+    else:
+        show_status()
@@ -1,34 +1,34 @@
-from flask import jsonify, request, send_file, session
+from flask import g, jsonify, request, send_file, session, Response, stream_with_context
 from flask_login import login_user, login_required, logout_user, current_user
-from app import app, db, User, Password, History, Category
+from app import app, db, User, Password, PasswordTombstone, History, Category, ChangeCounter, session_store
 import pyotp
 import secrets
 import string
 import os
-from base64 import b64encode
-from cryptography.fernet import Fernet
 import qrcode
-from io import BytesIO
-import base64
-import hashlib
-import requests
-from datetime import timedelta
-
-# Verschlüsselungshelfer
-ENCRYPTION_KEY_FILE = 'encryption.key'
-
-def get_or_create_key():
-    if os.path.exists(ENCRYPTION_KEY_FILE):
-        with open(ENCRYPTION_KEY_FILE, 'rb') as f:
-            return f.read()
-    else:
-        key = Fernet.generate_key()
-        with open(ENCRYPTION_KEY_FILE, 'wb') as f:
-            f.write(key)
-        return key
-
-encryption_key = get_or_create_key()
-cipher_suite = Fernet(encryption_key)
+import qrcode.image.svg
+from functools import lru_cache
+from breach import breach_count, breach_counts, BreachCheckError
+from breach_scan import record_results
+from pagination import apply_keyset, encode_cursor, parse_limit, InvalidCursor, DEFAULT_PAGE_SIZE
+from crypto import cipher_suite, password_fingerprint
+from hashing import HashingBusy
+from ratelimit import account_limiter, ip_limiter
+from importers import parse_export, ImportFormatError
+from search import search_password_ids
+from domains import registrable_domain
+from strength import password_strength, BUCKETS as STRENGTH_BUCKETS
+from metrics import authorized as metrics_authorized, render_metrics
+from listing_cache import listing_cache, CATEGORIES, PASSWORDS, LISTING_CACHE_MAX_ITEM_BYTES
+import sharding
+from sqlalchemy import select, func, update, insert, delete
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+import csv
+import json
+import re
+from datetime import datetime, timedelta
 
 # CORS Pre-flight route
 @app.route('/api/check-auth', methods=['GET', 'OPTIONS'])
@@ -55,6 +55,10 @@ def register():
     if not data or 'email' not in data or 'password' not in data:
         return jsonify({'error': 'Email and password are required'}), 400
     
+    throttled = throttle_auth_attempt(data['email'])
+    if throttled:
+        return throttled
+    
     if User.query.filter_by(email=data['email']).first():
         return jsonify({'error': 'Email already registered'}), 400
     
@@ -69,50 +73,88 @@ def register():
         except Exception as e:
             return jsonify({'error': f'Failed to generate 2FA secret: {str(e)}'}), 500
         
-        # Generate QR code
-        try:
-            totp = pyotp.TOTP(user.two_factor_secret)
-            provisioning_uri = totp.provisioning_uri(user.email, issuer_name='Windkey')
-            
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(provisioning_uri)
-            qr.make(fit=True)
-            
-            img_buffer = BytesIO()
-            img = qr.make_image(fill_color="black", back_color="white")
-            img.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
-            img_str = base64.b64encode(img_buffer.getvalue()).decode()
-        except Exception as e:
-            return jsonify({'error': f'Failed to generate QR code: {str(e)}'}), 500
-        
         try:
             db.session.add(user)
             db.session.commit()
+            sharding.assign_user(user.id)
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': f'Failed to save user to database: {str(e)}'}), 500
         
+        # The QR code is rendered lazily by /api/register/qr for this enrollment
+        session['pending_2fa_user_id'] = user.id
+        
         return jsonify({
             'message': 'Registration successful',
             'two_factor_secret': user.two_factor_secret,
-            'qr_code': f'data:image/png;base64,{img_str}'
+            'provisioning_uri': provisioning_uri(user),
+            'qr_code_url': '/api/register/qr'
         })
+    except HashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server busy, please try again'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Registration failed: {str(e)}'}), 500
 
+@app.route('/api/register/qr', methods=['GET', 'OPTIONS'])
+def register_qr():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    user_id = session.get('pending_2fa_user_id')
+    if not user_id:
+        return jsonify({'error': 'No pending 2FA enrollment'}), 404
+        
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    try:
+        svg = render_qr_svg(provisioning_uri(user))
+    except Exception as e:
+        return jsonify({'error': f'Failed to generate QR code: {str(e)}'}), 500
+    
+    response = Response(svg, mimetype='image/svg+xml')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def provisioning_uri(user):
+    totp = pyotp.TOTP(user.two_factor_secret)
+    return totp.provisioning_uri(user.email, issuer_name='Windkey')
+
+# Vektor-QR ohne Pillow; gleiche URIs werden nicht neu gerendert
+@lru_cache(maxsize=256)
+def render_qr_svg(uri):
+    qr = qrcode.QRCode(border=4, image_factory=qrcode.image.svg.SvgPathImage)
+    qr.add_data(uri)
+    qr.make(fit=True)
+    return qr.make_image().to_string(encoding='unicode')
+
 @app.route('/api/login', methods=['POST', 'OPTIONS'])
 def login():
     if request.method == 'OPTIONS':
         return '', 200
         
     data = request.get_json()
-    print("Login attempt for email:", data['email'])  # Debug log
+    
+    # Reject abusive attempts before doing any expensive hashing
+    throttled = throttle_auth_attempt(data['email'])
+    if throttled:
+        return throttled
+    
     user = User.query.filter_by(email=data['email']).first()
     
-    if not user or not user.check_password(data['password']):
-        return jsonify({'error': 'Invalid credentials'}), 401
+    try:
+        if not user or not user.check_password(data['password']):
+            return jsonify({'error': 'Invalid credentials'}), 401
+        
+        # Upgrade hashes made with outdated parameters
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
+    except HashingBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503
     
     # If 2FA code is not provided, return a temporary token
     if 'two_factor_code' not in data:
@@ -128,16 +170,17 @@ def login():
     # Verify 2FA code
     totp = pyotp.TOTP(user.two_factor_secret)
     if not totp.verify(data['two_factor_code'], valid_window=1):
-        print("2FA verification failed")  # Debug log
         return jsonify({'error': 'Invalid 2FA code'}), 401
     
-    print("Login successful")  # Debug log
+    account_limiter.reset(data['email'].lower())
     login_user(user)
     
-    # Generate a new session token and set long session
-    token = secrets.token_urlsafe(32)
+    # Generate a new server-side session token and set long session
+    session_store.revoke(session.get('token'))
+    token = session_store.create(user.id)
     session['user_id'] = user.id
     session['token'] = token
+    session.pop('pending_2fa_user_id', None)
     session.permanent = True
     app.permanent_session_lifetime = timedelta(days=30)
     
@@ -161,9 +204,19 @@ def logout():
     # Log the logout action before the user is logged out
     log_user_action('logout', f'User logged out: {current_user.email}')
     
+    # Revoke the token so it stops working everywhere, not just in this cookie
+    session_store.revoke(session.pop('token', None))
+    session.pop('user_id', None)
     logout_user()
     return jsonify({'message': 'Logged out successfully'})
 
+PASSWORD_SORT_COLUMNS = {
+    'id': Password.id,
+    'title': Password.title,
+    'created_at': Password.created_at,
+    'updated_at': Password.updated_at
+}
+
 @app.route('/api/passwords', methods=['GET', 'OPTIONS'])
 @login_required
 def get_passwords():
@@ -171,17 +224,96 @@ def get_passwords():
         return '', 200
         
     try:
-        passwords = Password.query.filter_by(user_id=current_user.id).all()
-        return jsonify([{
-            'id': p.id,
-            'title': p.title,
-            'password': cipher_suite.decrypt(p.encrypted_password).decode(),
-            'url': p.url,
-            'notes': p.notes,
-            'category_id': p.category_id,
-            'created_at': p.created_at.isoformat(),
-            'updated_at': p.updated_at.isoformat()
-        } for p in passwords])
+        # Metadaten-Liste; Klartext nur auf ausdrücklichen Wunsch
+        include_password = request.args.get('include_password', 'false').lower() == 'true'
+        sort = request.args.get('sort', 'id')
+        if sort not in PASSWORD_SORT_COLUMNS:
+            return jsonify({'error': f'Invalid sort field: {sort}'}), 400
+        descending = request.args.get('order', 'asc').lower() == 'desc'
+        limit = parse_limit(request.args.get('limit'))
+        
+        cache_key = None
+        if not include_password:
+            # Metadaten-Listings kommen aus dem Cache, Klartext nie
+            cache_key, cached = listing_cache.lookup(PASSWORDS, current_user.id, '|'.join([
+                sort, str(descending), str(limit), request.args.get('category_id', '*'),
+                request.args.get('cursor', '')]))
+            if cached is not None:
+                next_cursor, _, body = cached.partition(b'\n')
+                response = Response(body, mimetype='application/json')
+                if next_cursor:
+                    response.headers['X-Next-Cursor'] = next_cursor.decode()
+                return response
+        
+        columns = [Password.id, Password.title, Password.url, Password.notes,
+                   Password.category_id, Password.created_at, Password.updated_at]
+        if include_password:
+            columns += [Password.encrypted_password, Password.client_ciphertext]
+        
+        query = select(*columns).where(Password.user_id == current_user.id)
+        if 'category_id' in request.args:
+            category_id = request.args.get('category_id')
+            if category_id in ('', 'none', 'null'):
+                query = query.where(Password.category_id.is_(None))
+            else:
+                query = query.where(Password.category_id == int(category_id))
+        
+        sort_column = PASSWORD_SORT_COLUMNS[sort]
+        query = apply_keyset(query, sort_column, Password.id, request.args.get('cursor'), descending)
+        
+        def serialize(row):
+            entry = {
+                'id': row.id,
+                'title': row.title,
+                'url': row.url,
+                'notes': row.notes,
+                'category_id': row.category_id,
+                'created_at': row.created_at.isoformat(),
+                'updated_at': row.updated_at.isoformat()
+            }
+            if include_password:
+                add_secret(entry, row.encrypted_password, row.client_ciphertext)
+            return entry
+        
+        next_cursor = None
+        if limit:
+            # Eine Zeile mehr laden, um zu wissen, ob es eine weitere Seite gibt
+            rows = db.session.execute(query.limit(limit + 1)).all()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = encode_cursor(getattr(last, sort), last.id)
+        else:
+            rows = db.session.execute(query.execution_options(yield_per=500))
+        
+        def generate():
+            # Collects the body for the cache while streaming, up to the cache's item size
+            chunks = [] if cache_key else None
+            size = 0
+            for chunk in body_chunks():
+                yield chunk
+                if chunks is not None:
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > LISTING_CACHE_MAX_ITEM_BYTES:
+                        chunks = None
+            if chunks is not None:
+                listing_cache.store(cache_key, (next_cursor or '').encode() + b'\n' + ''.join(chunks).encode())
+        
+        def body_chunks():
+            yield '['
+            for index, row in enumerate(rows):
+                if index:
+                    yield ','
+                yield json.dumps(serialize(row))
+            yield ']'
+        
+        response = Response(stream_with_context(generate()), mimetype='application/json')
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    except (InvalidCursor, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_passwords: {str(e)}")  # Debug-Ausgabe
         return jsonify({'error': str(e)}), 500
@@ -194,26 +326,28 @@ def create_password():
         
     try:
         data = request.get_json()
-        if not data or 'password' not in data:
+        # Verschlüssele das Passwort (oder übernimm den Ciphertext des Clients)
+        secret = secret_columns(data) if data else None
+        if not secret:
             return jsonify({'error': 'Password is required'}), 400
-            
-        # Verschlüssele das Passwort
-        encrypted_password = cipher_suite.encrypt(data['password'].encode())
         
         password = Password(
             user_id=current_user.id,
             title=data.get('title', 'Untitled'),
-            encrypted_password=encrypted_password,
+            **secret,
             url=data.get('url', ''),
+            domain=registrable_domain(data.get('url', '')),
             notes=data.get('notes', ''),
-            category_id=data.get('category_id')
+            category_id=data.get('category_id'),
+            change_seq=next_change_seq()
         )
         
         db.session.add(password)
-        db.session.commit()
         
-        # Log password creation
-        log_user_action('create_password', f'Created password entry: {data["title"]}')
+        # Log password creation in the same transaction
+        log_user_action('create_password', f'Created password entry: {password.title}', commit=False)
+        db.session.commit()
+        listing_cache.invalidate(current_user.id, PASSWORDS, CATEGORIES)
         
         return jsonify({
             'id': password.id,
@@ -225,11 +359,111 @@ def create_password():
             'updated_at': password.updated_at.isoformat()
         }), 201
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in create_password: {str(e)}")  # Debug-Ausgabe
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+IMPORT_BATCH_SIZE = 500
+
+@app.route('/api/passwords/import', methods=['POST', 'OPTIONS'])
+@login_required
+def import_passwords():
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    if vault_encryption() == 'client':
+        # The server would see every imported password in plain text
+        return jsonify({'error': 'Import is not available for client-side encrypted vaults'}), 400
+        
+    # Export als Datei-Upload oder direkt als Request-Body
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    format_name = request.args.get('format') or request.form.get('format')
+    if not format_name and upload and upload.filename.lower().endswith('.json'):
+        format_name = 'bitwarden_json'
+    
+    categories = {c.name.lower(): c.id for c in Category.query.filter_by(user_id=current_user.id)}
+    imported = 0
+    skipped = 0
+    categories_created = 0
+    
+    def category_id_for(folder):
+        nonlocal categories_created
+        if not folder:
+            return None
+        if folder.lower() not in categories:
+            category = Category(user_id=current_user.id, name=folder[:100], icon='Folder', color='#2563EB')
+            db.session.add(category)
+            db.session.flush()
+            categories[folder.lower()] = category.id
+            categories_created += 1
+        return categories[folder.lower()]
+    
+    def flush_batch(batch):
+        # Ein Insert und eine Transaktion pro Batch
+        change_seq = next_change_seq()
+        for row in batch:
+            row['change_seq'] = change_seq
+        db.session.execute(insert(Password), batch)
+        db.session.commit()
+        listing_cache.invalidate(current_user.id, PASSWORDS, CATEGORIES)
+    
+    try:
+        batch = []
+        for entry in parse_export(stream, format_name):
+            if not entry['password']:
+                skipped += 1
+                continue
+            notes = entry['notes']
+            if entry['username']:
+                notes = f"Username: {entry['username']}" + (f"\n{notes}" if notes else '')
+            now = datetime.utcnow()
+            batch.append({
+                'user_id': current_user.id,
+                'title': entry['title'],
+                'encrypted_password': cipher_suite.encrypt(entry['password'].encode()),
+                'password_fingerprint': password_fingerprint(current_user.id, entry['password']),
+                'password_strength': password_strength(entry['password']),
+                'url': entry['url'],
+                'domain': registrable_domain(entry['url']),
+                'notes': notes,
+                'category_id': category_id_for(entry['folder']),
+                'created_at': now,
+                'updated_at': now
+            })
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush_batch(batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            flush_batch(batch)
+            imported += len(batch)
+        
+        log_user_action('import_passwords', f'Imported {imported} password entries')
+        
+        return jsonify({
+            'imported': imported,
+            'skipped': skipped,
+            'categories_created': categories_created
+        }), 201
+    except (ImportFormatError, UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        log_partial_import(imported, e)
+        return jsonify({'error': str(e), 'imported': imported}), 400
+    except Exception as e:
+        print(f"Error in import_passwords: {str(e)}")
+        db.session.rollback()
+        log_partial_import(imported, e)
+        return jsonify({'error': str(e), 'imported': imported}), 500
+
+def log_partial_import(imported, error):
+    # Batches committed before the error stay imported, so they are recorded too
+    if imported:
+        log_user_action('import_passwords', f'Partially imported {imported} password entries, then failed: {error}')
+
 @app.route('/api/passwords/<int:id>', methods=['PUT', 'OPTIONS'])
 @login_required
 def update_password(id):
@@ -243,23 +477,376 @@ def update_password(id):
     
     data = request.get_json()
     
-    if 'password' in data and data['password']:
-        password.encrypted_password = cipher_suite.encrypt(data['password'].encode())
+    try:
+        secret = secret_columns(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    apply_password_changes(password, data, secret)
+    password.change_seq = next_change_seq()
+    
+    # Log password update in the same transaction
+    log_user_action('update_password', f'Updated password entry: {password.title}', commit=False)
+    db.session.commit()
+    # Category counts only change when the entry moves
+    listing_cache.invalidate(current_user.id, PASSWORDS, *([CATEGORIES] if 'category_id' in data else []))
+    
+    return jsonify({'message': 'Password updated successfully'})
+
+def apply_password_changes(password, data, secret=None):
+    if secret:
+        for column, value in secret.items():
+            setattr(password, column, value)
+    elif password.encrypted_password is not None and cipher_suite.needs_rewrite(password.encrypted_password):
+        # The row is written anyway, so move it to the compact ciphertext format
+        password.encrypted_password = cipher_suite.rotate(password.encrypted_password)
     if 'title' in data:
         password.title = data['title']
     if 'url' in data:
         password.url = data['url']
+        password.domain = registrable_domain(data['url'])
     if 'notes' in data:
         password.notes = data['notes']
     if 'category_id' in data:
         password.category_id = data['category_id']
+
+# Clientseitige Verschlüsselung: der Client verschlüsselt, der Server speichert nur Ciphertext.
+# Not zero-knowledge: login and enabling the mode still send the master password here.
+CIPHERTEXT_MAX_LENGTH = 4096
+MIN_KDF_ITERATIONS = 100000
+FINGERPRINT_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+def vault_encryption():
+    # current_user comes from the per-worker user cache and can lag behind a mode
+    # switch made in another worker, so the mode is read in this request's transaction
+    if 'vault_encryption' not in g:
+        g.vault_encryption = db.session.execute(
+            select(User.vault_encryption).where(User.id == current_user.id)
+        ).scalar_one()
+    return g.vault_encryption
+
+def secret_columns(data):
+    """Return the secret columns for an entry's new password, or None if data has none."""
+    if vault_encryption() == 'client':
+        if data.get('password'):
+            raise ValueError('Vault uses client-side encryption; send ciphertext instead of password')
+        ciphertext = data.get('ciphertext')
+        if not ciphertext:
+            return None
+        if not isinstance(ciphertext, str) or len(ciphertext) > CIPHERTEXT_MAX_LENGTH:
+            raise ValueError('Invalid ciphertext')
+        # Optional client-computed HMAC, used only to group reused passwords
+        fingerprint = data.get('fingerprint')
+        if fingerprint is not None and not FINGERPRINT_PATTERN.fullmatch(str(fingerprint)):
+            raise ValueError('Invalid fingerprint')
+        # Likewise the client's strength score, for the Stats page
+        strength = data.get('strength')
+        if strength is not None and (type(strength) is not int or not 0 <= strength <= 100):
+            raise ValueError('Invalid strength')
+        return {'encrypted_password': None, 'client_ciphertext': ciphertext, 'password_fingerprint': fingerprint,
+                'password_strength': strength, 'breach_count': None, 'breach_checked_at': None}
     
-    db.session.commit()
-    
-    # Log password update
-    log_user_action('update_password', f'Updated password entry: {password.title}')
+    if not data.get('password'):
+        return None
+    # The stored breach result belongs to the old password; the background scan picks the entry up again
+    return {
+        'encrypted_password': cipher_suite.encrypt(data['password'].encode()),
+        'client_ciphertext': None,
+        'password_fingerprint': password_fingerprint(current_user.id, data['password']),
+        'password_strength': password_strength(data['password']),
+        'breach_count': None,
+        'breach_checked_at': None
+    }
+
+def add_secret(entry, encrypted_password, client_ciphertext):
+    # Client-side encrypted entries are served as stored, without any crypto here
+    if client_ciphertext is not None:
+        entry['ciphertext'] = client_ciphertext
+    else:
+        entry['password'] = cipher_suite.decrypt(encrypted_password).decode()
+    return entry
+
+BATCH_MAX_OPERATIONS = 1000
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+
+def is_id(value):
+    # bool is an int subclass, but true/false are no ids
+    return type(value) is int
+
+def batch_operation_error(op):
+    """Return what is malformed about one batch operation, before anything is looked up."""
+    if not isinstance(op, dict):
+        return 'Invalid operation'
+    kind = op.get('op')
+    if kind not in BATCH_OPERATIONS:
+        return f'Unknown operation: {kind}'
+    if kind != 'create' and not is_id(op.get('id')):
+        return 'id must be an integer'
+    op_data = op.get('data')
+    if op_data is None:
+        return None
+    if not isinstance(op_data, dict):
+        return 'data must be an object'
+    if op_data.get('category_id') is not None and not is_id(op_data['category_id']):
+        return 'category_id must be an integer or null'
+    if 'title' in op_data and not isinstance(op_data['title'], str):
+        return 'title must be a string'
+    for field in ('password', 'url', 'notes'):
+        if op_data.get(field) is not None and not isinstance(op_data[field], str):
+            return f'{field} must be a string'
+    return None
+
+@app.route('/api/passwords/batch', methods=['POST', 'OPTIONS'])
+@login_required
+def batch_passwords():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return jsonify({'error': f'At most {BATCH_MAX_OPERATIONS} operations per batch'}), 400
     
-    return jsonify({'message': 'Password updated successfully'})
+    try:
+        # Erst die Form jeder Operation prüfen, dann Eigentümerschaft mit je einer IN-Query
+        shape_errors = [batch_operation_error(op) for op in operations]
+        valid = [op for op, error in zip(operations, shape_errors) if not error]
+        ids = {op['id'] for op in valid if op['op'] != 'create'}
+        owned = {p.id: p for p in Password.query.filter(
+            Password.id.in_(ids), Password.user_id == current_user.id)} if ids else {}
+        category_ids = {(op.get('data') or {}).get('category_id') for op in valid}
+        category_ids.discard(None)
+        owned_categories = {row[0] for row in db.session.execute(
+            select(Category.id).where(Category.id.in_(category_ids), Category.user_id == current_user.id))
+        } if category_ids else set()
+        
+        results = []
+        secrets_by_index = {}
+        deleted_ids = set()
+        for index, (op, shape_error) in enumerate(zip(operations, shape_errors)):
+            if shape_error:
+                result = {'index': index, 'error': shape_error}
+                if isinstance(op, dict):
+                    result.update(op=op.get('op'), id=op.get('id'))
+                results.append(result)
+                continue
+            kind = op['op']
+            op_data = op.get('data') or {}
+            secret_error = None
+            if kind in ('create', 'update'):
+                try:
+                    secrets_by_index[index] = secret_columns(op_data)
+                except ValueError as e:
+                    secret_error = str(e)
+            if kind != 'create' and (op.get('id') not in owned or op.get('id') in deleted_ids):
+                error = 'Password not found'
+            elif secret_error:
+                error = secret_error
+            elif kind == 'create' and not secrets_by_index[index]:
+                error = 'Password is required'
+            elif op_data.get('category_id') is not None and op_data['category_id'] not in owned_categories:
+                error = 'Category not found'
+            else:
+                error = None
+            if kind == 'delete' and not error:
+                deleted_ids.add(op['id'])
+            results.append({'index': index, 'op': kind, 'id': op.get('id'), 'error': error})
+        
+        # Alles oder nichts: bei einem Fehler wird nichts geschrieben
+        if any(r['error'] for r in results):
+            return jsonify({'applied': False, 'results': results}), 400
+        
+        change_seq = next_change_seq()
+        counts = {'create': 0, 'update': 0, 'delete': 0}
+        created = []
+        for index, (op, result) in enumerate(zip(operations, results)):
+            op_data = op.get('data') or {}
+            if op['op'] == 'create':
+                password = Password(
+                    user_id=current_user.id,
+                    title=op_data.get('title', 'Untitled'),
+                    **secrets_by_index[index],
+                    url=op_data.get('url', ''),
+                    domain=registrable_domain(op_data.get('url', '')),
+                    notes=op_data.get('notes', ''),
+                    category_id=op_data.get('category_id'),
+                    change_seq=change_seq
+                )
+                db.session.add(password)
+                created.append((password, result))
+            elif op['op'] == 'update':
+                password = owned[op['id']]
+                apply_password_changes(password, op_data, secrets_by_index[index])
+                password.change_seq = change_seq
+            else:
+                db.session.add(PasswordTombstone(
+                    user_id=current_user.id,
+                    password_id=op['id'],
+                    change_seq=change_seq
+                ))
+                db.session.delete(owned.pop(op['id']))
+            counts[op['op']] += 1
+        
+        db.session.flush()
+        for password, result in created:
+            result['id'] = password.id
+        if counts['delete']:
+            prune_tombstones()
+        
+        log_user_action('batch_passwords',
+                        f"Batch: {counts['create']} created, {counts['update']} updated, {counts['delete']} deleted",
+                        commit=False)
+        db.session.commit()
+        moved = counts['create'] or counts['delete'] or any(
+            op['op'] == 'update' and 'category_id' in (op.get('data') or {}) for op in operations)
+        listing_cache.invalidate(current_user.id, PASSWORDS, *([CATEGORIES] if moved else []))
+        
+        return jsonify({'applied': True, 'results': results})
+    except Exception as e:
+        print(f"Error in batch_passwords: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/passwords/search', methods=['GET', 'OPTIONS'])
+@login_required
+def search_passwords():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        query = request.args.get('q', '').strip()
+        limit = parse_limit(request.args.get('limit'), default=20)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        if not query:
+            return jsonify({'results': [], 'total': 0, 'next_offset': None})
+        
+        ids, total = search_password_ids(db.session, current_user.id, query, limit, offset)
+        entries = {p.id: p for p in Password.query.filter(Password.id.in_(ids))} if ids else {}
+        
+        return jsonify({
+            'results': [entries[i].to_dict() for i in ids if i in entries],
+            'total': total,
+            'next_offset': offset + limit if offset + limit < total else None
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in search_passwords: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/passwords/match', methods=['GET', 'OPTIONS'])
+@login_required
+def match_passwords():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        domain = registrable_domain(request.args.get('url', ''))
+        if not domain:
+            return jsonify({'domain': '', 'matches': []})
+        
+        # Nur die passenden Einträge laden und entschlüsseln
+        matches = []
+        for p in Password.query.filter_by(user_id=current_user.id, domain=domain).order_by(Password.id):
+            matches.append(add_secret(p.to_dict(), p.encrypted_password, p.client_ciphertext))
+        
+        return jsonify({'domain': domain, 'matches': matches})
+    except Exception as e:
+        print(f"Error in match_passwords: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/passwords/reuse', methods=['GET', 'OPTIONS'])
+@login_required
+def get_reused_passwords():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        # Gruppieren über den Fingerprint-Index, ohne zu entschlüsseln
+        reused = select(Password.password_fingerprint).where(
+            Password.user_id == current_user.id,
+            Password.password_fingerprint.is_not(None)
+        ).group_by(Password.password_fingerprint).having(func.count() > 1)
+        
+        entries = Password.query.filter(
+            Password.user_id == current_user.id,
+            Password.password_fingerprint.in_(reused)
+        ).order_by(Password.password_fingerprint, Password.id).all()
+        
+        groups = {}
+        for p in entries:
+            groups.setdefault(p.password_fingerprint, []).append(p.to_dict())
+        
+        return jsonify({
+            'groups': list(groups.values()),
+            'reused_entries': len(entries)
+        })
+    except Exception as e:
+        print(f"Error in get_reused_passwords: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/passwords/strength', methods=['GET', 'OPTIONS'])
+@login_required
+def get_password_strength():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        # Verteilung aus den gespeicherten Werten, ohne zu entschlüsseln
+        score = Password.password_strength
+        columns = [func.count(), func.count().filter(score.is_(None))]
+        upper = None
+        for name, lower in STRENGTH_BUCKETS:
+            bucket = score >= lower if upper is None else (score >= lower) & (score < upper)
+            columns.append(func.count().filter(bucket))
+            upper = lower
+        total, unknown, *counts = db.session.execute(
+            select(*columns).where(Password.user_id == current_user.id)
+        ).one()
+        
+        return jsonify({
+            'total': total,
+            'unknown': unknown,
+            'distribution': {name: count for (name, _), count in zip(STRENGTH_BUCKETS, counts)}
+        })
+    except Exception as e:
+        print(f"Error in get_password_strength: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/passwords/breached', methods=['GET', 'OPTIONS'])
+@login_required
+def get_breached_passwords():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        # Liest nur die gespeicherten Ergebnisse des Hintergrund-Scans
+        entries = Password.query.filter(
+            Password.user_id == current_user.id,
+            Password.breach_count > 0
+        ).order_by(Password.breach_count.desc(), Password.id).all()
+        
+        server_side = Password.encrypted_password.is_not(None)
+        checked, pending, last_checked = db.session.execute(
+            select(
+                func.count(Password.breach_checked_at),
+                func.count().filter(Password.breach_checked_at.is_(None)),
+                func.max(Password.breach_checked_at)
+            ).where(Password.user_id == current_user.id, server_side)
+        ).one()
+        
+        return jsonify({
+            'entries': [dict(p.to_dict(), breach_count=p.breach_count,
+                             breach_checked_at=p.breach_checked_at.isoformat()) for p in entries],
+            'breached': len(entries),
+            'checked': checked,
+            'pending': pending,
+            'last_checked_at': last_checked.isoformat() if last_checked else None
+        })
+    except Exception as e:
+        print(f"Error in get_breached_passwords: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/passwords/<int:id>', methods=['GET', 'OPTIONS'])
 @login_required
@@ -272,16 +859,7 @@ def get_password(id):
         if not password:
             return jsonify({'error': 'Password not found'}), 404
             
-        return jsonify({
-            'id': password.id,
-            'title': password.title,
-            'password': cipher_suite.decrypt(password.encrypted_password).decode(),
-            'url': password.url,
-            'notes': password.notes,
-            'category_id': password.category_id,
-            'created_at': password.created_at.isoformat(),
-            'updated_at': password.updated_at.isoformat()
-        })
+        return jsonify(add_secret(password.to_dict(), password.encrypted_password, password.client_ciphertext))
     except Exception as e:
         print(f"Error in get_password: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -298,10 +876,17 @@ def delete_password(id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     # Log password deletion before deleting
-    log_user_action('delete_password', f'Deleted password entry: {password.title}')
+    log_user_action('delete_password', f'Deleted password entry: {password.title}', commit=False)
     
+    db.session.add(PasswordTombstone(
+        user_id=current_user.id,
+        password_id=password.id,
+        change_seq=next_change_seq()
+    ))
     db.session.delete(password)
+    prune_tombstones()
     db.session.commit()
+    listing_cache.invalidate(current_user.id, PASSWORDS, CATEGORIES)
     
     return jsonify({'message': 'Password deleted successfully'})
 
@@ -366,35 +951,80 @@ def check_password_breach():
         data = request.get_json()
         password = data.get('password')
         
-        # Generate SHA-1 hash of password
-        sha1_hash = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
-        prefix = sha1_hash[:5]
-        suffix = sha1_hash[5:]
-        
-        # Query haveibeenpwned API
-        url = f'https://api.pwnedpasswords.com/range/{prefix}'
-        headers = {
-            'User-Agent': 'Windkey Password Manager',
-            'Accept': 'application/json'
-        }
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code != 200:
-            return jsonify({'error': 'API request failed'}), 500
-            
-        # Check if hash suffix is in response
-        hashes = (line.split(':') for line in response.text.splitlines())
-        count = next((int(count) for hash_suffix, count in hashes if hash_suffix == suffix), 0)
+        # Check the password against the haveibeenpwned range API
+        count = breach_count(password)
         
         return jsonify({
             'breached': count > 0,
             'count': count
         })
         
+    except BreachCheckError as e:
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         print(f"Error in check_password_breach: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+BREACH_BATCH_MAX_ITEMS = 1000
+
+@app.route('/api/check-password-breach/batch', methods=['POST', 'OPTIONS'])
+@login_required
+def check_password_breach_batch():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    if 'passwords' in data and not (isinstance(data['passwords'], list)
+                                    and all(isinstance(p, str) for p in data['passwords'])):
+        return jsonify({'error': 'passwords must be a list of strings'}), 400
+    if 'passwords' not in data and 'ids' in data and not (isinstance(data['ids'], list)
+                                                          and all(is_id(i) for i in data['ids'])):
+        return jsonify({'error': 'ids must be a list of integers'}), 400
+    if len(data.get('passwords', data.get('ids', ()))) > BREACH_BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {BREACH_BATCH_MAX_ITEMS} passwords per batch'}), 400
+    
+    try:
+        # Either plain passwords, selected entry ids or the whole vault
+        if 'passwords' in data:
+            passwords = data['passwords']
+            counts = breach_counts(passwords)
+            results = [{
+                'index': index,
+                'breached': count > 0,
+                'count': count
+            } for index, count in enumerate(counts)]
+        else:
+            # Client-side encrypted entries cannot be checked by the server
+            query = Password.query.filter(Password.user_id == current_user.id,
+                                          Password.encrypted_password.is_not(None))
+            if 'ids' in data:
+                query = query.filter(Password.id.in_(data['ids']))
+            entries = query.all()
+            counts = breach_counts([cipher_suite.decrypt(p.encrypted_password).decode() for p in entries])
+            # Fresh results replace the stored ones, so the scan does not repeat this work
+            record_results(entries, counts)
+            db.session.commit()
+            results = [{
+                'id': p.id,
+                'title': p.title,
+                'breached': count > 0,
+                'count': count
+            } for p, count in zip(entries, counts)]
+        
+        return jsonify({
+            'results': results,
+            'checked': len(results),
+            'breached': sum(1 for r in results if r['breached'])
+        })
+        
+    except BreachCheckError as e:
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        print(f"Error in check_password_breach_batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/history', methods=['GET', 'OPTIONS'])
 @login_required
 def get_history():
@@ -402,8 +1032,37 @@ def get_history():
         return '', 200
         
     try:
-        history_entries = History.query.filter_by(user_id=current_user.id).order_by(History.timestamp.desc()).all()
-        return jsonify([entry.to_dict() for entry in history_entries])
+        limit = parse_limit(request.args.get('limit'), default=DEFAULT_PAGE_SIZE)
+        
+        # Filter gelten für Seite und Gesamtanzahl gleichermaßen
+        filters = [History.user_id == current_user.id]
+        if request.args.get('action'):
+            filters.append(History.action == request.args['action'])
+        if request.args.get('ip'):
+            filters.append(History.ip_address == request.args['ip'])
+        if request.args.get('since'):
+            filters.append(History.timestamp >= datetime.fromisoformat(request.args['since']))
+        if request.args.get('until'):
+            filters.append(History.timestamp < datetime.fromisoformat(request.args['until']))
+        
+        total = db.session.execute(select(func.count(History.id)).where(*filters)).scalar_one()
+        
+        query = apply_keyset(select(History).where(*filters), History.timestamp, History.id,
+                             request.args.get('cursor'), descending=True)
+        entries = db.session.execute(query.limit(limit + 1)).scalars().all()
+        
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = encode_cursor(entries[-1].timestamp, entries[-1].id)
+        
+        return jsonify({
+            'entries': [entry.to_dict() for entry in entries],
+            'total': total,
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -427,19 +1086,29 @@ def verify_2fa():
     if not user:
         return jsonify({'error': 'User not found'}), 401
     
+    # Codes are guessed here as well, so they count against the same limits
+    throttled = throttle_auth_attempt(user.email)
+    if throttled:
+        return throttled
+    
     # Verify 2FA code
     totp = pyotp.TOTP(user.two_factor_secret)
     if not totp.verify(data['code'], valid_window=1):
         return jsonify({'error': 'Invalid 2FA code'}), 401
     
+    # Only a complete login clears the account's failed attempts
+    account_limiter.reset(user.email.lower())
+    
     # Clear temporary session data
     session.pop('temp_token', None)
     session.pop('temp_user_id', None)
     
-    # Generate a new session token
-    token = secrets.token_urlsafe(32)
+    # Generate a new server-side session token
+    session_store.revoke(session.get('token'))
+    token = session_store.create(user.id)
     session['user_id'] = user.id
     session['token'] = token
+    session.pop('pending_2fa_user_id', None)
     
     # Log the user in
     login_user(user)
@@ -460,15 +1129,16 @@ def refresh_token():
         
     # Check if user has a valid session
     user_id = session.get('user_id')
-    if not user_id:
+    if not user_id or session_store.get(session.get('token')) != user_id:
         return jsonify({'error': 'No valid session'}), 401
         
     user = User.query.get(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 401
     
-    # Generate a new token
-    token = secrets.token_urlsafe(32)
+    # Replace the token; the old one is revoked
+    session_store.revoke(session.get('token'))
+    token = session_store.create(user.id)
     session['token'] = token
     
     # Extend session lifetime
@@ -491,8 +1161,21 @@ def get_categories():
         return '', 200
         
     try:
+        cache_key, cached = listing_cache.lookup(CATEGORIES, current_user.id)
+        if cached is not None:
+            return Response(cached, mimetype='application/json')
+        
         categories = Category.query.filter_by(user_id=current_user.id).all()
-        return jsonify([category.to_dict() for category in categories])
+        
+        # Alle Zähler mit einer gruppierten Query statt einer pro Kategorie
+        counts = dict(db.session.execute(
+            select(Password.category_id, func.count(Password.id))
+            .where(Password.user_id == current_user.id, Password.category_id.is_not(None))
+            .group_by(Password.category_id)
+        ).all())
+        response = jsonify([category.to_dict(counts.get(category.id, 0)) for category in categories])
+        listing_cache.store(cache_key, response.get_data())
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -516,9 +1199,9 @@ def create_category():
         )
         
         db.session.add(category)
+        log_user_action('create_category', f'Created category: {category.name}', commit=False)
         db.session.commit()
-        
-        log_user_action('create_category', f'Created category: {category.name}')
+        listing_cache.invalidate(current_user.id, CATEGORIES)
         
         return jsonify(category.to_dict())
     except Exception as e:
@@ -549,9 +1232,9 @@ def update_category(id):
         if 'color' in data:
             category.color = data['color']
             
+        log_user_action('update_category', f'Updated category: {category.name}', commit=False)
         db.session.commit()
-        
-        log_user_action('update_category', f'Updated category: {category.name}')
+        listing_cache.invalidate(current_user.id, CATEGORIES)
         
         return jsonify(category.to_dict())
     except Exception as e:
@@ -574,29 +1257,299 @@ def delete_category(id):
             return jsonify({'error': 'Unauthorized'}), 403
             
         # Remove category_id from all passwords in this category
-        Password.query.filter_by(category_id=id).update({'category_id': None})
+        Password.query.filter_by(category_id=id).update({
+            'category_id': None,
+            'change_seq': next_change_seq()
+        })
         
         category_name = category.name
         db.session.delete(category)
+        log_user_action('delete_category', f'Deleted category: {category_name}', commit=False)
         db.session.commit()
-        
-        log_user_action('delete_category', f'Deleted category: {category_name}')
+        # The category's entries lost their category_id
+        listing_cache.invalidate(current_user.id, CATEGORIES, PASSWORDS)
         
         return jsonify({'message': 'Category deleted successfully'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/sync', methods=['GET', 'OPTIONS'])
+@login_required
+def sync_passwords():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        since = int(request.args.get('since') or 0)
+        include_password = request.args.get('include_password', 'false').lower() == 'true'
+        
+        # Snapshot the counter first; concurrent changes are picked up next time
+        counter = db.session.execute(
+            select(ChangeCounter.counter, ChangeCounter.pruned_seq).where(ChangeCounter.user_id == current_user.id)
+        ).first()
+        cursor, pruned_seq = counter if counter is not None else (0, 0)
+        if since and since < pruned_seq:
+            # Deletions after the cursor may have been pruned already
+            return jsonify({'error': 'Cursor is too old, a full sync is required', 'full_sync_required': True}), 410
+        
+        query = Password.query.filter(Password.user_id == current_user.id)
+        deleted = []
+        if since:
+            query = query.filter(Password.change_seq > since)
+            deleted = [row.password_id for row in db.session.execute(
+                select(PasswordTombstone.password_id).where(
+                    PasswordTombstone.user_id == current_user.id,
+                    PasswordTombstone.change_seq > since
+                )
+            )]
+        
+        changed = []
+        for p in query.order_by(Password.change_seq, Password.id).all():
+            entry = p.to_dict()
+            if include_password:
+                add_secret(entry, p.encrypted_password, p.client_ciphertext)
+            changed.append(entry)
+        
+        return jsonify({
+            'full': not since,
+            'changed': changed,
+            'deleted': deleted,
+            'cursor': str(max(cursor, since))
+        })
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except Exception as e:
+        print(f"Error in sync_passwords: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Tresor-Verschlüsselung: Einstellungen und schrittweise Migration pro Benutzer
+@app.route('/api/vault', methods=['GET', 'OPTIONS'])
+@login_required
+def get_vault_settings():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        user = db.session.get(User, current_user.id)
+        if user.vault_encryption != 'client':
+            return jsonify({'encryption': 'server', 'kdf': None, 'key_check': None, 'pending_migration': 0})
+        
+        pending = db.session.execute(
+            select(func.count(Password.id)).where(
+                Password.user_id == user.id, Password.client_ciphertext.is_(None))
+        ).scalar_one()
+        return jsonify({
+            'encryption': 'client',
+            'kdf': {
+                'algorithm': 'PBKDF2-SHA256',
+                'iterations': user.vault_kdf_iterations,
+                'salt': user.vault_kdf_salt
+            },
+            'key_check': user.vault_key_check,
+            'pending_migration': pending
+        })
+    except Exception as e:
+        print(f"Error in get_vault_settings: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/vault/client-encryption', methods=['POST', 'OPTIONS'])
+@login_required
+def enable_client_encryption():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    data = request.get_json(silent=True) or {}
+    kdf = data.get('kdf') or {}
+    key_check = data.get('key_check')
+    iterations = kdf.get('iterations')
+    salt = kdf.get('salt')
+    if kdf.get('algorithm') != 'PBKDF2-SHA256':
+        return jsonify({'error': 'Unsupported key derivation algorithm'}), 400
+    if not isinstance(iterations, int) or iterations < MIN_KDF_ITERATIONS:
+        return jsonify({'error': f'At least {MIN_KDF_ITERATIONS} iterations are required'}), 400
+    if not isinstance(salt, str) or not 16 <= len(salt) <= 64:
+        return jsonify({'error': 'Invalid salt'}), 400
+    if not isinstance(key_check, str) or not key_check or len(key_check) > CIPHERTEXT_MAX_LENGTH:
+        return jsonify({'error': 'Invalid key check'}), 400
+    
+    try:
+        user = db.session.get(User, current_user.id)
+        if user.vault_encryption == 'client':
+            return jsonify({'error': 'Client-side encryption is already enabled'}), 409
+        # A key derived from a mistyped password would lock the vault for good
+        if not user.check_password(data.get('password') or ''):
+            return jsonify({'error': 'Invalid master password'}), 403
+        
+        user.vault_encryption = 'client'
+        user.vault_kdf_salt = salt
+        user.vault_kdf_iterations = iterations
+        user.vault_key_check = key_check
+        log_user_action('enable_client_encryption', 'Enabled client-side vault encryption', commit=False)
+        db.session.commit()
+        
+        pending = Password.query.filter_by(user_id=user.id).count()
+        return jsonify({'encryption': 'client', 'pending_migration': pending})
+    except HashingBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503
+    except Exception as e:
+        print(f"Error in enable_client_encryption: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/vault/migration', methods=['GET', 'POST', 'OPTIONS'])
+@login_required
+def migrate_vault():
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    if vault_encryption() != 'client':
+        return jsonify({'error': 'Client-side encryption is not enabled'}), 409
+    
+    try:
+        pending = select(Password.id).where(
+            Password.user_id == current_user.id, Password.client_ciphertext.is_(None))
+        
+        if request.method == 'GET':
+            # Die nächsten Einträge ein letztes Mal serverseitig entschlüsseln
+            limit = parse_limit(request.args.get('limit'), default=DEFAULT_PAGE_SIZE)
+            entries = Password.query.filter(
+                Password.id.in_(pending.order_by(Password.id).limit(limit).scalar_subquery())
+            ).order_by(Password.id).all()
+            return jsonify({
+                'entries': [{
+                    'id': p.id,
+                    'password': cipher_suite.decrypt(p.encrypted_password).decode()
+                } for p in entries],
+                'remaining': db.session.execute(
+                    select(func.count()).select_from(pending.subquery())).scalar_one()
+            })
+        
+        entries = (request.get_json(silent=True) or {}).get('entries')
+        if not isinstance(entries, list) or not entries:
+            return jsonify({'error': 'entries must be a non-empty list'}), 400
+        if len(entries) > BATCH_MAX_OPERATIONS:
+            return jsonify({'error': f'At most {BATCH_MAX_OPERATIONS} entries per request'}), 400
+        
+        secrets_by_id = {}
+        for entry in entries:
+            secret = secret_columns(entry) if isinstance(entry, dict) else None
+            if not secret or not isinstance(entry.get('id'), int):
+                return jsonify({'error': 'Every entry needs an id and a ciphertext'}), 400
+            secrets_by_id[entry['id']] = secret
+        
+        change_seq = next_change_seq()
+        migrated = 0
+        for entry_id, secret in secrets_by_id.items():
+            # Entries changed by a client meanwhile already carry ciphertext
+            result = db.session.execute(
+                update(Password)
+                .where(Password.id == entry_id, Password.user_id == current_user.id,
+                       Password.client_ciphertext.is_(None))
+                .values(**secret, change_seq=change_seq)
+                .execution_options(synchronize_session=False)
+            )
+            migrated += result.rowcount
+        log_user_action('migrate_vault', f'Migrated {migrated} entries to client-side encryption', commit=False)
+        db.session.commit()
+        # Only updated_at of the listing changed
+        listing_cache.invalidate(current_user.id, PASSWORDS)
+        
+        return jsonify({
+            'migrated': migrated,
+            'remaining': db.session.execute(
+                select(func.count()).select_from(pending.subquery())).scalar_one()
+        })
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in migrate_vault: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Prometheus-Metriken (Scrape-Endpunkt, mit METRICS_TOKEN oder nur lokal erreichbar)
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    allowed = metrics_authorized(request)
+    if allowed is None:
+        return jsonify({'error': 'Not found'}), 404
+    if not allowed:
+        return jsonify({'error': 'Unauthorized'}), 401
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+# Helper function for the login/register sliding-window limits
+def throttle_auth_attempt(email):
+    retry_after = ip_limiter.hit(request.remote_addr) or account_limiter.hit(email.lower())
+    if not retry_after:
+        return None
+    response = jsonify({'error': 'Too many attempts, please try again later'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+# Helper function to bump the per-user change counter used by /api/sync
+# One upsert where the database has one, so concurrent first changes of a user
+# cannot both insert the row; elsewhere update first and insert only once.
+UPSERT_INSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+def next_change_seq():
+    # The counter lives in the user's shard, whose dialect may differ from the main database
+    dialect = db.session.get_bind(mapper=ChangeCounter.__mapper__).dialect.name
+    upsert = UPSERT_INSERTS.get(dialect)
+    if upsert is not None:
+        statement = upsert(ChangeCounter).values(user_id=current_user.id, counter=1)
+        return db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[ChangeCounter.user_id],
+                set_={'counter': ChangeCounter.counter + 1}
+            ).returning(ChangeCounter.counter)
+        ).scalar_one()
+    
+    bump = update(ChangeCounter).where(ChangeCounter.user_id == current_user.id).values(
+        counter=ChangeCounter.counter + 1)
+    if db.session.execute(bump).rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(ChangeCounter).values(user_id=current_user.id, counter=1))
+            return 1
+        except IntegrityError:
+            # Another request inserted the row first
+            db.session.execute(bump)
+    return db.session.execute(
+        select(ChangeCounter.counter).where(ChangeCounter.user_id == current_user.id)
+    ).scalar_one()
+
+# Deletions are remembered for delta sync this long; clients whose cursor is
+# older than the newest forgotten one get 410 and reload everything
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TOMBSTONE_RETENTION_DAYS', 90))
+
+def prune_tombstones():
+    # Runs in the deleting request, after its tombstones were added
+    cutoff = datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    expired = (PasswordTombstone.user_id == current_user.id) & (PasswordTombstone.deleted_at < cutoff)
+    pruned_seq = db.session.execute(select(func.max(PasswordTombstone.change_seq)).where(expired)).scalar()
+    if pruned_seq is None:
+        return
+    db.session.execute(delete(PasswordTombstone).where(expired))
+    # Older tombstones were pruned before, so this only moves forward
+    db.session.execute(update(ChangeCounter).where(ChangeCounter.user_id == current_user.id)
+                       .values(pruned_seq=pruned_seq))
+
 # Helper function to log user actions
-def log_user_action(action, details=None):
+# Mutating routes pass commit=False so the audit row is written in the same
+# transaction as the change it describes (one commit per request).
+def log_user_action(action, details=None, commit=True):
+    history_entry = History(
+        user_id=current_user.id,
+        action=action,
+        details=details,
+        ip_address=request.remote_addr
+    )
+    db.session.add(history_entry)
+    if not commit:
+        return
     try:
-        history_entry = History(
-            user_id=current_user.id,
-            action=action,
-            details=details,
-            ip_address=request.remote_addr
-        )
-        db.session.add(history_entry)
         db.session.commit()
     except Exception as e:
         print(f"Failed to log action: {str(e)}")
@@ -0,0 +1,123 @@
+import os
+import re
+import time
+
+from sqlalchemy import text
+
+# Volltextsuche über Titel, URL und Notizen (SQLite FTS5)
+#
+# password_fts is an external-content FTS5 table over the password table.
+# Triggers keep it in sync on every insert, update and delete, including
+# bulk inserts that bypass the ORM.
+FTS_SETUP = [
+    """CREATE VIRTUAL TABLE password_fts USING fts5(
+        title, url, notes, content='password', content_rowid='id'
+    )""",
+    """CREATE TRIGGER password_fts_insert AFTER INSERT ON password BEGIN
+        INSERT INTO password_fts(rowid, title, url, notes)
+        VALUES (new.id, new.title, new.url, new.notes);
+    END""",
+    """CREATE TRIGGER password_fts_delete AFTER DELETE ON password BEGIN
+        INSERT INTO password_fts(password_fts, rowid, title, url, notes)
+        VALUES ('delete', old.id, old.title, old.url, old.notes);
+    END""",
+    """CREATE TRIGGER password_fts_update AFTER UPDATE OF title, url, notes ON password BEGIN
+        INSERT INTO password_fts(password_fts, rowid, title, url, notes)
+        VALUES ('delete', old.id, old.title, old.url, old.notes);
+        INSERT INTO password_fts(rowid, title, url, notes)
+        VALUES (new.id, new.title, new.url, new.notes);
+    END""",
+    "INSERT INTO password_fts(password_fts) VALUES ('rebuild')",
+]
+
+# Whether a database has the index is detected on first use, per database:
+# shards are migrated one by one and can be added after the workers started.
+# A missing index is looked for again after FTS_RECHECK_INTERVAL seconds, so
+# workers started before `python migrate_db.py` switch over without a restart.
+FTS_RECHECK_INTERVAL = float(os.environ.get('FTS_RECHECK_INTERVAL', 60))
+_detected = {}  # engine -> (enabled, detected_at)
+
+
+def _fts_table_exists(conn):
+    return conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'password_fts'"
+    )).first() is not None
+
+
+def setup_search_index(conn):
+    # Called from the migration; SQLite builds without FTS5 fall back to LIKE
+    if conn.dialect.name != 'sqlite' or _fts_table_exists(conn):
+        return
+    print("Creating full-text search index...")
+    try:
+        with conn.begin_nested():
+            for statement in FTS_SETUP:
+                conn.execute(text(statement))
+    except Exception as e:
+        print(f"Full-text search unavailable: {str(e)}")
+
+
+def drop_search_index(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+    for trigger in ('password_fts_insert', 'password_fts_delete', 'password_fts_update'):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    conn.execute(text("DROP TABLE IF EXISTS password_fts"))
+
+
+def detect_search_index(engine):
+    """Look for the index now (e.g. right after a migration); returns whether searches use it."""
+    enabled = False
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            enabled = _fts_table_exists(conn)
+    _detected[engine] = (enabled, time.monotonic())
+    return enabled
+
+
+def fts_enabled(engine):
+    detected = _detected.get(engine)
+    if detected is None or (not detected[0] and time.monotonic() - detected[1] >= FTS_RECHECK_INTERVAL):
+        return detect_search_index(engine)
+    return detected[0]
+
+
+def build_match_query(query):
+    # Jedes Wort als Präfix-Suche, alle Wörter müssen vorkommen
+    terms = re.findall(r'\w+', query, re.UNICODE)
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def search_password_ids(session, user_id, query, limit, offset):
+    """Return (ids in rank order, total matches) for a user's search query."""
+    # Without arguments a sharded session binds to the routed shard
+    if fts_enabled(session.get_bind()):
+        match = build_match_query(query)
+        if not match:
+            return [], 0
+        params = {'user_id': user_id, 'match': match, 'limit': limit, 'offset': offset}
+        total = session.execute(text("""
+            SELECT COUNT(*) FROM password_fts
+            JOIN password ON password.id = password_fts.rowid
+            WHERE password_fts MATCH :match AND password.user_id = :user_id
+        """), params).scalar_one()
+        ids = session.execute(text("""
+            SELECT password.id FROM password_fts
+            JOIN password ON password.id = password_fts.rowid
+            WHERE password_fts MATCH :match AND password.user_id = :user_id
+            ORDER BY bm25(password_fts, 10.0, 5.0, 1.0), password.id
+            LIMIT :limit OFFSET :offset
+        """), params).scalars().all()
+        return ids, total
+
+    # % and _ in the query are literal characters, not wildcards
+    pattern = '%{}%'.format(re.sub(r'([\\%_])', r'\\\1', query))
+    params = {'user_id': user_id, 'pattern': pattern, 'limit': limit, 'offset': offset}
+    where = """password.user_id = :user_id AND (
+        password.title LIKE :pattern ESCAPE '\\' OR password.url LIKE :pattern ESCAPE '\\'
+        OR password.notes LIKE :pattern ESCAPE '\\')"""
+    total = session.execute(text(f"SELECT COUNT(*) FROM password WHERE {where}"), params).scalar_one()
+    ids = session.execute(text(
+        f"SELECT password.id FROM password WHERE {where} ORDER BY password.title, password.id LIMIT :limit OFFSET :offset"
+    ), params).scalars().all()
+    return ids, total
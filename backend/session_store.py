@@ -0,0 +1,228 @@
+import hashlib
+import importlib
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.orm import Session
+
+# Serverseitiger Session-Store und User-Cache
+#
+# Session tokens minted at login are stored server-side so they can be looked
+# up and revoked. Only a SHA-256 of each token is kept, so a leaked table or
+# memory dump does not contain usable tokens.
+#
+# SESSION_STORE selects the backend:
+#   database     tokens live in the auth_session table, fronted by a short
+#                in-memory cache (default; works across gunicorn workers)
+#   memory       tokens live only in this process (single worker / development)
+#   module:name  any factory returning an object with the same methods
+SESSION_STORE = os.environ.get('SESSION_STORE', 'database')
+SESSION_LIFETIME = timedelta(days=int(os.environ.get('SESSION_LIFETIME_DAYS', 30)))
+# How long a worker trusts its cached copy of a database session; revocations
+# made by other workers take effect after at most this many seconds
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', 30))
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 100000))
+SESSION_PURGE_INTERVAL = 600  # seconds between sweeps of expired rows
+# Changes to a user (password, 2FA, vault mode, deletion) are only invalidated in
+# the worker that made them; every other worker may serve its copy this long
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 5))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class MemorySessionStore:
+    """Token store kept in a dict; lookup and revocation are O(1)."""
+
+    def __init__(self, lifetime=SESSION_LIFETIME, max_entries=SESSION_CACHE_SIZE):
+        self.lifetime = lifetime
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()  # token hash -> (user_id, expires_at)
+        self._by_user = {}  # user_id -> set of token hashes
+        self._lock = threading.Lock()
+
+    def _put(self, token_hash, user_id, expires_at):
+        with self._lock:
+            self._sessions[token_hash] = (user_id, expires_at)
+            self._sessions.move_to_end(token_hash)
+            self._by_user.setdefault(user_id, set()).add(token_hash)
+            while len(self._sessions) > self.max_entries:
+                old_hash, (old_user, _) = self._sessions.popitem(last=False)
+                self._discard_index(old_user, old_hash)
+
+    def _discard_index(self, user_id, token_hash):
+        hashes = self._by_user.get(user_id)
+        if hashes is not None:
+            hashes.discard(token_hash)
+            if not hashes:
+                del self._by_user[user_id]
+
+    def _lookup(self, token_hash):
+        with self._lock:
+            entry = self._sessions.get(token_hash)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._sessions[token_hash]
+                self._discard_index(entry[0], token_hash)
+                return None
+            return entry[0]
+
+    def _drop(self, token_hash):
+        with self._lock:
+            entry = self._sessions.pop(token_hash, None)
+            if entry is not None:
+                self._discard_index(entry[0], token_hash)
+
+    def _drop_user(self, user_id):
+        with self._lock:
+            for token_hash in self._by_user.pop(user_id, ()):
+                self._sessions.pop(token_hash, None)
+
+    def create(self, user_id):
+        token = secrets.token_urlsafe(32)
+        self._put(hash_token(token), user_id, time.time() + self.lifetime.total_seconds())
+        return token
+
+    def get(self, token):
+        """Return the user id a token belongs to, or None if it is unknown, expired or revoked."""
+        if not token:
+            return None
+        return self._lookup(hash_token(token))
+
+    def revoke(self, token):
+        if token:
+            self._drop(hash_token(token))
+
+    def revoke_user(self, user_id):
+        self._drop_user(user_id)
+
+
+class DatabaseSessionStore(MemorySessionStore):
+    """Tokens persisted in the database; the in-memory part acts as a TTL cache."""
+
+    def __init__(self, db, model, lifetime=SESSION_LIFETIME, cache_ttl=SESSION_CACHE_TTL,
+                 max_entries=SESSION_CACHE_SIZE):
+        super().__init__(lifetime, max_entries)
+        self.db = db
+        self.model = model
+        self.cache_ttl = cache_ttl
+        self._purged_at = time.monotonic()
+
+    def _cache(self, token_hash, user_id, expires_at):
+        if self.cache_ttl > 0:
+            self._put(token_hash, user_id, min(expires_at, time.time() + self.cache_ttl))
+
+    def create(self, user_id):
+        token = secrets.token_urlsafe(32)
+        token_hash = hash_token(token)
+        now = datetime.utcnow()
+        # Own connection, so the caller's pending ORM changes are not committed with it
+        with self.db.engine.begin() as conn:
+            conn.execute(insert(self.model).values(
+                token_hash=token_hash, user_id=user_id, created_at=now, expires_at=now + self.lifetime
+            ))
+            if time.monotonic() - self._purged_at > SESSION_PURGE_INTERVAL:
+                self._purged_at = time.monotonic()
+                conn.execute(delete(self.model).where(self.model.expires_at <= now))
+        self._cache(token_hash, user_id, time.time() + self.lifetime.total_seconds())
+        return token
+
+    def get(self, token):
+        if not token:
+            return None
+        token_hash = hash_token(token)
+        user_id = self._lookup(token_hash)
+        if user_id is not None:
+            return user_id
+
+        with self.db.engine.connect() as conn:
+            row = conn.execute(
+                select(self.model.user_id, self.model.expires_at).where(self.model.token_hash == token_hash)
+            ).first()
+        if row is None or row.expires_at <= datetime.utcnow():
+            return None
+        remaining = (row.expires_at - datetime.utcnow()).total_seconds()
+        self._cache(token_hash, row.user_id, time.time() + remaining)
+        return row.user_id
+
+    def revoke(self, token):
+        if not token:
+            return
+        token_hash = hash_token(token)
+        self._drop(token_hash)
+        with self.db.engine.begin() as conn:
+            conn.execute(delete(self.model).where(self.model.token_hash == token_hash))
+
+    def revoke_user(self, user_id):
+        self._drop_user(user_id)
+        with self.db.engine.begin() as conn:
+            conn.execute(delete(self.model).where(self.model.user_id == user_id))
+
+
+def create_session_store(db, model):
+    if SESSION_STORE == 'memory':
+        return MemorySessionStore()
+    if SESSION_STORE == 'database':
+        return DatabaseSessionStore(db, model)
+    # Custom backend, e.g. a local stand-in for an external session server
+    module_name, _, factory = SESSION_STORE.partition(':')
+    return getattr(importlib.import_module(module_name), factory or 'create_session_store')()
+
+
+class UserCache:
+    """TTL-bounded cache of detached User objects for the login manager."""
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._users = OrderedDict()  # user_id -> (user, cached_until)
+        self._lock = threading.Lock()
+
+    def get(self, user_id, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._users.move_to_end(user_id)
+                return entry[0]
+
+        user = load(user_id)
+        if user is not None and self.ttl > 0:
+            with self._lock:
+                self._users[user_id] = (user, now + self.ttl)
+                self._users.move_to_end(user_id)
+                while len(self._users) > self.max_entries:
+                    self._users.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def watch(self, model):
+        """Drop cached users once a transaction that updated or deleted them commits.
+
+        Only this process's cache is affected; other workers rely on the TTL.
+        """
+        def mark(mapper, connection, target):
+            Session.object_session(target).info.setdefault('changed_user_ids', set()).add(target.id)
+
+        def after_commit(session):
+            for user_id in session.info.pop('changed_user_ids', ()):
+                self.invalidate(user_id)
+
+        def after_rollback(session, previous_transaction):
+            session.info.pop('changed_user_ids', None)
+
+        event.listen(model, 'after_update', mark)
+        event.listen(model, 'after_delete', mark)
+        event.listen(Session, 'after_commit', after_commit)
+        event.listen(Session, 'after_soft_rollback', after_rollback)
@@ -0,0 +1,313 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import jsonify
+from flask_login import user_logged_in
+from flask_sqlalchemy.session import Session
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.sql.util import find_tables
+
+from crypto import cipher_suite
+
+# Optionales Sharding: Tresordaten pro Benutzer in eigenen SQLite-Dateien
+#
+# DATABASE_SHARDS="shard1=sqlite:///windkey-1.db,shard2=sqlite:///windkey-2.db"
+# turns it on. The main database (DATABASE_URL) keeps the global tables: users,
+# sessions and the shard directory. The per-user tables
+# (entries, tombstones, history, categories, change counters) live in the
+# shard the directory assigns to the user; users without a directory row,
+# i.e. everyone from before sharding was enabled, stay in the main database
+# until shards.py moves them. Each shard is a complete Windkey database and is
+# migrated by migrate_db.py together with the main one.
+#
+# Requests are routed by setting the shard on the request's session (see
+# route_user); ShardedSession then binds the per-user tables to that engine.
+DEFAULT_SHARD = 'default'
+DATABASE_SHARDS = os.environ.get('DATABASE_SHARDS', '')
+SHARDS = dict(
+    entry.strip().split('=', 1) for entry in DATABASE_SHARDS.split(',') if entry.strip()
+)
+SHARDING = bool(SHARDS)
+# Workers cache directory rows this long; moves wait for it before copying
+SHARD_DIRECTORY_TTL = float(os.environ.get('SHARD_DIRECTORY_TTL', 5))
+# Extra wait for requests that were already running when a move started
+SHARD_MOVE_GRACE = float(os.environ.get('SHARD_MOVE_GRACE', 2))
+
+# Per-user tables, in the order they are copied when a user moves
+SHARDED_TABLES = ('category', 'password', 'password_tombstone', 'history', 'change_counter')
+# Also routed, but never moved: re-encryption checkpoints describe the database they are in
+ROUTED_TABLES = SHARDED_TABLES + ('key_rotation',)
+
+_db = None
+_directory_model = None
+_sequence_model = None
+
+
+class ShardMoving(Exception):
+    """The user's data is being moved to another shard right now."""
+
+
+class ShardedSession(Session):
+    """Binds per-user tables to the shard selected for the current request."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        shard = self.info.get('shard')
+        if bind is None and shard not in (None, DEFAULT_SHARD) and _is_sharded(mapper, clause):
+            return self._db.engines[shard]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_sharded(mapper, clause):
+    if mapper is not None:
+        names = {table.name for table in mapper.tables}
+    elif clause is not None:
+        names = {table.name for table in find_tables(clause, include_crud=True)}
+    else:
+        names = set()
+    # Plain SQL (e.g. the FTS search) and bare connections belong to the routed shard
+    return not names or any(name.split('_fts')[0] in ROUTED_TABLES for name in names)
+
+
+def session_options():
+    return {'class_': ShardedSession} if SHARDING else {}
+
+
+def binds():
+    return dict(SHARDS)
+
+
+def shard_names():
+    """Every database that can hold user data, main database first."""
+    return [DEFAULT_SHARD] + list(SHARDS)
+
+
+def engine(shard):
+    return _db.engine if shard == DEFAULT_SHARD else _db.engines[shard]
+
+
+def placement(user_id):
+    # Where a user belongs; new users are assigned here and rebalance moves others here
+    names = list(SHARDS)
+    return names[user_id % len(names)] if names else DEFAULT_SHARD
+
+
+# --- Directory ----------------------------------------------------------
+
+_directory_cache = {}  # user_id -> (shard, moving, cached_until)
+_directory_lock = threading.Lock()
+
+
+def lookup(user_id, use_cache=True):
+    """Return (shard, moving) for a user."""
+    if not SHARDING:
+        return DEFAULT_SHARD, False
+    now = time.monotonic()
+    if use_cache:
+        with _directory_lock:
+            entry = _directory_cache.get(user_id)
+        if entry is not None and entry[2] > now:
+            return entry[0], entry[1]
+
+    table = _directory_model.__table__
+    # Own connection, so lookups never join the request's transaction
+    with _db.engine.connect() as conn:
+        row = conn.execute(select(table.c.shard, table.c.moving).where(table.c.user_id == user_id)).first()
+    shard, moving = (row.shard, row.moving) if row is not None else (DEFAULT_SHARD, False)
+    with _directory_lock:
+        _directory_cache[user_id] = (shard, moving, now + SHARD_DIRECTORY_TTL)
+    return shard, moving
+
+
+def set_directory(user_id, shard, moving=False):
+    table = _directory_model.__table__
+    values = {'shard': shard, 'moving': moving, 'updated_at': datetime.utcnow()}
+    with _db.engine.begin() as conn:
+        if conn.execute(update(table).where(table.c.user_id == user_id).values(**values)).rowcount == 0:
+            conn.execute(insert(table).values(user_id=user_id, **values))
+    with _directory_lock:
+        _directory_cache.pop(user_id, None)
+
+
+def assign_user(user_id):
+    """Place a new user; returns the shard."""
+    if not SHARDING:
+        return DEFAULT_SHARD
+    shard = placement(user_id)
+    set_directory(user_id, shard)
+    return shard
+
+
+# --- Routing ------------------------------------------------------------
+
+def route_shard(shard):
+    _db.session.info['shard'] = shard
+
+
+def route_user(user_id):
+    """Send this session's per-user queries to the user's shard."""
+    if not SHARDING:
+        return
+    shard, moving = lookup(user_id)
+    if moving:
+        raise ShardMoving(user_id)
+    route_shard(shard)
+
+
+@contextmanager
+def use_shard(shard):
+    # For jobs that walk all shards; commit inside the block
+    previous = _db.session.info.get('shard')
+    route_shard(shard)
+    try:
+        yield
+    finally:
+        _db.session.info['shard'] = previous
+
+
+@contextmanager
+def use_user(user_id):
+    shard, _ = lookup(user_id, use_cache=False)
+    with use_shard(shard):
+        yield
+
+
+# --- Global ids ---------------------------------------------------------
+
+# Every database hands out ids from its own range, so ids are unique across
+# shards and stay valid when a user's rows are copied elsewhere. Shards are
+# numbered by their position in DATABASE_SHARDS (the main database is 0), so
+# new shards must be appended at the end.
+ID_RANGE_SIZE = 2 ** 40
+
+
+def _id_range_start(bind):
+    for index, shard in enumerate(shard_names()):
+        if engine(shard) is bind:
+            return index * ID_RANGE_SIZE
+    raise ValueError('Connection does not belong to a shard')
+
+
+def next_id(connection, table_name):
+    """Allocate an id on the connection that is about to insert the row.
+
+    Runs in the inserting transaction, so allocation needs no other connection
+    and is rolled back together with the row.
+    """
+    start = _id_range_start(connection.engine)
+    table = _db.metadatas[None].tables[table_name]
+    sequence = _sequence_model.__table__
+    # Write first: a read followed by a write can fail in WAL mode if another writer got in between
+    allocated = connection.execute(
+        update(sequence).where(sequence.c.name == table_name)
+        .values(next_id=sequence.c.next_id + 1)
+        .returning(sequence.c.next_id)
+    ).scalar()
+    if allocated is None:
+        connection.execute(insert(sequence).values(name=table_name, next_id=start + 1))
+        allocated = start + 1
+    candidate = allocated - 1
+
+    # Rows inserted before sharding was enabled used SQLite's own rowids
+    floor = connection.execute(
+        select(func.coalesce(func.max(table.c.id), start) + 1)
+        .where(table.c.id >= start, table.c.id < start + ID_RANGE_SIZE)
+    ).scalar_one()
+    if floor > candidate:
+        connection.execute(update(sequence).where(sequence.c.name == table_name).values(next_id=floor + 1))
+        return floor
+    return candidate
+
+
+def id_default(table_name):
+    """Column default for primary keys of sharded tables (None without sharding)."""
+    if not SHARDING:
+        return None
+    return lambda context: next_id(context.connection, table_name)
+
+
+# --- Moving users -------------------------------------------------------
+
+def _tables():
+    metadata = _db.metadatas[None]
+    return [metadata.tables[name] for name in SHARDED_TABLES]
+
+
+def copy_user(user_id, source, target):
+    tables = _tables()
+    with engine(source).connect() as src, engine(target).begin() as dst:
+        # Leftovers of an interrupted move are replaced; children first
+        for table in reversed(tables):
+            dst.execute(delete(table).where(table.c.user_id == user_id))
+        copied = 0
+        for table in tables:
+            rows = [dict(row) for row in src.execute(select(table).where(table.c.user_id == user_id)).mappings()]
+            if table.name == 'password':
+                # The target's re-encryption checkpoint may already be past these
+                # ids, so the rows arrive encrypted with the current primary key
+                for row in rows:
+                    if row['encrypted_password'] is not None:
+                        row['encrypted_password'] = cipher_suite.rotate(row['encrypted_password'])
+            if rows:
+                # Ids are global, so they are kept and clients notice nothing
+                dst.execute(insert(table), rows)
+                copied += len(rows)
+    return copied
+
+
+def purge_user(user_id, shard):
+    with engine(shard).begin() as conn:
+        for table in reversed(_tables()):
+            conn.execute(delete(table).where(table.c.user_id == user_id))
+
+
+def move_user(user_id, target, log=print):
+    """Move a user's data to another shard while the service keeps running.
+
+    The user gets 503 responses for a few seconds: the directory marks the
+    user as moving, every worker's cached entry expires, the rows are copied,
+    the directory points at the target and the old rows are deleted. Running
+    it again after an interruption finishes the move. Entries are re-encrypted
+    with the primary key on the way, so moves are safe during a key rotation.
+    """
+    if target not in shard_names():
+        raise ValueError(f'Unknown shard {target}')
+    wait = SHARD_DIRECTORY_TTL + SHARD_MOVE_GRACE
+    source, moving = lookup(user_id, use_cache=False)
+
+    if source != target:
+        set_directory(user_id, source, moving=True)
+        time.sleep(wait)
+        copied = copy_user(user_id, source, target)
+        set_directory(user_id, target)
+        log(f"User {user_id}: copied {copied} rows from {source} to {target}")
+        time.sleep(wait)
+    elif moving:
+        set_directory(user_id, target)
+
+    # Drop copies left on other shards, including those of earlier interrupted moves
+    for shard in shard_names():
+        if shard != target:
+            purge_user(user_id, shard)
+
+
+# --- Flask integration --------------------------------------------------
+
+def init_app(app, db, directory_model, sequence_model):
+    global _db, _directory_model, _sequence_model
+    _db = db
+    _directory_model = directory_model
+    _sequence_model = sequence_model
+
+    @app.errorhandler(ShardMoving)
+    def shard_moving(e):
+        response = jsonify({'error': 'Vault is being moved, please try again in a few seconds'})
+        response.headers['Retry-After'] = str(int(SHARD_DIRECTORY_TTL + SHARD_MOVE_GRACE) + 1)
+        return response, 503
+
+    # login_user() bypasses the user loaders, so route on login as well
+    @user_logged_in.connect_via(app)
+    def route_logged_in_user(sender, user):
+        route_user(user.id)
@@ -0,0 +1,84 @@
+from app import db, app, User, Password, ShardAssignment
+from sqlalchemy import func, select
+import argparse
+import os
+import sharding
+import time
+
+# Verwaltung der Shards (siehe sharding.py)
+#
+#   python shards.py status               -> users, entries and file size per shard
+#   python shards.py move USER_ID SHARD   -> move one user online
+#   python shards.py rebalance            -> move users to where placement() puts them,
+#                                            e.g. after adding a shard to DATABASE_SHARDS
+#
+# Moved users get 503 responses for a few seconds (SHARD_DIRECTORY_TTL + SHARD_MOVE_GRACE).
+
+def require_sharding():
+    if not sharding.SHARDING:
+        raise SystemExit("Sharding is not enabled; set DATABASE_SHARDS first.")
+
+def current_shards():
+    # user_id -> shard for every user, including those still in the main database
+    rows = db.session.execute(
+        select(User.id, ShardAssignment.shard).outerjoin(ShardAssignment, ShardAssignment.user_id == User.id)
+    ).all()
+    return {row.id: row.shard or sharding.DEFAULT_SHARD for row in rows}
+
+def show_status():
+    with app.app_context():
+        users = {}
+        for shard in current_shards().values():
+            users[shard] = users.get(shard, 0) + 1
+        for shard in sharding.shard_names():
+            with sharding.use_shard(shard):
+                entries = db.session.execute(select(func.count()).select_from(Password)).scalar_one()
+            url = sharding.engine(shard).url
+            size = ''
+            if url.get_backend_name() == 'sqlite' and url.database and os.path.exists(url.database):
+                size = f"  {os.path.getsize(url.database) / 1024 / 1024:.1f} MiB"
+            print(f"{shard:<16} {users.get(shard, 0):>8} users {entries:>10} entries{size}")
+
+def move(user_id, target):
+    require_sharding()
+    with app.app_context():
+        if db.session.get(User, user_id) is None:
+            raise SystemExit(f"User {user_id} not found.")
+        sharding.move_user(user_id, target)
+        print(f"User {user_id} is on {target}.")
+
+def rebalance(limit=None, pause=0.0, dry_run=False):
+    require_sharding()
+    with app.app_context():
+        moves = [(user_id, shard, sharding.placement(user_id))
+                 for user_id, shard in sorted(current_shards().items())
+                 if shard != sharding.placement(user_id)]
+        if limit is not None:
+            moves = moves[:limit]
+        for user_id, source, target in moves:
+            if dry_run:
+                print(f"Would move user {user_id} from {source} to {target}")
+                continue
+            sharding.move_user(user_id, target)
+            time.sleep(pause)
+        print(f"{'Would move' if dry_run else 'Moved'} {len(moves)} user(s).")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect shards and move users between them')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status')
+    move_parser = subparsers.add_parser('move')
+    move_parser.add_argument('user_id', type=int)
+    move_parser.add_argument('shard')
+    rebalance_parser = subparsers.add_parser('rebalance')
+    rebalance_parser.add_argument('--limit', type=int, help='Move at most this many users')
+    rebalance_parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between users')
+    rebalance_parser.add_argument('--dry-run', action='store_true', help='Only print the planned moves')
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        show_status()
+    elif args.command == 'move':
+        move(args.user_id, args.shard)
+    else:
+        rebalance(args.limit, args.pause, args.dry_run)
@@ -0,0 +1,24 @@
+import re
+
+# Passwortstärke, wie sie die Oberfläche anzeigt (0-100)
+#
+# Computed when a password is saved and stored with the entry, so the Stats
+# page gets the distribution without decrypting the vault. Client-side
+# encrypted entries send the score computed by the client (vaultCrypto.js).
+CHECKS = (
+    lambda p: len(p) >= 12,
+    lambda p: re.search(r'[A-Z]', p) is not None,
+    lambda p: re.search(r'[a-z]', p) is not None,
+    lambda p: re.search(r'[0-9]', p) is not None,
+    lambda p: re.search(r'[^A-Za-z0-9]', p) is not None,
+    lambda p: len(p) >= 16,
+)
+
+# Lower bounds of the labels shown by the frontend
+BUCKETS = (('very_strong', 80), ('strong', 60), ('medium', 40), ('weak', 20), ('very_weak', 0))
+
+
+def password_strength(password):
+    if not password:
+        return 0
+    return min(20 * sum(1 for check in CHECKS if check(password)), 100)
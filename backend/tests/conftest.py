@@ -0,0 +1,62 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import pyotp
+import pytest
+
+# The app reads its configuration at import time and keeps its key files in
+# the working directory, so both point at a throwaway directory before any
+# test module imports it. One shard is configured, so every user lives in
+# "shard1" unless a test moves them.
+DATA_DIR = tempfile.mkdtemp(prefix='windkey-tests-')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.update({
+    'DATABASE_URL': f'sqlite:///{os.path.join(DATA_DIR, "windkey.db")}',
+    'DATABASE_SHARDS': f'shard1=sqlite:///{os.path.join(DATA_DIR, "windkey-1.db")}',
+    'SHARD_DIRECTORY_TTL': '0',
+    'SHARD_MOVE_GRACE': '0',
+    'KEY_RELOAD_INTERVAL': '0',
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'SESSION_STORE': 'memory',
+    'LISTING_CACHE': 'memory',
+    # Every test client logs in from 127.0.0.1
+    'LOGIN_LIMIT_PER_IP': '100000',
+})
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+os.environ.pop('PWNED_INDEX_FILE', None)
+os.chdir(DATA_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+_emails = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    from migrate_db import migrate_database
+    import sharding
+
+    for shard in sharding.shard_names():
+        migrate_database(shard)
+    return app
+
+
+@pytest.fixture
+def login(app):
+    """Register a fresh user and return (logged-in test client, user id)."""
+    def login():
+        client = app.test_client()
+        email = f'user{next(_emails)}@example.com'
+        registered = client.post('/api/register', json={'email': email, 'password': 'master-password'})
+        assert registered.status_code == 200, registered.get_json()
+        response = client.post('/api/login', json={
+            'email': email,
+            'password': 'master-password',
+            'two_factor_code': pyotp.TOTP(registered.get_json()['two_factor_secret']).now()
+        })
+        assert response.status_code == 200, response.get_json()
+        return client, response.get_json()['user']['id']
+    return login
@@ -0,0 +1,39 @@
+import pytest
+
+
+@pytest.mark.parametrize('operation, error', [
+    ({'op': 'update', 'id': [1], 'data': {}}, 'id must be an integer'),
+    ({'op': 'delete', 'id': True}, 'id must be an integer'),
+    ({'op': 'create', 'data': 'x'}, 'data must be an object'),
+    ({'op': 'create', 'data': {'password': 'secret', 'category_id': [1]}}, 'category_id must be an integer or null'),
+    ({'op': 'create', 'data': {'password': ['secret']}}, 'password must be a string'),
+    ({'op': 'create', 'data': {'password': 'secret', 'title': None}}, 'title must be a string'),
+    ({'op': 'rename', 'id': 1}, 'Unknown operation: rename'),
+    ('create', 'Invalid operation'),
+])
+def test_malformed_operations_are_rejected_per_item(login, operation, error):
+    client, _ = login()
+    response = client.post('/api/passwords/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'Fine', 'password': 'secret'}},
+        operation,
+    ]})
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['applied'] is False
+    assert [result['error'] for result in body['results']] == [None, error]
+    assert client.get('/api/passwords').get_json() == []
+
+
+def test_valid_batch_is_applied(login):
+    client, _ = login()
+    category = client.post('/api/categories', json={'name': 'Work'}).get_json()
+    entry = client.post('/api/passwords', json={'title': 'Old', 'password': 'secret'}).get_json()
+
+    response = client.post('/api/passwords/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'New', 'password': 'secret', 'category_id': category['id']}},
+        {'op': 'update', 'id': entry['id'], 'data': {'title': 'Renamed', 'category_id': None}},
+    ]})
+
+    assert response.status_code == 200, response.get_json()
+    assert sorted(p['title'] for p in client.get('/api/passwords').get_json()) == ['New', 'Renamed']
@@ -0,0 +1,138 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import breach
+from breach import BreachCheckError, breach_count, breach_counts, range_cache, split_hash
+from breach_index import BreachIndex, ingest
+
+
+class RangeStub:
+    """Local stand-in for the range API that records every requested prefix."""
+
+    def __init__(self, breached):
+        self.ranges = {}
+        for password, count in breached.items():
+            prefix, suffix = split_hash(password)
+            self.ranges.setdefault(prefix, {})[suffix] = count
+        self.requests = []
+        self.status = 200
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                prefix = self.path.rsplit('/', 1)[-1]
+                stub.requests.append(prefix)
+                suffixes = stub.ranges.get(prefix, {})
+                # Padding entries (count 0) like the real API sends
+                lines = [f'{suffix}:{count}' for suffix, count in suffixes.items()] + ['0' * 35 + ':0']
+                body = '\r\n'.join(lines).encode()
+                self.send_response(stub.status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/range'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def range_api(monkeypatch):
+    stub = RangeStub({'password': 1000, 'letmein': 50})
+    monkeypatch.setattr(breach, 'PWNED_API_URL', stub.url)
+    range_cache.clear()
+    yield stub
+    range_cache.clear()
+    stub.close()
+
+
+def test_breach_counts_requests_each_prefix_once(range_api):
+    counts = breach_counts(['password', 'letmein', 'password', 'correct horse battery staple'])
+
+    assert counts == [1000, 50, 1000, 0]
+    assert sorted(range_api.requests) == sorted({split_hash(p)[0] for p in ['password', 'letmein',
+                                                                            'correct horse battery staple']})
+
+
+def test_ranges_are_served_from_the_shared_cache(range_api):
+    assert breach_count('password') == 1000
+    assert breach_counts(['password', 'password']) == [1000, 1000]
+
+    assert range_api.requests == [split_hash('password')[0]]
+
+
+def test_failed_range_request_is_not_cached(range_api):
+    range_api.status = 503
+    with pytest.raises(BreachCheckError):
+        breach_count('letmein')
+
+    range_api.status = 200
+    assert breach_count('letmein') == 50
+    assert len(range_api.requests) == 2
+
+
+def test_ingest_builds_a_searchable_index(tmp_path):
+    prefix, suffix = split_hash('password')
+    source = tmp_path / 'dump.txt'
+    source.write_bytes(f'{prefix}{suffix}:10\n{prefix}{suffix}:12\nnot-a-hash:1\n'.encode())
+    spill_parent = tmp_path / 'spill'
+    spill_parent.mkdir()
+
+    assert ingest(str(source), str(tmp_path / 'breach.idx'), str(spill_parent)) == 1
+
+    index = BreachIndex(str(tmp_path / 'breach.idx'))
+    assert index.count(prefix + suffix) == 12
+    assert index.range(prefix) == {suffix: 12}
+    assert index.count(''.join(split_hash('correct horse battery staple'))) == 0
+    index.close()
+    assert list(spill_parent.iterdir()) == []
+
+
+def test_failed_ingest_removes_spill_files(tmp_path):
+    spill_parent = tmp_path / 'spill'
+    spill_parent.mkdir()
+
+    with pytest.raises(FileNotFoundError):
+        ingest(str(tmp_path / 'missing.txt'), str(tmp_path / 'breach.idx'), str(spill_parent))
+
+    assert list(spill_parent.iterdir()) == []
+    assert not (tmp_path / 'breach.idx').exists()
+
+
+@pytest.mark.parametrize('payload, error', [
+    ({'passwords': 'password'}, 'passwords must be a list of strings'),
+    ({'passwords': ['password', 1]}, 'passwords must be a list of strings'),
+    ({'ids': [1, '2']}, 'ids must be a list of integers'),
+    ({'ids': 1}, 'ids must be a list of integers'),
+    ({'passwords': ['password'] * 1001}, 'At most 1000 passwords per batch'),
+    ({'ids': list(range(1001))}, 'At most 1000 passwords per batch'),
+])
+def test_batch_check_rejects_malformed_input(login, range_api, payload, error):
+    client, _ = login()
+
+    response = client.post('/api/check-password-breach/batch', json=payload)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+    assert range_api.requests == []
+
+
+def test_batch_check_of_passwords_and_entries(login, range_api):
+    client, _ = login()
+    entry = client.post('/api/passwords', json={'title': 'Mail', 'password': 'letmein'}).get_json()
+
+    by_password = client.post('/api/check-password-breach/batch', json={'passwords': ['password', 'fine']})
+    by_id = client.post('/api/check-password-breach/batch', json={'ids': [entry['id']]})
+
+    assert [r['count'] for r in by_password.get_json()['results']] == [1000, 0]
+    assert by_id.get_json()['results'] == [{'id': entry['id'], 'title': 'Mail', 'breached': True, 'count': 50}]
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import select, update
+
+import sharding
+from app import Password, db
+from domains import refresh_stored_domains, registrable_domain
+
+
+@pytest.mark.parametrize('url, domain', [
+    ('https://mail.google.co.uk/inbox', 'google.co.uk'),
+    ('https://login.bank.co.kr', 'bank.co.kr'),
+    ('shop.example.com.sg', 'example.com.sg'),
+    # Wildcard rule *.kawasaki.jp with the exception !city.kawasaki.jp
+    ('https://www.foo.kawasaki.jp', 'www.foo.kawasaki.jp'),
+    ('https://a.b.city.kawasaki.jp', 'city.kawasaki.jp'),
+    # Private suffixes: every tenant is its own site
+    ('https://my-app.web.app', 'my-app.web.app'),
+    ('https://api.worker.user.workers.dev', 'user.workers.dev'),
+    ('https://project.firebaseapp.com', 'project.firebaseapp.com'),
+    ('https://someone.github.io/repo', 'someone.github.io'),
+])
+def test_multi_label_and_private_suffixes(url, domain):
+    assert registrable_domain(url) == domain
+
+
+def test_unlisted_suffix_matches_the_exact_host():
+    assert registrable_domain('https://a.intranet.invalidtld') == 'a.intranet.invalidtld'
+    assert registrable_domain('https://b.intranet.invalidtld') == 'b.intranet.invalidtld'
+
+
+def test_hosts_without_a_registrable_domain():
+    assert registrable_domain('') == ''
+    assert registrable_domain('https://192.168.0.1:8080/login') == '192.168.0.1'
+    assert registrable_domain('https://co.kr') == 'co.kr'
+
+
+def test_match_does_not_leak_across_a_shared_suffix(login):
+    client, _ = login()
+    client.post('/api/passwords', json={'title': 'Bank', 'password': 'secret', 'url': 'https://bank.co.kr'})
+
+    response = client.get('/api/passwords/match?url=https://evil.co.kr/login').get_json()
+    assert response == {'domain': 'evil.co.kr', 'matches': []}
+    matches = client.get('/api/passwords/match?url=https://www.bank.co.kr').get_json()['matches']
+    assert [entry['title'] for entry in matches] == ['Bank']
+
+
+def test_refresh_recomputes_stored_domains(app, login):
+    client, user_id = login()
+    entry = client.post('/api/passwords', json={'title': 'Bank', 'password': 'secret',
+                                                'url': 'https://bank.co.kr'}).get_json()
+    with app.app_context(), sharding.use_user(user_id):
+        # As stored by the old partial list
+        db.session.execute(update(Password).where(Password.id == entry['id']).values(domain='co.kr'))
+        db.session.commit()
+        with sharding.engine('shard1').begin() as conn:
+            assert refresh_stored_domains(conn) >= 1
+        assert db.session.execute(select(Password.domain).where(Password.id == entry['id'])).scalar() == 'bank.co.kr'
@@ -0,0 +1,21 @@
+import time
+
+import pytest
+
+import hashing
+from hashing import HashingBusy
+
+
+def test_slow_hash_is_reported_as_busy(monkeypatch):
+    monkeypatch.setattr(hashing, 'PASSWORD_HASH_TIMEOUT', 0.05)
+
+    with pytest.raises(HashingBusy):
+        hashing._run('verify', time.sleep, 0.5)
+
+
+def test_hash_and_verify():
+    password_hash = hashing.hash_password('master-password')
+
+    assert hashing.verify_password(password_hash, 'master-password')
+    assert not hashing.verify_password(password_hash, 'wrong')
+    assert not hashing.verify_password(None, 'master-password')
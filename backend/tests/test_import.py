@@ -0,0 +1,60 @@
+import io
+import json
+
+import importers
+import routes
+
+
+def bitwarden_export(count):
+    return json.dumps({'encrypted': False, 'folders': [{'id': 'f1', 'name': 'Work'}], 'items': [
+        {'type': 1, 'name': f'Site {index}', 'folderId': 'f1',
+         'login': {'username': 'me', 'password': f'secret-{index}', 'uris': [{'uri': f'https://site{index}.com'}]}}
+        for index in range(count)
+    ]}).encode()
+
+
+def import_file(client, data, filename):
+    return client.post('/api/passwords/import', data={'file': (io.BytesIO(data), filename)},
+                       content_type='multipart/form-data')
+
+
+def import_actions(client):
+    return [entry['details'] for entry in client.get('/api/history?action=import_passwords').get_json()['entries']]
+
+
+def test_bitwarden_json_import(login):
+    client, _ = login()
+
+    response = import_file(client, bitwarden_export(3), 'export.json')
+
+    assert response.status_code == 201
+    assert response.get_json() == {'imported': 3, 'skipped': 0, 'categories_created': 1}
+    assert import_actions(client) == ['Imported 3 password entries']
+
+
+def test_oversized_bitwarden_json_is_rejected_before_parsing(login, monkeypatch):
+    client, _ = login()
+    document = bitwarden_export(3)
+    monkeypatch.setattr(importers, 'BITWARDEN_JSON_MAX_BYTES', len(document) - 1)
+
+    response = import_file(client, document, 'export.json')
+
+    assert response.status_code == 400
+    assert 'use the CSV export' in response.get_json()['error']
+    assert client.get('/api/passwords').get_json() == []
+
+
+def test_partial_import_is_recorded(login, monkeypatch):
+    client, _ = login()
+    monkeypatch.setattr(routes, 'IMPORT_BATCH_SIZE', 1)
+    rows = ['name,url,username,password'] + [f'Site {index},https://site{index}.com,me,secret' for index in range(2)]
+    # Past the decoder's first read, so the first rows are committed before it fails
+    data = '\n'.join(rows).encode() + b'\n' + b'Padding,,,\n' * 2000 + b'Broken,\xff,,x\n'
+
+    response = import_file(client, data, 'export.csv')
+
+    assert response.status_code == 400
+    imported = response.get_json()['imported']
+    assert imported >= 2
+    assert len(client.get('/api/passwords').get_json()) == imported
+    assert import_actions(client)[0].startswith(f'Partially imported {imported} password entries, then failed:')
@@ -0,0 +1,65 @@
+from listing_cache import CATEGORIES, PASSWORDS, ListingCache, MemoryCacheBackend
+
+
+class FlakyBackend(MemoryCacheBackend):
+    """Memory backend whose writes can be made to fail, like a cache server timing out."""
+
+    def __init__(self):
+        super().__init__()
+        self.down = False
+
+    def set(self, key, value, ttl=0):
+        if self.down:
+            return False
+        return super().set(key, value, ttl)
+
+
+def test_invalidate_replaces_the_generation():
+    cache = ListingCache(MemoryCacheBackend())
+    key, cached = cache.lookup(PASSWORDS, 1, 'id')
+    assert cached is None
+    cache.store(key, b'[]')
+    assert cache.lookup(PASSWORDS, 1, 'id') == (key, b'[]')
+    other_key, _ = cache.lookup(CATEGORIES, 1)
+    cache.store(other_key, b'[]')
+
+    cache.invalidate(1, PASSWORDS)
+
+    assert cache.lookup(PASSWORDS, 1, 'id')[1] is None
+    assert cache.lookup(CATEGORIES, 1)[1] == b'[]'
+
+
+def test_failed_invalidation_bypasses_the_cache_until_it_is_retried():
+    backend = FlakyBackend()
+    cache = ListingCache(backend)
+    key, _ = cache.lookup(PASSWORDS, 1)
+    cache.store(key, b'stale')
+
+    backend.down = True
+    cache.invalidate(1, PASSWORDS)
+    assert cache.lookup(PASSWORDS, 1) == (None, None)
+
+    # Once the backend answers again, the old generation must not come back
+    backend.down = False
+    new_key, cached = cache.lookup(PASSWORDS, 1)
+    assert cached is None
+    assert new_key != key
+    cache.store(new_key, b'fresh')
+    assert cache.lookup(PASSWORDS, 1) == (new_key, b'fresh')
+
+
+def test_writes_through_the_api_invalidate_listings(login):
+    client, _ = login()
+    assert client.get('/api/categories').get_json() == []
+    assert client.get('/api/passwords').get_json() == []
+
+    category = client.post('/api/categories', json={'name': 'Work'}).get_json()
+    assert [c['name'] for c in client.get('/api/categories').get_json()] == ['Work']
+
+    client.post('/api/passwords', json={'title': 'Mail', 'password': 'secret', 'category_id': category['id']})
+    assert [p['title'] for p in client.get('/api/passwords').get_json()] == ['Mail']
+    assert client.get('/api/categories').get_json()[0]['password_count'] == 1
+
+    client.delete(f"/api/categories/{category['id']}")
+    assert client.get('/api/categories').get_json() == []
+    assert client.get('/api/passwords').get_json()[0]['category_id'] is None
@@ -0,0 +1,24 @@
+import metrics
+
+REMOTE = {'REMOTE_ADDR': '203.0.113.5'}
+
+
+def test_without_a_token_only_local_scrapers_get_metrics(app, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', None)
+    client = app.test_client()
+
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base=REMOTE).status_code == 404
+    # A local reverse proxy forwarding an outside request
+    assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.5'}).status_code == 404
+
+
+def test_token_is_required_when_set(app, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 'scrape-token')
+    client = app.test_client()
+
+    assert client.get('/metrics', environ_base=REMOTE).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', environ_base=REMOTE, headers={'Authorization': 'Bearer scrape-token'})
+    assert response.status_code == 200
+    assert b'windkey_http_requests_total' in response.data
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def create(client, title):
+    response = client.post('/api/passwords', json={'title': title, 'password': 'secret'})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def all_pages(client, query):
+    entries, cursor, pages = [], None, 0
+    while True:
+        response = client.get(f'/api/passwords?{query}' + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        entries += response.get_json()
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return entries, pages
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2026, 10, 17, 12, 30, 1, 5)
+    assert decode_cursor(encode_cursor(timestamp, 7)) == (timestamp, 7)
+    assert decode_cursor(encode_cursor('Title', 8)) == ('Title', 8)
+    with pytest.raises(InvalidCursor):
+        decode_cursor('not-a-cursor')
+
+
+def test_keyset_pages_cover_every_entry_once(login):
+    client, _ = login()
+    ids = [create(client, title) for title in ['Delta', 'Alpha', 'Echo', 'Bravo', 'Charlie']]
+
+    entries, pages = all_pages(client, 'limit=2')
+    assert [entry['id'] for entry in entries] == ids
+    assert pages == 3
+
+    entries, _ = all_pages(client, 'limit=2&sort=title&order=desc')
+    assert [entry['title'] for entry in entries] == ['Echo', 'Delta', 'Charlie', 'Bravo', 'Alpha']
+
+
+def test_equal_sort_values_are_split_by_id(login):
+    client, _ = login()
+    ids = [create(client, 'Same') for _ in range(5)]
+
+    entries, _ = all_pages(client, 'limit=2&sort=title')
+    assert [entry['id'] for entry in entries] == ids
+
+
+def test_invalid_listing_parameters(login):
+    client, _ = login()
+    assert client.get('/api/passwords?cursor=garbage&limit=2').status_code == 400
+    assert client.get('/api/passwords?sort=password').status_code == 400
+    assert client.get('/api/passwords?limit=abc').status_code == 400
+
+
+def test_history_pages_newest_first(login):
+    client, _ = login()
+    for index in range(3):
+        create(client, f'Entry {index}')
+
+    first = client.get('/api/history?limit=2').get_json()
+    second = client.get(f"/api/history?limit=2&cursor={first['next_cursor']}").get_json()
+    entries = first['entries'] + second['entries']
+
+    assert first['total'] == 4  # the login and three entries
+    assert second['next_cursor'] is None
+    assert [entry['action'] for entry in entries] == ['create_password'] * 3 + ['login']
+    assert len({entry['id'] for entry in entries}) == 4
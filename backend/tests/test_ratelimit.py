@@ -0,0 +1,84 @@
+import pyotp
+
+import ratelimit
+import routes
+from ratelimit import SlidingWindowLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hits_expire_with_the_window(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    limiter = SlidingWindowLimiter(2, window=60)
+
+    assert limiter.hit('key') == 0
+    clock.now += 30
+    assert limiter.hit('key') == 0
+    assert limiter.hit('key') == 31
+    assert limiter.hit('other') == 0
+
+    # The first hit leaves the window, the second one is still in it
+    clock.now += 31
+    assert limiter.hit('key') == 0
+    assert limiter.hit('key') == 30
+
+
+def test_reset_and_key_bound(monkeypatch):
+    limiter = SlidingWindowLimiter(1, window=60, max_keys=2)
+    limiter.hit('a')
+    limiter.reset('a')
+    assert limiter.hit('a') == 0
+
+    limiter.hit('b')
+    limiter.hit('c')
+    # 'a' was seen least recently and is forgotten
+    assert limiter.hit('a') == 0
+
+
+def register(client, email):
+    response = client.post('/api/register', json={'email': email, 'password': 'master-password'})
+    return response.get_json()['two_factor_secret']
+
+
+def test_per_account_limit_and_reset_after_two_factor(app, monkeypatch):
+    monkeypatch.setattr(routes, 'account_limiter', SlidingWindowLimiter(5))
+    client = app.test_client()
+    secret = register(client, 'limited@example.com')
+    wrong = {'email': 'limited@example.com', 'password': 'wrong'}
+
+    # Registration, both login steps and the failed attempt all count
+    assert client.post('/api/login', json=wrong).status_code == 401
+    response = client.post('/api/login', json={'email': 'limited@example.com', 'password': 'master-password'})
+    assert response.status_code == 200
+    verified = client.post('/api/verify-2fa', json={'temporaryToken': response.get_json()['temporaryToken'],
+                                                    'code': pyotp.TOTP(secret).now()})
+    assert verified.status_code == 200
+
+    # The successful login cleared the account's attempts
+    for _ in range(5):
+        assert client.post('/api/login', json=wrong).status_code == 401
+    throttled = client.post('/api/login', json=wrong)
+    assert throttled.status_code == 429
+    assert int(throttled.headers['Retry-After']) > 0
+
+
+def test_per_ip_limit_applies_across_accounts(app, monkeypatch):
+    monkeypatch.setattr(routes, 'ip_limiter', SlidingWindowLimiter(2))
+    client = app.test_client()
+    remote = {'REMOTE_ADDR': '198.51.100.7'}
+
+    for index in range(2):
+        response = client.post('/api/login', environ_base=remote,
+                               json={'email': f'nobody{index}@example.com', 'password': 'x'})
+        assert response.status_code == 401
+    assert client.post('/api/login', environ_base=remote,
+                       json={'email': 'nobody2@example.com', 'password': 'x'}).status_code == 429
+    # Other addresses are not affected
+    assert client.post('/api/login', json={'email': 'nobody2@example.com', 'password': 'x'}).status_code == 401
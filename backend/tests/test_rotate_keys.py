@@ -0,0 +1,73 @@
+from cryptography.fernet import Fernet
+from sqlalchemy import select, update
+
+import rotate_keys
+import sharding
+from app import KeyRotation, Password, db
+from crypto import key_id, read_keys
+
+
+def create_entries(client, count):
+    for index in range(count):
+        response = client.post('/api/passwords', json={'title': f'Entry {index}', 'password': f'secret-{index}'})
+        assert response.status_code == 201
+
+
+def stored_entries(app, user_id):
+    with app.app_context(), sharding.use_user(user_id):
+        return db.session.execute(
+            select(Password.id, Password.encrypted_password, Password.updated_at)
+            .where(Password.user_id == user_id).order_by(Password.id)
+        ).all()
+
+
+def test_rotation_rewrites_tokens_without_touching_entries(app, login):
+    client, user_id = login()
+    create_entries(client, 3)
+    before = stored_entries(app, user_id)
+
+    rotate_keys.add_key()
+    rotate_keys.promote_key()
+    rotate_keys.reencrypt(batch_size=2, pause=0)
+    rotate_keys.retire_keys()
+
+    after = stored_entries(app, user_id)
+    readable = rotate_keys.readable_with(read_keys()[0])
+    assert len(read_keys()) == 1
+    assert all(readable(row.encrypted_password) for row in after)
+    assert [row.encrypted_password for row in after] != [row.encrypted_password for row in before]
+    # Rotation is not a change to the entry
+    assert [row.updated_at for row in after] == [row.updated_at for row in before]
+    entries = client.get('/api/passwords?include_password=true').get_json()
+    assert [entry['password'] for entry in entries] == ['secret-0', 'secret-1', 'secret-2']
+
+
+def test_retire_refuses_while_an_entry_needs_an_old_key(app, login):
+    client, user_id = login()
+    create_entries(client, 2)
+    old_key = read_keys()[0]
+
+    rotate_keys.add_key()
+    rotate_keys.promote_key()
+    rotate_keys.reencrypt(pause=0)
+    # A worker that had not reloaded the key file yet writes behind the checkpoint
+    stale_id = stored_entries(app, user_id)[0].id
+    with app.app_context(), sharding.use_user(user_id):
+        db.session.execute(update(Password).where(Password.id == stale_id)
+                           .values(encrypted_password=Fernet(old_key).encrypt(b'late-write')))
+        db.session.commit()
+
+    rotate_keys.retire_keys()
+
+    assert len(read_keys()) == 2
+    with app.app_context(), sharding.use_user(user_id):
+        checkpoint = KeyRotation.query.filter_by(key_id=key_id(read_keys()[0])).one()
+        assert checkpoint.completed_at is None
+        assert checkpoint.last_password_id == stale_id - 1
+
+    rotate_keys.reencrypt(pause=0)
+    rotate_keys.retire_keys()
+
+    assert len(read_keys()) == 1
+    response = client.get(f'/api/passwords/{stale_id}')
+    assert response.get_json()['password'] == 'late-write'
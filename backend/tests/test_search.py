@@ -0,0 +1,38 @@
+import search
+import sharding
+
+
+def test_index_is_detected_per_database_after_migration(app):
+    with app.app_context():
+        for shard in sharding.shard_names():
+            assert search.fts_enabled(sharding.engine(shard))
+
+
+def test_search_uses_the_index_of_the_users_shard(app, login, monkeypatch):
+    client, _ = login()
+    client.post('/api/passwords', json={'title': 'GitHub', 'password': 'secret', 'notes': 'work account'})
+    client.post('/api/passwords', json={'title': 'Mail', 'password': 'secret'})
+    calls = []
+    monkeypatch.setattr(search, 'fts_enabled', lambda engine: calls.append(engine) or True)
+
+    response = client.get('/api/passwords/search?q=git acc').get_json()
+
+    assert [entry['title'] for entry in response['results']] == ['GitHub']
+    with app.app_context():
+        assert calls == [sharding.engine('shard1')]
+
+
+def test_like_fallback_treats_wildcards_literally(login, monkeypatch):
+    client, _ = login()
+    for title in ['100% done', '100 done', 'my_key', 'mykey', 'back\\slash']:
+        client.post('/api/passwords', json={'title': title, 'password': 'secret'})
+    monkeypatch.setattr(search, 'fts_enabled', lambda engine: False)
+
+    def titles(query):
+        response = client.get('/api/passwords/search', query_string={'q': query}).get_json()
+        return [entry['title'] for entry in response['results']]
+
+    assert titles('100%') == ['100% done']
+    assert titles('my_') == ['my_key']
+    assert titles('k\\s') == ['back\\slash']
+    assert titles('done') == ['100 done', '100% done']
@@ -0,0 +1,64 @@
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app import AuthSession, db
+from session_store import DatabaseSessionStore, hash_token
+
+
+def stored_hashes(user_id):
+    return db.session.execute(select(AuthSession.token_hash).where(AuthSession.user_id == user_id)).scalars().all()
+
+
+def test_revocation_reaches_other_workers_after_the_cache_ttl(app, login):
+    _, user_id = login()
+    with app.app_context():
+        # Two workers: same table, separate caches
+        worker_a = DatabaseSessionStore(db, AuthSession, cache_ttl=0.2)
+        worker_b = DatabaseSessionStore(db, AuthSession, cache_ttl=0.2)
+        token = worker_a.create(user_id)
+        assert hash_token(token) in stored_hashes(user_id)
+        assert token not in stored_hashes(user_id)
+        assert worker_b.get(token) == user_id
+
+        worker_a.revoke(token)
+
+        assert worker_a.get(token) is None
+        # Worker B still trusts its cached copy until the TTL runs out
+        assert worker_b.get(token) == user_id
+        time.sleep(0.25)
+        assert worker_b.get(token) is None
+
+
+def test_without_a_cache_revocation_is_immediate(app, login):
+    _, user_id = login()
+    with app.app_context():
+        worker_a = DatabaseSessionStore(db, AuthSession, cache_ttl=0)
+        worker_b = DatabaseSessionStore(db, AuthSession, cache_ttl=0)
+        tokens = [worker_a.create(user_id) for _ in range(2)]
+        assert [worker_b.get(token) for token in tokens] == [user_id, user_id]
+
+        worker_b.revoke_user(user_id)
+
+        assert [worker_a.get(token) for token in tokens] == [None, None]
+        assert stored_hashes(user_id) == []
+        assert worker_a.get('') is None and worker_a.get('unknown') is None
+
+
+def test_expired_sessions_are_rejected(app, login):
+    _, user_id = login()
+    with app.app_context():
+        store = DatabaseSessionStore(db, AuthSession, cache_ttl=30)
+        token = store.create(user_id)
+        db.session.execute(update(AuthSession).where(AuthSession.token_hash == hash_token(token))
+                           .values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+
+        # A fresh worker reads the expired row; this one's cache is bounded by the lifetime too
+        assert DatabaseSessionStore(db, AuthSession, cache_ttl=30).get(token) is None
+        short_lived = DatabaseSessionStore(db, AuthSession, lifetime=timedelta(seconds=0.2), cache_ttl=30)
+        short_token = short_lived.create(user_id)
+        assert short_lived.get(short_token) == user_id
+        time.sleep(0.25)
+        assert short_lived.get(short_token) is None
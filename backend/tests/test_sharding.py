@@ -0,0 +1,47 @@
+from sqlalchemy import select
+
+import rotate_keys
+import sharding
+from app import Password, db
+from crypto import read_keys
+
+
+def create_entries(client, count):
+    for index in range(count):
+        response = client.post('/api/passwords', json={'title': f'Entry {index}', 'password': f'secret-{index}'})
+        assert response.status_code == 201
+
+
+def test_move_keeps_ids_and_entries(app, login):
+    client, user_id = login()
+    create_entries(client, 3)
+    before = client.get('/api/passwords?include_password=true').get_json()
+
+    with app.app_context():
+        assert sharding.lookup(user_id, use_cache=False) == ('shard1', False)
+        sharding.move_user(user_id, sharding.DEFAULT_SHARD, log=lambda message: None)
+        with sharding.use_shard('shard1'):
+            left_behind = db.session.execute(select(Password.id).where(Password.user_id == user_id)).all()
+        assert sharding.lookup(user_id, use_cache=False) == (sharding.DEFAULT_SHARD, False)
+
+    assert left_behind == []
+    assert client.get('/api/passwords?include_password=true').get_json() == before
+
+
+def test_move_during_key_rotation_keeps_entries_readable(app, login):
+    client, user_id = login()
+    create_entries(client, 3)
+
+    rotate_keys.add_key()
+    rotate_keys.promote_key()
+    # The main database finishes its pass before the user's rows arrive there
+    with app.app_context(), sharding.use_shard(sharding.DEFAULT_SHARD):
+        assert rotate_keys.reencrypt_shard(sharding.DEFAULT_SHARD, batch_size=200, pause=0, max_batches=None)
+    with app.app_context():
+        sharding.move_user(user_id, sharding.DEFAULT_SHARD, log=lambda message: None)
+    rotate_keys.reencrypt(pause=0)
+    rotate_keys.retire_keys()
+
+    assert len(read_keys()) == 1
+    entries = client.get('/api/passwords?include_password=true').get_json()
+    assert sorted(entry['password'] for entry in entries) == ['secret-0', 'secret-1', 'secret-2']
@@ -0,0 +1,21 @@
+from strength import password_strength
+
+
+def test_scores_match_the_frontend_meter():
+    assert password_strength('') == 0
+    assert password_strength('abc') == 20
+    assert password_strength('Abcdefgh1234') == 80
+    assert password_strength('Abcdefgh1234!?xyz') == 100
+
+
+def test_distribution_is_served_without_plaintext(login):
+    client, _ = login()
+    for password in ['abc', 'abcdef1', 'Abcdefgh1234!?xyz']:
+        client.post('/api/passwords', json={'title': password, 'password': password})
+    entry = client.post('/api/passwords', json={'title': 'Changed', 'password': 'abc'}).get_json()
+    client.put(f"/api/passwords/{entry['id']}", json={'password': 'Abcdefgh1234'})
+
+    response = client.get('/api/passwords/strength').get_json()
+
+    assert response == {'total': 4, 'unknown': 0, 'distribution': {
+        'very_strong': 2, 'strong': 0, 'medium': 1, 'weak': 1, 'very_weak': 0}}
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+import routes
+import sharding
+from app import PasswordTombstone, db
+
+
+def create(client, title):
+    response = client.post('/api/passwords', json={'title': title, 'password': 'secret'})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_delta_sync_returns_changes_and_deletions_since_the_cursor(login):
+    client, _ = login()
+    first = client.get('/api/sync').get_json()
+    assert first == {'full': True, 'changed': [], 'deleted': [], 'cursor': '0'}
+
+    kept, deleted = create(client, 'Kept'), create(client, 'Deleted')
+    full = client.get('/api/sync').get_json()
+    assert [entry['id'] for entry in full['changed']] == [kept, deleted]
+    assert full['cursor'] == '2'
+
+    client.put(f'/api/passwords/{kept}', json={'title': 'Renamed'})
+    client.delete(f'/api/passwords/{deleted}')
+    added = create(client, 'Added')
+
+    delta = client.get(f"/api/sync?since={full['cursor']}").get_json()
+    assert delta['full'] is False
+    assert [(entry['id'], entry['title']) for entry in delta['changed']] == [(kept, 'Renamed'), (added, 'Added')]
+    assert delta['deleted'] == [deleted]
+    assert delta['cursor'] == '5'
+
+    unchanged = client.get(f"/api/sync?since={delta['cursor']}").get_json()
+    assert unchanged['changed'] == [] and unchanged['deleted'] == []
+    assert unchanged['cursor'] == delta['cursor']
+
+
+def test_batch_shares_one_change_seq(login):
+    client, _ = login()
+    create(client, 'Existing')
+    response = client.post('/api/passwords/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'One', 'password': 'a'}},
+        {'op': 'create', 'data': {'title': 'Two', 'password': 'b'}},
+    ]})
+    assert response.get_json()['applied'] is True
+
+    delta = client.get('/api/sync?since=1').get_json()
+    assert [entry['title'] for entry in delta['changed']] == ['One', 'Two']
+    assert delta['cursor'] == '2'
+
+
+def test_invalid_sync_cursor(login):
+    client, _ = login()
+    assert client.get('/api/sync?since=abc').status_code == 400
+
+
+def test_cursor_older_than_pruned_deletions_requires_full_sync(app, login):
+    client, user_id = login()
+    old, other = create(client, 'Old'), create(client, 'Other')
+    client.delete(f'/api/passwords/{old}')
+    stale_cursor = client.get('/api/sync').get_json()['cursor']
+    with app.app_context(), sharding.use_user(user_id):
+        db.session.execute(update(PasswordTombstone).where(PasswordTombstone.user_id == user_id)
+                           .values(deleted_at=datetime.utcnow() - timedelta(days=365)))
+        db.session.commit()
+    assert client.get('/api/sync?since=1').status_code == 200
+
+    # The next deletion prunes the expired tombstone
+    client.delete(f'/api/passwords/{other}')
+
+    response = client.get('/api/sync?since=1')
+    assert response.status_code == 410
+    assert response.get_json()['full_sync_required'] is True
+    delta = client.get(f'/api/sync?since={stale_cursor}').get_json()
+    assert delta['deleted'] == [other]
+
+
+def test_change_counter_without_an_upsert(login, monkeypatch):
+    monkeypatch.setattr(routes, 'UPSERT_INSERTS', {})
+    client, _ = login()
+
+    create(client, 'First')
+    create(client, 'Second')
+
+    assert client.get('/api/sync').get_json()['cursor'] == '2'
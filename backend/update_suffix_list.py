@@ -0,0 +1,57 @@
+from app import app
+import argparse
+import domains
+import os
+import requests
+import sharding
+
+# Public Suffix List aktualisieren
+#
+#   python update_suffix_list.py                  -> download the list from publicsuffix.org
+#   python update_suffix_list.py --from FILE      -> use a copy fetched elsewhere (offline servers)
+#   python update_suffix_list.py --refresh-only   -> only recompute the stored domains
+#
+# The new list replaces PUBLIC_SUFFIX_LIST, then the domain of every entry in
+# the main database and every shard is recomputed with it. Restart the workers
+# afterwards so autofill matching uses the new list as well.
+
+PUBLIC_SUFFIX_LIST_URL = os.environ.get('PUBLIC_SUFFIX_LIST_URL', 'https://publicsuffix.org/list/public_suffix_list.dat')
+
+def fetch(source):
+    if os.path.exists(source):
+        with open(source, encoding='utf-8') as f:
+            return f.read()
+    response = requests.get(source, timeout=30)
+    response.raise_for_status()
+    return response.content.decode('utf-8')
+
+def install(text, path=domains.PUBLIC_SUFFIX_LIST):
+    # A truncated download would make most hosts fall back to exact matching
+    for marker in ('===BEGIN ICANN DOMAINS===', '===END ICANN DOMAINS===',
+                   '===BEGIN PRIVATE DOMAINS===', '===END PRIVATE DOMAINS==='):
+        if marker not in text:
+            raise SystemExit(f"Refusing to install the list: '{marker}' is missing.")
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+    domains.reload(path)
+    print(f"Installed {len(domains._rules) + len(domains._wildcards) + len(domains._exceptions)} rules to {path}")
+
+def refresh():
+    with app.app_context():
+        for shard in sharding.shard_names():
+            with sharding.engine(shard).begin() as conn:
+                changed = domains.refresh_stored_domains(conn)
+            print(f"Updated the domain of {changed} entries in {shard}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Update the Public Suffix List and the stored entry domains')
+    parser.add_argument('--from', dest='source', default=PUBLIC_SUFFIX_LIST_URL,
+                        help='URL or local file to read the list from')
+    parser.add_argument('--refresh-only', action='store_true', help='Keep the list, only recompute domains')
+    args = parser.parse_args()
+
+    if not args.refresh_only:
+        install(fetch(args.source))
+    refresh()
@@ -5,17 +5,25 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
   }
 });
 
+const API_URL = 'http://localhost:5000/api';
+
 // Handle form detection
 async function handleFormDetection(url, formData) {
   try {
-    // Check if we have credentials for this URL
-    const { passwords } = await chrome.storage.local.get('passwords');
-    if (!passwords) return;
+    // Ask the server for entries of this site's domain (no full sync needed)
+    const { token } = await chrome.storage.local.get('token');
+    if (!token) return;
 
-    const matchingPassword = passwords.find(p => {
-      if (!p.url) return false;
-      return url.includes(new URL(p.url).hostname);
+    const response = await fetch(`${API_URL}/passwords/match?url=${encodeURIComponent(url)}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`
+      },
+      credentials: 'include'
     });
+    if (!response.ok) return;
+
+    const { matches } = await response.json();
+    const matchingPassword = matches[0];
 
     if (matchingPassword) {
       // Show notification that we can autofill
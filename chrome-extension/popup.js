@@ -2,6 +2,8 @@ document.addEventListener('DOMContentLoaded', () => {
   const API_URL = 'http://localhost:5000/api';
   let currentUser = null;
   let tempAuthData = null;
+  // Needed once after login to derive the client-side vault key
+  let pendingMasterPassword = null;
 
   // UI Elements
   const loginForm = document.getElementById('login-form');
@@ -72,6 +74,7 @@ document.addEventListener('DOMContentLoaded', () => {
     e.preventDefault();
     const email = document.getElementById('email').value;
     const password = document.getElementById('password').value;
+    pendingMasterPassword = password;
     const loginButton = document.querySelector('#login-form button[type="submit"]');
     const originalButtonText = loginButton.innerHTML;
     
@@ -176,15 +179,44 @@ document.addEventListener('DOMContentLoaded', () => {
 
   async function handleLoginSuccess(data) {
     await chrome.storage.local.set({ token: data.token });
+    // Start with a full sync for the (possibly different) user
+    await chrome.storage.local.remove(['passwords', 'syncCursor']);
+    try {
+      await unlockVault(data.token);
+    } catch (error) {
+      console.error('Vault unlock failed:', error);
+      showStatusMessage('Tresor konnte nicht entsperrt werden', 'error');
+    } finally {
+      pendingMasterPassword = null;
+    }
     currentUser = data.user;
     showPasswordList();
     updateUserStatus();
     showStatusMessage('Erfolgreich eingeloggt', 'success');
   }
 
+  // Clientseitige Verschlüsselung: Schlüssel aus dem Master-Passwort ableiten
+  async function unlockVault(token) {
+    await windkeyVault.lock();
+    const response = await fetch(`${API_URL}/vault`, {
+      headers: {
+        'Authorization': `Bearer ${token}`
+      },
+      credentials: 'include'
+    });
+    if (!response.ok) {
+      throw new Error('Failed to load vault settings');
+    }
+    const vault = await response.json();
+    await chrome.storage.local.set({ vaultEncryption: vault.encryption });
+    if (vault.encryption === 'client') {
+      await windkeyVault.unlock(pendingMasterPassword, vault.kdf, vault.key_check);
+    }
+  }
+
   async function handleAddPassword(e) {
     e.preventDefault();
-    const newPassword = {
+    let newPassword = {
       title: document.getElementById('title').value,
       username: document.getElementById('username').value,
       password: document.getElementById('new-pass').value,
@@ -193,6 +225,12 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     try {
+      const { vaultEncryption } = await chrome.storage.local.get('vaultEncryption');
+      if (vaultEncryption === 'client') {
+        const { password, ...fields } = newPassword;
+        Object.assign(fields, await windkeyVault.seal(password));
+        newPassword = fields;
+      }
       const token = await chrome.storage.local.get('token');
       const response = await fetch(`${API_URL}/passwords`, {
         method: 'POST',
@@ -219,7 +257,12 @@ document.addEventListener('DOMContentLoaded', () => {
   async function syncPasswords() {
     try {
       const token = await chrome.storage.local.get('token');
-      const response = await fetch(`${API_URL}/passwords`, {
+      const { passwords = [], syncCursor } = await chrome.storage.local.get(['passwords', 'syncCursor']);
+      const params = new URLSearchParams({ include_password: 'true' });
+      if (syncCursor) {
+        params.set('since', syncCursor);
+      }
+      const response = await fetch(`${API_URL}/sync?${params}`, {
         headers: {
           'Authorization': `Bearer ${token.token}`
         },
@@ -227,9 +270,10 @@ document.addEventListener('DOMContentLoaded', () => {
       });
 
       if (response.ok) {
-        const passwords = await response.json();
-        await chrome.storage.local.set({ passwords });
-        displayPasswords(passwords);
+        const delta = await response.json();
+        const updated = applySyncDelta(delta.full ? [] : passwords, delta);
+        await chrome.storage.local.set({ passwords: updated, syncCursor: delta.cursor });
+        displayPasswords(updated);
       } else {
         throw new Error('Failed to sync passwords');
       }
@@ -239,6 +283,16 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
 
+  // Merge changed entries and drop deleted ones from the local cache
+  function applySyncDelta(passwords, delta) {
+    const changedIds = new Set(delta.changed.map(p => p.id));
+    const deletedIds = new Set(delta.deleted);
+    return passwords
+      .filter(p => !changedIds.has(p.id) && !deletedIds.has(p.id))
+      .concat(delta.changed)
+      .sort((a, b) => a.id - b.id);
+  }
+
   function displayPasswords(passwords) {
     passwordsContainer.innerHTML = '';
     passwords.forEach(password => {
@@ -267,9 +321,13 @@ document.addEventListener('DOMContentLoaded', () => {
         copyToClipboard(password.username, 'Benutzername');
       });
 
-      passwordBtn.addEventListener('click', (e) => {
+      passwordBtn.addEventListener('click', async (e) => {
         e.stopPropagation();
-        copyToClipboard(password.password, 'Passwort');
+        try {
+          copyToClipboard(await windkeyVault.reveal(password), 'Passwort');
+        } catch (error) {
+          showCopyFeedback(error.message, true);
+        }
       });
 
       passwordsContainer.appendChild(item);
@@ -0,0 +1,92 @@
+// Clientseitige Tresor-Verschlüsselung (gleiches Format wie frontend/src/utils/vaultCrypto.js)
+//
+// The derived key bits are kept in chrome.storage.session, which lives in
+// memory only and is cleared when the browser closes.
+const windkeyVault = (() => {
+  const KEY_CHECK_VALUE = 'windkey-vault-key-check';
+  const encoder = new TextEncoder();
+  const decoder = new TextDecoder();
+
+  const toBase64 = (bytes) => btoa(String.fromCharCode(...new Uint8Array(bytes)));
+  const fromBase64 = (text) => Uint8Array.from(atob(text), c => c.charCodeAt(0));
+  const toHex = (bytes) => Array.from(new Uint8Array(bytes), b => b.toString(16).padStart(2, '0')).join('');
+
+  async function importKeys(bits) {
+    const encryptionKey = await crypto.subtle.importKey(
+      'raw', bits.slice(0, 32), 'AES-GCM', false, ['encrypt', 'decrypt']
+    );
+    const fingerprintKey = await crypto.subtle.importKey(
+      'raw', bits.slice(32), { name: 'HMAC', hash: 'SHA-256' }, false, ['sign']
+    );
+    return { encryptionKey, fingerprintKey };
+  }
+
+  async function decryptSecret(keys, sealed) {
+    if (!sealed.startsWith('v1.')) {
+      throw new Error('Unknown ciphertext format');
+    }
+    const blob = fromBase64(sealed.slice(3));
+    const plaintext = await crypto.subtle.decrypt(
+      { name: 'AES-GCM', iv: blob.slice(0, 12) }, keys.encryptionKey, blob.slice(12)
+    );
+    return decoder.decode(plaintext);
+  }
+
+  async function encryptSecret(keys, plaintext) {
+    const iv = crypto.getRandomValues(new Uint8Array(12));
+    const ciphertext = new Uint8Array(await crypto.subtle.encrypt(
+      { name: 'AES-GCM', iv }, keys.encryptionKey, encoder.encode(plaintext)
+    ));
+    const blob = new Uint8Array(iv.length + ciphertext.length);
+    blob.set(iv);
+    blob.set(ciphertext, iv.length);
+    return `v1.${toBase64(blob)}`;
+  }
+
+  // Derive the key from the master password and keep it for this browser session
+  async function unlock(masterPassword, kdf, keyCheck) {
+    const baseKey = await crypto.subtle.importKey(
+      'raw', encoder.encode(masterPassword), 'PBKDF2', false, ['deriveBits']
+    );
+    const bits = new Uint8Array(await crypto.subtle.deriveBits(
+      { name: 'PBKDF2', hash: 'SHA-256', salt: fromBase64(kdf.salt), iterations: kdf.iterations },
+      baseKey,
+      512
+    ));
+    const keys = await importKeys(bits);
+    if ((await decryptSecret(keys, keyCheck)) !== KEY_CHECK_VALUE) {
+      throw new Error('Vault key check failed');
+    }
+    await chrome.storage.session.set({ vaultKey: toBase64(bits) });
+  }
+
+  async function loadKeys() {
+    const { vaultKey } = await chrome.storage.session.get('vaultKey');
+    if (!vaultKey) {
+      throw new Error('Tresor gesperrt, bitte erneut anmelden');
+    }
+    return importKeys(fromBase64(vaultKey));
+  }
+
+  async function reveal(entry) {
+    if (entry.ciphertext === undefined) {
+      return entry.password;
+    }
+    return decryptSecret(await loadKeys(), entry.ciphertext);
+  }
+
+  async function seal(plaintext) {
+    const keys = await loadKeys();
+    const fingerprint = await crypto.subtle.sign('HMAC', keys.fingerprintKey, encoder.encode(plaintext));
+    return {
+      ciphertext: await encryptSecret(keys, plaintext),
+      fingerprint: toHex(fingerprint)
+    };
+  }
+
+  function lock() {
+    return chrome.storage.session.remove('vaultKey');
+  }
+
+  return { unlock, reveal, seal, lock };
+})();
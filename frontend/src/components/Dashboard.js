@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Container,
   Grid,
@@ -42,9 +42,13 @@ import {
 } from '@mui/icons-material';
 import axios from 'axios';
 import Stats from './Stats';
+import { useAuth } from '../contexts/AuthContext';
 
 export default function Dashboard() {
+  const { sealPassword, revealPassword } = useAuth();
   const [passwords, setPasswords] = useState([]);
+  // A ref, so event listeners registered on mount always see the latest cursor
+  const syncCursor = useRef(null);
   const [open, setOpen] = useState(false);
   const [editingPassword, setEditingPassword] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
@@ -83,12 +87,19 @@ export default function Dashboard() {
       setShowStats(prev => !prev);
     };
 
+    // Entries added elsewhere (quick add in the layout) arrive through the delta sync
+    const handlePasswordsChanged = () => {
+      syncPasswords();
+    };
+
     window.addEventListener('openNewPasswordDialog', handleNewPasswordDialog);
     window.addEventListener('toggleStats', handleStatsToggle);
+    window.addEventListener('passwordsChanged', handlePasswordsChanged);
 
     return () => {
       window.removeEventListener('openNewPasswordDialog', handleNewPasswordDialog);
       window.removeEventListener('toggleStats', handleStatsToggle);
+      window.removeEventListener('passwordsChanged', handlePasswordsChanged);
     };
   }, []);
 
@@ -101,9 +112,34 @@ export default function Dashboard() {
 
   const fetchPasswords = async () => {
     try {
-      const response = await axios.get('/api/passwords');
-      setPasswords(response.data);
+      const response = await axios.get('/api/sync');
+      setPasswords(response.data.changed);
+      syncCursor.current = response.data.cursor;
+    } catch (error) {
+      showSnackbar('Fehler beim Laden der Passwörter', 'error');
+    }
+  };
+
+  // Nur die Änderungen seit dem letzten Abgleich laden
+  const syncPasswords = async () => {
+    if (!syncCursor.current) {
+      return fetchPasswords();
+    }
+    try {
+      const response = await axios.get(`/api/sync?since=${syncCursor.current}`);
+      const { changed, deleted, cursor } = response.data;
+      const changedIds = new Set(changed.map(p => p.id));
+      const deletedIds = new Set(deleted);
+      setPasswords(prev => prev
+        .filter(p => !changedIds.has(p.id) && !deletedIds.has(p.id))
+        .concat(changed)
+        .sort((a, b) => a.id - b.id));
+      syncCursor.current = cursor;
     } catch (error) {
+      // Cursor older than the retained deletions: reload everything
+      if (error.response?.status === 410) {
+        return fetchPasswords();
+      }
       showSnackbar('Fehler beim Laden der Passwörter', 'error');
     }
   };
@@ -119,10 +155,11 @@ export default function Dashboard() {
         // Lade das vollständige Passwort mit allen Details
         const response = await axios.get(`/api/passwords/${password.id}`);
         const fullPassword = response.data;
+        const plaintext = await revealPassword(fullPassword);
         setEditingPassword(password);
         setFormData({
           title: fullPassword.title,
-          password: fullPassword.password, // Jetzt haben wir das entschlüsselte Passwort
+          password: plaintext, // Jetzt haben wir das entschlüsselte Passwort
           url: fullPassword.url || '',
           notes: fullPassword.notes || '',
         });
@@ -155,15 +192,18 @@ export default function Dashboard() {
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
+      // Bei clientseitiger Verschlüsselung wird das Passwort vor dem Senden verschlüsselt
+      const { password, ...fields } = formData;
+      const payload = password ? { ...fields, ...(await sealPassword(password)) } : fields;
       if (editingPassword) {
-        await axios.put(`/api/passwords/${editingPassword.id}`, formData);
+        await axios.put(`/api/passwords/${editingPassword.id}`, payload);
         showSnackbar('Passwort erfolgreich aktualisiert');
       } else {
-        await axios.post('/api/passwords', formData);
+        await axios.post('/api/passwords', payload);
         showSnackbar('Passwort erfolgreich gespeichert');
       }
       handleClose();
-      fetchPasswords();
+      syncPasswords();
     } catch (error) {
       showSnackbar('Fehler beim Speichern des Passworts', 'error');
     }
@@ -173,7 +213,7 @@ export default function Dashboard() {
     try {
       await axios.delete(`/api/passwords/${id}`);
       showSnackbar('Passwort erfolgreich gelöscht');
-      fetchPasswords();
+      syncPasswords();
     } catch (error) {
       showSnackbar('Fehler beim Löschen des Passworts', 'error');
     }
@@ -201,8 +241,9 @@ export default function Dashboard() {
 
   const handleCopyPassword = async (id) => {
     try {
-      const password = passwords.find((p) => p.id === id);
-      await navigator.clipboard.writeText(password.password);
+      // Die Liste enthält nur Metadaten, Klartext einzeln laden
+      const response = await axios.get(`/api/passwords/${id}`);
+      await navigator.clipboard.writeText(await revealPassword(response.data));
       showSnackbar('Passwort in die Zwischenablage kopiert');
     } catch (error) {
       showSnackbar('Fehler beim Kopieren des Passworts', 'error');
@@ -17,30 +17,41 @@ import axios from 'axios';
 
 export default function History() {
   const [history, setHistory] = useState([]);
+  const [total, setTotal] = useState(0);
   const [showIp, setShowIp] = useState(false);
   const [page, setPage] = useState(0);
   const [rowsPerPage, setRowsPerPage] = useState(10);
+  // Cursor for the start of each page loaded so far (page 0 has none)
+  const [cursors, setCursors] = useState([null]);
 
   useEffect(() => {
-    fetchHistory();
-  }, []);
+    fetchHistory(0, [null]);
+  }, [rowsPerPage]);
 
-  const fetchHistory = async () => {
+  const fetchHistory = async (newPage, pageCursors) => {
     try {
-      const response = await axios.get('/api/history');
-      setHistory(response.data);
+      const params = new URLSearchParams({ limit: rowsPerPage });
+      if (pageCursors[newPage]) {
+        params.set('cursor', pageCursors[newPage]);
+      }
+      const response = await axios.get(`/api/history?${params}`);
+      const updatedCursors = pageCursors.slice(0, newPage + 1);
+      updatedCursors[newPage + 1] = response.data.next_cursor;
+      setHistory(response.data.entries);
+      setTotal(response.data.total);
+      setCursors(updatedCursors);
+      setPage(newPage);
     } catch (error) {
       console.error('Failed to fetch history:', error);
     }
   };
 
   const handleChangePage = (event, newPage) => {
-    setPage(newPage);
+    fetchHistory(newPage, cursors);
   };
 
   const handleChangeRowsPerPage = (event) => {
     setRowsPerPage(parseInt(event.target.value, 10));
-    setPage(0);
   };
 
   const formatDate = (dateString) => {
@@ -85,7 +96,6 @@ export default function History() {
           </TableHead>
           <TableBody>
             {history
-              .slice(page * rowsPerPage, page * rowsPerPage + rowsPerPage)
               .map((entry, index) => (
                 <TableRow key={index}>
                   <TableCell>{formatDate(entry.timestamp)}</TableCell>
@@ -99,7 +109,7 @@ export default function History() {
         <TablePagination
           rowsPerPageOptions={[10, 25, 50]}
           component="div"
-          count={history.length}
+          count={total}
           rowsPerPage={rowsPerPage}
           page={page}
           onPageChange={handleChangePage}
@@ -50,7 +50,7 @@ import axios from 'axios';
 
 export default function Layout() {
   const location = useLocation();
-  const { logout, user } = useAuth();
+  const { logout, user, sealPassword } = useAuth();
   const { darkMode, toggleDarkMode } = useTheme();
   const muiTheme = useMuiTheme();
   const [anchorEl, setAnchorEl] = useState(null);
@@ -212,12 +212,13 @@ export default function Layout() {
         return;
       }
 
-      await axios.post('/api/passwords', newPassword);
+      const { password, ...fields } = newPassword;
+      await axios.post('/api/passwords', { ...fields, ...(await sealPassword(password)) });
       handleNewPasswordClose();
-      // Refresh the current page to show the new password
-      window.location.reload();
+      // No page reload: it would drop the in-memory vault key and lock the vault
+      window.dispatchEvent(new Event('passwordsChanged'));
     } catch (error) {
-      setError(error.response?.data?.error || 'Failed to create password');
+      setError(error.response?.data?.error || error.message || 'Failed to create password');
     }
   };
 
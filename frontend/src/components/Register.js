@@ -275,7 +275,7 @@ export default function Register() {
               <img
                 src={qrCode}
                 alt="2FA QR Code"
-                style={{ maxWidth: '200px', height: 'auto' }}
+                style={{ width: '200px', height: 'auto' }}
               />
             )}
           </Box>
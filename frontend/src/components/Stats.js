@@ -27,17 +27,21 @@ import {
   ContentCopy as ContentCopyIcon
 } from '@mui/icons-material';
 import axios from 'axios';
+import { useAuth } from '../contexts/AuthContext';
 
 const Stats = () => {
-  const [passwords, setPasswords] = useState([]);
+  const { revealPassword } = useAuth();
+  const [strength, setStrength] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [openDuplicatesDialog, setOpenDuplicatesDialog] = useState(false);
   const [openBreachedDialog, setOpenBreachedDialog] = useState(false);
-  const [breachedPasswords, setBreachedPasswords] = useState([]);
+  const [breachedEntries, setBreachedEntries] = useState([]);
+  const [breachPending, setBreachPending] = useState(0);
   const [checkingBreaches, setCheckingBreaches] = useState(false);
   const [snackbar, setSnackbar] = useState({ open: false, message: '', severity: 'info' });
   const [selectedPassword, setSelectedPassword] = useState(null);
+  const [duplicateGroups, setDuplicateGroups] = useState([]);
 
   const handleSnackbarClose = () => {
     setSnackbar(prev => ({ ...prev, open: false }));
@@ -47,129 +51,73 @@ const Stats = () => {
     setSnackbar({ open: true, message, severity });
   };
 
+  // Ergebnisse des Hintergrund-Scans, ohne erneute Prüfung
+  const fetchBreachResults = async () => {
+    try {
+      const response = await axios.get('/api/passwords/breached');
+      setBreachedEntries(response.data.entries);
+      setBreachPending(response.data.pending);
+      return response.data.entries;
+    } catch (err) {
+      console.error('Failed to fetch breach results:', err);
+      return [];
+    }
+  };
+
   useEffect(() => {
-    const fetchPasswords = async () => {
+    // Stärke-Verteilung wird serverseitig gespeichert, der Tresor bleibt verschlüsselt
+    const fetchStrength = async () => {
       try {
-        const response = await axios.get('/api/passwords');
-        setPasswords(response.data);
+        const response = await axios.get('/api/passwords/strength');
+        setStrength(response.data);
         setLoading(false);
       } catch (err) {
-        console.error('Failed to fetch passwords:', err);
+        console.error('Failed to fetch password strength:', err);
         setError('Failed to load passwords');
         setLoading(false);
       }
     };
 
-    fetchPasswords();
+    const fetchDuplicateGroups = async () => {
+      try {
+        const response = await axios.get('/api/passwords/reuse');
+        setDuplicateGroups(response.data.groups);
+      } catch (err) {
+        console.error('Failed to fetch reused passwords:', err);
+      }
+    };
+
+    fetchStrength();
+    fetchDuplicateGroups();
+    fetchBreachResults();
   }, []);
 
-  const calculatePasswordStrength = (password) => {
-    if (!password) return { score: 0, label: 'Kein Passwort', color: 'error' };
-    
-    let score = 0;
-    const checks = {
-      length: password.length >= 12,
-      uppercase: /[A-Z]/.test(password),
-      lowercase: /[a-z]/.test(password),
-      numbers: /[0-9]/.test(password),
-      special: /[^A-Za-z0-9]/.test(password),
-      length_bonus: password.length >= 16
-    };
-    
-    if (checks.length) score += 20;
-    if (checks.uppercase) score += 20;
-    if (checks.lowercase) score += 20;
-    if (checks.numbers) score += 20;
-    if (checks.special) score += 20;
-    if (checks.length_bonus) score += 20;
-    
-    score = Math.min(score, 100);
-    
-    if (score < 20) return { score, label: 'Sehr schwach', color: 'error' };
-    if (score < 40) return { score, label: 'Schwach', color: 'error' };
-    if (score < 60) return { score, label: 'Mittel', color: 'warning' };
-    if (score < 80) return { score, label: 'Stark', color: 'info' };
-    return { score, label: 'Sehr stark', color: 'success' };
-  };
+  const breachedPasswords = breachedEntries.map(entry => ({ ...entry, breachCount: entry.breach_count }));
 
   const getPasswordStats = () => {
-    if (!passwords || passwords.length === 0) {
-      return {
-        total: 0,
-        strength: {
-          veryWeak: 0,
-          weak: 0,
-          medium: 0,
-          strong: 0,
-          veryStrong: 0
-        },
-        duplicates: 0,
-        averageLength: 0,
-        shortPasswords: 0,
-        longPasswords: 0
-      };
-    }
-
-    const stats = {
-      total: passwords.length,
+    const distribution = strength ? strength.distribution : {};
+    return {
+      total: strength ? strength.total : 0,
+      unknown: strength ? strength.unknown : 0,
       strength: {
-        veryWeak: 0,
-        weak: 0,
-        medium: 0,
-        strong: 0,
-        veryStrong: 0
+        veryWeak: distribution.very_weak || 0,
+        weak: distribution.weak || 0,
+        medium: distribution.medium || 0,
+        strong: distribution.strong || 0,
+        veryStrong: distribution.very_strong || 0
       },
-      duplicates: 0,
-      averageLength: 0,
-      shortPasswords: 0,
-      longPasswords: 0
+      // Duplicate groups are computed server-side from password fingerprints
+      duplicates: duplicateGroups.length
     };
-
-    // Count duplicate passwords
-    const passwordCounts = {};
-    passwords.forEach(p => {
-      passwordCounts[p.password] = (passwordCounts[p.password] || 0) + 1;
-    });
-    stats.duplicates = Object.values(passwordCounts).filter(count => count > 1).length;
-
-    // Calculate other statistics
-    passwords.forEach(p => {
-      const strength = calculatePasswordStrength(p.password);
-      
-      if (strength.score < 20) stats.strength.veryWeak++;
-      else if (strength.score < 40) stats.strength.weak++;
-      else if (strength.score < 60) stats.strength.medium++;
-      else if (strength.score < 80) stats.strength.strong++;
-      else stats.strength.veryStrong++;
-
-      stats.averageLength += p.password.length;
-      if (p.password.length < 8) stats.shortPasswords++;
-      if (p.password.length > 16) stats.longPasswords++;
-    });
-
-    stats.averageLength = stats.total ? Math.round(stats.averageLength / stats.total) : 0;
-
-    return stats;
   };
 
   const checkForBreaches = async () => {
     setCheckingBreaches(true);
-    const breached = [];
     
     try {
-      for (const password of passwords) {
-        const response = await axios.post('/api/check-password-breach', {
-          password: password.password
-        });
-        
-        if (response.data.breached) {
-          breached.push({
-            ...password,
-            breachCount: response.data.count
-          });
-        }
-      }
-      setBreachedPasswords(breached);
+      // Ohne ids prüft der Server alle serverseitig verschlüsselten Einträge
+      await axios.post('/api/check-password-breach/batch', {});
+      const breached = await fetchBreachResults();
       if (breached.length > 0) {
         showSnackbarMessage(`${breached.length} kompromittierte Passwörter gefunden!`, 'error');
         setOpenBreachedDialog(true);
@@ -181,19 +129,16 @@ const Stats = () => {
     }
   };
 
-  const getDuplicateGroups = () => {
-    const groups = {};
-    passwords.forEach(p => {
-      if (!groups[p.password]) {
-        groups[p.password] = [];
-      }
-      groups[p.password].push(p);
-    });
-    return Object.values(groups).filter(group => group.length > 1);
+  const copyPassword = async (id) => {
+    try {
+      const response = await axios.get(`/api/passwords/${id}`);
+      await navigator.clipboard.writeText(await revealPassword(response.data));
+      showSnackbarMessage('Passwort wurde kopiert', 'success');
+    } catch (error) {
+      showSnackbarMessage('Fehler beim Kopieren des Passworts', 'error');
+    }
   };
 
-  const duplicateGroups = getDuplicateGroups();
-
   const StatCard = ({ title, value, icon, color, tooltip }) => (
     <Tooltip title={tooltip}>
       <Card sx={{ height: '100%' }}>
@@ -296,11 +241,11 @@ const Stats = () => {
           </Grid>
           <Grid item xs={12} sm={6} md={3}>
             <StatCard
-              title="Ø Länge"
-              value={stats.averageLength}
+              title="Schwach"
+              value={stats.strength.weak + stats.strength.veryWeak}
               icon={<InfoIcon color="info" />}
               color="info"
-              tooltip="Durchschnittliche Passwortlänge"
+              tooltip="Schwache und sehr schwache Passwörter"
             />
           </Grid>
           <Grid item xs={12} sm={6} md={3}>
@@ -334,6 +279,11 @@ const Stats = () => {
                     'Sicher'
                   )}
                 </Typography>
+                {!checkingBreaches && breachPending > 0 && (
+                  <Typography variant="body2" color="text.secondary">
+                    {breachPending} noch nicht geprüft
+                  </Typography>
+                )}
                 {!checkingBreaches && (
                   <Button 
                     size="small" 
@@ -385,6 +335,11 @@ const Stats = () => {
             total={stats.total}
             color="error"
           />
+          {stats.unknown > 0 && (
+            <Typography variant="body2" color="text.secondary">
+              {stats.unknown} Einträge ohne Stärke-Angabe (werden beim nächsten Speichern bewertet)
+            </Typography>
+          )}
         </Paper>
 
         {/* Dialog für Duplikate */}
@@ -432,10 +387,7 @@ const Stats = () => {
                         <Tooltip title="Passwort kopieren">
                           <IconButton 
                             size="small"
-                            onClick={() => {
-                              navigator.clipboard.writeText(item.password);
-                              showSnackbarMessage('Passwort wurde kopiert', 'success');
-                            }}
+                            onClick={() => copyPassword(item.id)}
                           >
                             <ContentCopyIcon fontSize="small" />
                           </IconButton>
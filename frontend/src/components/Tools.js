@@ -1,6 +1,13 @@
-import React from 'react';
+import React, { useState } from 'react';
 import {
+  Alert,
   Box,
+  Button,
+  Dialog,
+  DialogActions,
+  DialogContent,
+  DialogTitle,
+  TextField,
   Grid,
   Paper,
   Typography,
@@ -19,9 +26,31 @@ import {
   VerifiedUser as VerifiedUserIcon,
   Extension as ExtensionIcon,
   ImportExport as ImportExportIcon,
+  Lock as LockIcon,
 } from '@mui/icons-material';
+import { useAuth } from '../contexts/AuthContext';
 
 export default function Tools() {
+  const { vaultEncryption, enableClientEncryption } = useAuth();
+  const [encryptionDialogOpen, setEncryptionDialogOpen] = useState(false);
+  const [masterPassword, setMasterPassword] = useState('');
+  const [encryptionError, setEncryptionError] = useState('');
+  const [enabling, setEnabling] = useState(false);
+
+  const handleEnableEncryption = async () => {
+    setEnabling(true);
+    setEncryptionError('');
+    try {
+      await enableClientEncryption(masterPassword);
+      setEncryptionDialogOpen(false);
+    } catch (error) {
+      setEncryptionError(error.response?.data?.error || error.message);
+    } finally {
+      setEnabling(false);
+      setMasterPassword('');
+    }
+  };
+
   const tools = [
     {
       id: 1,
@@ -58,6 +87,16 @@ export default function Tools() {
       icon: <ImportExportIcon />,
       category: 'ANDERE',
     },
+    {
+      id: 6,
+      name: 'Clientseitige Verschlüsselung',
+      description: vaultEncryption === 'client'
+        ? 'Aktiv: Ihre Passwörter werden nur in Ihrem Browser entschlüsselt'
+        : 'Passwörter im Browser verschlüsseln, der Server speichert nur Ciphertext',
+      icon: <LockIcon />,
+      category: 'SICHERHEIT',
+      onClick: vaultEncryption === 'client' ? null : () => setEncryptionDialogOpen(true),
+    },
   ];
 
   // Group tools by category
@@ -99,6 +138,7 @@ export default function Tools() {
                     }}
                   >
                     <ListItemButton
+                      onClick={tool.onClick || undefined}
                       sx={{
                         height: '100%',
                         p: 2,
@@ -143,6 +183,32 @@ export default function Tools() {
           </Grid>
         ))}
       </Grid>
+
+      <Dialog open={encryptionDialogOpen} onClose={() => !enabling && setEncryptionDialogOpen(false)}>
+        <DialogTitle>Clientseitige Verschlüsselung aktivieren</DialogTitle>
+        <DialogContent>
+          <Alert severity="info" sx={{ mb: 2 }}>
+            Der Schlüssel wird aus Ihrem Master-Passwort abgeleitet. Vorhandene Einträge werden
+            schrittweise umgeschlüsselt. Dieser Schritt kann nicht rückgängig gemacht werden.
+            Das Master-Passwort wird bei der Anmeldung weiterhin an den Server gesendet.
+          </Alert>
+          {encryptionError && <Alert severity="error" sx={{ mb: 2 }}>{encryptionError}</Alert>}
+          <TextField
+            fullWidth
+            type="password"
+            label="Master-Passwort"
+            value={masterPassword}
+            onChange={(e) => setMasterPassword(e.target.value)}
+            disabled={enabling}
+          />
+        </DialogContent>
+        <DialogActions>
+          <Button onClick={() => setEncryptionDialogOpen(false)} disabled={enabling}>Abbrechen</Button>
+          <Button onClick={handleEnableEncryption} variant="contained" disabled={enabling || !masterPassword}>
+            {enabling ? 'Wird verschlüsselt...' : 'Aktivieren'}
+          </Button>
+        </DialogActions>
+      </Dialog>
     </Box>
   );
 }
@@ -1,6 +1,14 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
+import {
+  createKdfParams,
+  createKeyCheck,
+  decryptSecret,
+  deriveVaultKeys,
+  sealEntry,
+  verifyKeyCheck
+} from '../utils/vaultCrypto';
 
 const AuthContext = createContext(null);
 
@@ -14,6 +22,9 @@ export const AuthProvider = ({ children }) => {
   const [user, setUser] = useState(null);
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [loading, setLoading] = useState(true);
+  // Clientseitige Verschlüsselung: Schlüssel existiert nur im Speicher
+  const [vaultEncryption, setVaultEncryption] = useState('server');
+  const [vaultKeys, setVaultKeys] = useState(null);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -24,6 +35,9 @@ export const AuthProvider = ({ children }) => {
         if (response.data.authenticated) {
           setUser(response.data.user);
           setIsAuthenticated(true);
+          // Without the master password the vault stays locked until the next login
+          const vault = await axios.get('/api/vault');
+          setVaultEncryption(vault.data.encryption);
         }
       } catch (error) {
         console.error('Auth check failed:', error);
@@ -44,6 +58,72 @@ export const AuthProvider = ({ children }) => {
     }
   }, [isAuthenticated, loading, navigate]);
 
+  // Übrige serverseitig verschlüsselte Einträge schrittweise umschlüsseln
+  const migrateVault = async (keys) => {
+    for (;;) {
+      const response = await axios.get('/api/vault/migration?limit=100');
+      const { entries } = response.data;
+      if (entries.length === 0) {
+        return;
+      }
+      const sealed = await Promise.all(entries.map(async entry => ({
+        id: entry.id,
+        ...(await sealEntry(keys, entry.password))
+      })));
+      await axios.post('/api/vault/migration', { entries: sealed });
+    }
+  };
+
+  const unlockVault = async (masterPassword) => {
+    const response = await axios.get('/api/vault');
+    setVaultEncryption(response.data.encryption);
+    if (response.data.encryption !== 'client') {
+      return;
+    }
+    const keys = await deriveVaultKeys(masterPassword, response.data.kdf);
+    if (!(await verifyKeyCheck(keys, response.data.key_check))) {
+      throw new Error('Tresor-Schlüssel konnte nicht überprüft werden');
+    }
+    setVaultKeys(keys);
+    if (response.data.pending_migration > 0) {
+      migrateVault(keys).catch(error => console.error('Vault migration failed:', error));
+    }
+  };
+
+  const enableClientEncryption = async (masterPassword) => {
+    const kdf = createKdfParams();
+    const keys = await deriveVaultKeys(masterPassword, kdf);
+    await axios.post('/api/vault/client-encryption', {
+      password: masterPassword,
+      kdf,
+      key_check: await createKeyCheck(keys)
+    });
+    setVaultEncryption('client');
+    setVaultKeys(keys);
+    await migrateVault(keys);
+  };
+
+  // Request fields for a new password value, depending on the vault mode
+  const sealPassword = async (plaintext) => {
+    if (vaultEncryption !== 'client') {
+      return { password: plaintext };
+    }
+    if (!vaultKeys) {
+      throw new Error('Tresor gesperrt, bitte erneut anmelden');
+    }
+    return sealEntry(vaultKeys, plaintext);
+  };
+
+  const revealPassword = async (entry) => {
+    if (entry.ciphertext === undefined) {
+      return entry.password;
+    }
+    if (!vaultKeys) {
+      throw new Error('Tresor gesperrt, bitte erneut anmelden');
+    }
+    return decryptSecret(vaultKeys, entry.ciphertext);
+  };
+
   const login = async (email, password, twoFactorCode) => {
     try {
       const response = await axios.post('/api/login', {
@@ -54,6 +134,7 @@ export const AuthProvider = ({ children }) => {
       
       setUser(response.data.user);
       setIsAuthenticated(true);
+      await unlockVault(password);
       navigate('/dashboard');
       return { success: true };
     } catch (error) {
@@ -72,11 +153,14 @@ export const AuthProvider = ({ children }) => {
         email,
         password
       });
+
+      // QR-Code separat als SVG laden
+      const qrResponse = await axios.get(response.data.qr_code_url, { responseType: 'text' });
       
       return {
         success: true,
         twoFactorSecret: response.data.two_factor_secret,
-        qrCode: response.data.qr_code
+        qrCode: `data:image/svg+xml;charset=utf-8,${encodeURIComponent(qrResponse.data)}`
       };
     } catch (error) {
       return {
@@ -94,6 +178,8 @@ export const AuthProvider = ({ children }) => {
     } finally {
       setUser(null);
       setIsAuthenticated(false);
+      setVaultKeys(null);
+      setVaultEncryption('server');
       navigate('/login');
     }
   };
@@ -104,7 +190,12 @@ export const AuthProvider = ({ children }) => {
     loading,
     login,
     register,
-    logout
+    logout,
+    vaultEncryption,
+    vaultLocked: vaultEncryption === 'client' && !vaultKeys,
+    enableClientEncryption,
+    sealPassword,
+    revealPassword
   };
 
   if (loading) {
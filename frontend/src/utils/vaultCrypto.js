@@ -0,0 +1,96 @@
+// Clientseitige Tresor-Verschlüsselung
+//
+// The vault key is derived from the master password with PBKDF2-SHA256 and
+// never leaves the browser. This is not zero-knowledge: the master password
+// itself is still sent to the server at login, so the server could derive the key. Entries are sealed with AES-GCM and stored by the
+// server as opaque "v1.<base64(iv | ciphertext)>" strings. A second key from
+// the same derivation produces HMAC fingerprints for reuse detection.
+
+const KDF_ITERATIONS = 600000;
+const KEY_CHECK_VALUE = 'windkey-vault-key-check';
+const encoder = new TextEncoder();
+const decoder = new TextDecoder();
+
+const toBase64 = (bytes) => btoa(String.fromCharCode(...new Uint8Array(bytes)));
+const fromBase64 = (text) => Uint8Array.from(atob(text), c => c.charCodeAt(0));
+const toHex = (bytes) => Array.from(new Uint8Array(bytes), b => b.toString(16).padStart(2, '0')).join('');
+
+export const createKdfParams = () => ({
+  algorithm: 'PBKDF2-SHA256',
+  iterations: KDF_ITERATIONS,
+  salt: toBase64(crypto.getRandomValues(new Uint8Array(16)))
+});
+
+export const deriveVaultKeys = async (masterPassword, kdf) => {
+  const baseKey = await crypto.subtle.importKey(
+    'raw', encoder.encode(masterPassword), 'PBKDF2', false, ['deriveBits']
+  );
+  const bits = new Uint8Array(await crypto.subtle.deriveBits(
+    { name: 'PBKDF2', hash: 'SHA-256', salt: fromBase64(kdf.salt), iterations: kdf.iterations },
+    baseKey,
+    512
+  ));
+  const encryptionKey = await crypto.subtle.importKey(
+    'raw', bits.slice(0, 32), 'AES-GCM', false, ['encrypt', 'decrypt']
+  );
+  const fingerprintKey = await crypto.subtle.importKey(
+    'raw', bits.slice(32), { name: 'HMAC', hash: 'SHA-256' }, false, ['sign']
+  );
+  return { encryptionKey, fingerprintKey };
+};
+
+export const encryptSecret = async (keys, plaintext) => {
+  const iv = crypto.getRandomValues(new Uint8Array(12));
+  const ciphertext = new Uint8Array(await crypto.subtle.encrypt(
+    { name: 'AES-GCM', iv }, keys.encryptionKey, encoder.encode(plaintext)
+  ));
+  const blob = new Uint8Array(iv.length + ciphertext.length);
+  blob.set(iv);
+  blob.set(ciphertext, iv.length);
+  return `v1.${toBase64(blob)}`;
+};
+
+export const decryptSecret = async (keys, sealed) => {
+  if (!sealed.startsWith('v1.')) {
+    throw new Error('Unknown ciphertext format');
+  }
+  const blob = fromBase64(sealed.slice(3));
+  const plaintext = await crypto.subtle.decrypt(
+    { name: 'AES-GCM', iv: blob.slice(0, 12) }, keys.encryptionKey, blob.slice(12)
+  );
+  return decoder.decode(plaintext);
+};
+
+export const fingerprintSecret = async (keys, plaintext) =>
+  toHex(await crypto.subtle.sign('HMAC', keys.fingerprintKey, encoder.encode(plaintext)));
+
+// Same score as backend/strength.py, so the Stats page can count entries the server cannot read
+export const strengthScore = (plaintext) => {
+  if (!plaintext) return 0;
+  const checks = [
+    plaintext.length >= 12,
+    /[A-Z]/.test(plaintext),
+    /[a-z]/.test(plaintext),
+    /[0-9]/.test(plaintext),
+    /[^A-Za-z0-9]/.test(plaintext),
+    plaintext.length >= 16
+  ];
+  return Math.min(20 * checks.filter(Boolean).length, 100);
+};
+
+// Fields for POST/PUT /api/passwords in client-side mode
+export const sealEntry = async (keys, plaintext) => ({
+  ciphertext: await encryptSecret(keys, plaintext),
+  fingerprint: await fingerprintSecret(keys, plaintext),
+  strength: strengthScore(plaintext)
+});
+
+export const createKeyCheck = (keys) => encryptSecret(keys, KEY_CHECK_VALUE);
+
+export const verifyKeyCheck = async (keys, keyCheck) => {
+  try {
+    return (await decryptSecret(keys, keyCheck)) === KEY_CHECK_VALUE;
+  } catch (error) {
+    return false;
+  }
+};